@@ -1,15 +1,42 @@
+import gc
 import os
-import random
+import queue
+import threading
 import time
 import re
 import tkinter as tk
 from tkinter import ttk
 import pygame
-from mutagen.mp3 import MP3
-from collections import defaultdict
+from collections import defaultdict, deque
+from library_index import LibraryIndex, DurationProber
+from track_table import TrackTable
+from library_watcher import LibraryWatcher
+from player_engine import PlayerEngine
+from search_index import SearchIndex
+from decoder import start_pool
+from clip_scheduler import ClipScheduler
+from predecode import PredecodeCache
+from session_journal import SessionJournal, default_journal_path
+from play_history import PlayHistory
+from perf import Recorder, LagProbe, Profiler
+from tick_scheduler import TickScheduler, Rendered
 
 # --- Settings ---
 PATH = input("Enter the path to your music folder here: ")
+LAZY_TREE = True  # insert folder contents only when the folder is opened
+DROP_CLOSED_FOLDERS = True  # remove them from the tree again when it's closed
+WATCH_LIBRARY = True  # pick up added/removed/renamed files without a restart
+GAPLESS = True  # hand the next song to the mixer before the current one ends
+CROSSFADE = 0  # seconds the end of a song overlaps the next one (needs numpy); 0 turns it off
+CROSSFADE_CURVE = "equal_power"  # or "linear"
+PREDECODE_MB = 256  # memory for songs decoded ahead of being played; 0 turns it off
+RESTORE_SESSION = True  # remember where songs were left, and reopen the last song, queue and folders
+HISTORY = True  # log what was played for the "Recently played" and "Most played" views
+INSTRUMENT = False  # time the hot paths from the start; I shows the timings (and turns them on)
+PLAY_ORDER = "library"  # at a folder's end go on to the next folder; "folder" stops, "repeat_folder" starts it over
+SHUFFLE_WEIGHT = None  # None, "folder" (every folder equally likely) or "duration"
+WAVEFORM = True  # draw the song's loudness under the seek bar (needs numpy)
+NORMALIZE = True  # even out loudness between songs, analyzed in the background (needs numpy)
 
 # Color palette
 DARK_BG = "#1E1E2E"
@@ -19,20 +46,58 @@ TEXT_COLOR = "#F5F5F5"
 SECONDARY_TEXT = "#A0A0B0"
 BUTTON_HOVER = "#3FCF6D"
 
+# --- Instrumentation ---
+# Timing spans around the hot paths (perf.py), read from the overlay that
+# I opens; while it's closed and INSTRUMENT is off they cost one check.
+recorder = Recorder(enabled=INSTRUMENT)
+profiler = Profiler()
+lag_probe = None  # perf.LagProbe, once the Tk root exists
+scan_started_at = 0
+
+# --- Decoder workers ---
+# Songs are decoded (waveform overviews, loudness) in worker processes,
+# forked here before the mixer and Tk are set up. Without fork (Windows)
+# both features are off. Their modules need numpy, so they are only
+# imported when the feature is on.
+decoder_pool = None
+if WAVEFORM or NORMALIZE:
+    decoder_pool = start_pool()
+    if decoder_pool is None:
+        WAVEFORM = NORMALIZE = False
+waveform_loader = None
+if WAVEFORM:
+    from waveform import WaveformLoader
+    waveform_loader = WaveformLoader()
+    waveform_loader.start(decoder_pool)
+loudness_analyzer = None
+if NORMALIZE:
+    from loudness import LoudnessAnalyzer
+    loudness_analyzer = LoudnessAnalyzer()
+track_gains = {}  # {song_path: dB}, from the index and the analyzer
+
+def live_decoder_pool():
+    # The waveform loader forks a new pool if a worker dies.
+    return waveform_loader.pool if waveform_loader else decoder_pool
+
 # --- Initialize mixer ---
 pygame.mixer.init()
-current_song = None
-paused = False
-pause_cond = False  # True = playing, False = paused
-start_time = 0
-song_length = 0  # seconds
-
-# Resume positions: {song_path: last_position_seconds}
-resume_positions = {}
-
-# Queue system
-play_queue = []
-queue_origin = None  # (folder_path, index_in_folder) of the song before queue started
+pygame.display.init()  # needed for pygame's event queue; no window is opened
+SONG_END = pygame.USEREVENT + 1
+pygame.mixer.music.set_endevent(SONG_END)
+AUDIO_EVENT_INTERVAL = 10  # ms between event pumps near the end of a song
+AUDIO_PUMP_MAX = 30000  # ms the pump may sleep while the song is far from its end; starts and seeks wake it
+ticks = TickScheduler()  # periodic work; given the Tk root once it exists
+rendered = Rendered()  # what the seek bar, time label and waveform cursor show
+crossfader = None
+if CROSSFADE:
+    from crossfade import Crossfader
+    crossfader = Crossfader(CROSSFADE, CROSSFADE_CURVE)
+predecode_cache = PredecodeCache(PREDECODE_MB * 1024 * 1024) if PREDECODE_MB else None
+PREDECODE_DELAY = 150  # ms; moving the selection quickly doesn't decode every song passed
+predecode_pending = False
+
+tracks = TrackTable()
+song_lengths = {}  # {song_path: seconds}, filled from the index and the prober
 
 # --- Formatting helper ---
 def format_song_title(filename):
@@ -42,225 +107,896 @@ def format_song_title(filename):
     return name.title()
 
 def format_time(seconds):
-    minutes = int(seconds) // 60
+    hours = int(seconds) // 3600
+    minutes = int(seconds) // 60 % 60 if hours else int(seconds) // 60
     secs = int(seconds) % 60
+    if hours:
+        return f"{hours}:{minutes:02d}:{secs:02d}"
     return f"{minutes}:{secs:02d}"
 
-def get_song_length(path):
-    audio = MP3(path)
-    return audio.info.length
-
 # --- Core playback ---
-def play_song_from_path(path, position=0):
-    global current_song, paused, start_time, song_length, pause_cond
-    current_song = os.path.basename(path)
-    song_length = get_song_length(path)
-
-    if path in resume_positions and position == 0:
-        position = resume_positions[path]
-
-    pygame.mixer.music.load(path)
-    pygame.mixer.music.play(start=position)
-    paused = False
-    pause_cond = True  # now playing
-    start_time = time.time() - position
-    display_name = format_song_title(current_song)
-    song_title_label.config(text=display_name)
-    play_pause_button.config(text="⏸ Pause")
-    update_time_label()
-
-def toggle_play_pause():
-    global paused, start_time
-    path = find_path_of_current_selection()
-    if not path and current_song:
-        path = find_path_by_name(current_song)
-
-    if pygame.mixer.music.get_busy() and not paused:
-        save_resume_position(path)
-        pygame.mixer.music.pause()
-        paused = True
+# Playback state, the play queue and gapless hand-over live in the engine;
+# the functions below only turn its events into widget updates.
+def on_engine_event(event, value):
+    if event in ("started", "paused", "seeked"):
+        clip_scheduler.cancel()  # custom playback ends on any other transport change
+    if event == "started":
+        song_title_label.config(text=format_song_title(value))
+        play_pause_button.config(text="⏸ Pause")
+        ticks.wake("seek_bar")
+        ticks.wake("audio")
+        show_waveform(value)
+        save_position()
+    elif event == "new_song":
+        log_play("start", value, engine.position())
+    elif event == "paused":
         play_pause_button.config(text="▶ Play")
-    elif paused and path:
-        pos = resume_positions.get(path, 0)
-        play_song_from_path(path, position=pos)
+        ticks.wake("seek_bar")
+        save_position()
+    elif event == "seeked":
+        ticks.wake("seek_bar")
+        ticks.wake("audio")
+        log_play("seek", engine.current_path, value)
+    elif event == "dequeued":
+        queue_selection.discard(value)
+        update_queue_view()
+        save_queue()
+    elif event == "resume" and session_journal:
+        session_journal.record("resume", *value)
+    elif event == "ended":
+        log_play("complete", value, engine.song_length)
+    elif event == "left":
+        log_play("skip", *value)
+
+engine = PlayerEngine(tracks, song_lengths, SONG_END, gapless=GAPLESS, listener=on_engine_event,
+                      shuffle_weight=SHUFFLE_WEIGHT, gains=track_gains, crossfader=crossfader,
+                      cache=predecode_cache, order=PLAY_ORDER, recorder=recorder)
+clip_scheduler = ClipScheduler(engine)  # given the Tk root once it exists
 
-def save_resume_position(path):
-    global paused, pause_cond
-    if not path or song_length <= 0:
-        return
-    elapsed = time.time() - start_time if not paused else (seek_bar.get() / 100) * song_length
-    resume_positions[path] = max(0, min(elapsed, song_length))
-    pygame.mixer.music.pause()
-    paused = True
-    pause_cond = False  # now paused
-    play_pause_button.config(text="▶ Play")
+def toggle_play_pause():
+    engine.toggle(find_path_of_current_selection())
 
 def seek(seconds_delta):
-    if current_song and song_length > 0:
-        elapsed = time.time() - start_time if not paused else (seek_bar.get() / 100) * song_length
-        new_pos = max(0, min(elapsed + seconds_delta, song_length))
-        path = find_path_of_current_selection()
-        if path:
-            play_song_from_path(path, position=new_pos)
+    engine.seek(seconds_delta)
+
+def on_seek_press(event):
+    global seek_dragging
+    seek_dragging = True
+    ticks.wake("seek_bar")
 
 def on_seek(event):
-    path = find_path_of_current_selection()
-    if path and song_length > 0:
-        percent = seek_bar.get()
-        new_pos = (percent / 100) * song_length
-        play_song_from_path(path, position=new_pos)
-
-def update_time_label():
-    if song_length > 0:
-        if paused:
-            elapsed = (seek_bar.get() / 100) * song_length
+    global seek_dragging
+    seek_dragging = False
+    rendered.forget(seek_bar)  # moved by the user
+    if engine.song_length > 0:
+        engine.seek_to((seek_bar.get() / 100) * engine.song_length)
+    ticks.wake("seek_bar")
+
+def on_visibility_changed(event):
+    # Minimized (or on another virtual desktop): the visual ticks stop.
+    if event.widget is root:
+        if event.type == tk.EventType.Unmap:
+            ticks.hide()
         else:
-            elapsed = time.time() - start_time
-        elapsed = max(0, min(elapsed, song_length))
-        time_label.config(text=f"{format_time(elapsed)} / {format_time(song_length)}")
-
-def update_seek_bar():
-    if song_length > 0:
-        if not paused and pygame.mixer.music.get_busy():
-            elapsed = time.time() - start_time
-            percent = (elapsed / song_length) * 100
-            seek_bar.set(percent)
-        elif not paused and current_song and not pygame.mixer.music.get_busy():
-            handle_song_end()
-    update_time_label()
-    root.after(500, update_seek_bar)
-
-# --- Queue handling ---
-def handle_song_end():
-    global play_queue, queue_origin
-    path = find_path_by_name(current_song)
-    if path in resume_positions:
-        del resume_positions[path]  # reset resume when fully played
-
-    if play_queue:
-        next_song = play_queue.pop(0)
+            ticks.show()
+
+# --- Seek bar tick ---
+# Run by the tick scheduler: the bar, time label and waveform cursor are
+# only touched when what they show changes, and the next tick is timed for
+# the next whole second or bar pixel. While the bar is dragged only the
+# time label follows it; while paused (or hidden) nothing ticks until an
+# engine event wakes it.
+SEEK_MIN_TICK = 50  # ms; also the rate while the bar is dragged
+SEEK_MAX_TICK = 1000
+seek_dragging = False
+
+def show_time(position):
+    position = max(0, min(position, engine.song_length))
+    rendered.config(time_label, text=f"{format_time(position)} / {format_time(engine.song_length)}")
+
+@recorder.timed("tick.seek_bar")
+def tick_seek_bar():
+    length = engine.song_length
+    if length <= 0:
+        return None
+    if seek_dragging:
+        show_time(seek_bar.get() / 100 * length)
+        return SEEK_MIN_TICK
+    position = engine.position()
+    width = max(1, seek_bar.winfo_width())
+    rendered.set(seek_bar, round(position / length * width) / width * 100)
+    update_waveform_cursor()
+    show_time(position)
+    if engine.paused or not engine.busy():
+        return None
+    if time.monotonic() - position_saved_at >= SESSION_POSITION_EVERY:
+        save_position()
+    until_change = min(1 - position % 1, length / width)
+    return max(SEEK_MIN_TICK, min(SEEK_MAX_TICK, until_change * 1000 + 5))
+
+# --- Session ---
+# The current song and its position, the queue, open folders and resume
+# positions go to a journal that a writer thread appends to in batches
+# (session_journal.py), and come back once the next launch's scan is done.
+session_journal = None
+if RESTORE_SESSION:
+    session_journal = SessionJournal(default_journal_path(PATH)).start()
+open_folders = set()  # rel_dirs open in the tree
+SESSION_POSITION_EVERY = 5  # seconds between saves of the playing song's position
+position_saved_at = 0
+
+def save_position():
+    global position_saved_at
+    position_saved_at = time.monotonic()
+    if session_journal and engine.current_path:
+        session_journal.record("session", "current", [engine.current_path, round(engine.position(), 1)])
+
+def save_queue():
+    if session_journal:
+        session_journal.record("session", "queue", [path for _, path in engine.queue])
+
+def save_open_folders():
+    if session_journal:
+        session_journal.record("session", "open", sorted(open_folders))
+
+def restore_session():
+    if not session_journal:
+        return
+    if session_journal.state is None:
+        root.after(20, restore_session)  # still being read by the writer thread
+        return
+    state = session_journal.load()
+    engine.resume_positions.update(state["resume"])
+    session = dict(state["session"])
+    for rel_dir in sorted(session.get("open", ()), key=lambda d: 0 if d == "." else d.count(os.sep) + 1):
+        if rel_dir in folder_nodes:  # its parent is open too
+            materialize_folder(rel_dir)
+            tree.item(folder_nodes[rel_dir], open=True)
+            open_folders.add(rel_dir)
+    current = session.get("current")
+    if current and current[0] in tracks.ids and engine.current_path is None:
+        path, position = current
+        engine.restore(path, position)
+        song_title_label.config(text=format_song_title(path))
+        ticks.wake("seek_bar")
+        show_waveform(path)
+        select_song(path)
+    queued = [path for path in session.get("queue", ()) if path in tracks.ids]
+    if queued:
+        engine.enqueue_many(queued)
         update_queue_view()
-        play_song_from_path(next_song)
-    elif queue_origin:
-        folder, idx = queue_origin
-        if folder in folder_structure and idx + 1 < len(folder_structure[folder]):
-            play_song_from_path(folder_structure[folder][idx + 1])
-        queue_origin = None
-    else:
-        play_next_in_folder()
 
+def select_song(path):
+    folder_id = folder_nodes.get(os.path.relpath(os.path.dirname(path), PATH))
+    if folder_id is None or not tree.item(folder_id, "open"):
+        return
+    for item_id in tree.get_children(folder_id):
+        if tree.item(item_id, "values")[0] == path:
+            tree.selection_set(item_id)
+            tree.see(item_id)
+            return
+
+# --- Waveform ---
+# The overview is drawn once per song (and on resize); only the cursor line
+# moves while it plays.
+def show_waveform(path):
+    if waveform_loader is None:
+        return
+    draw_waveform(waveform_loader.request(path))
+    upcoming = engine.next_after_current()
+    if upcoming:
+        waveform_loader.request(upcoming[0])  # ready before it starts
+    ticks.wake("waveforms")
+
+def draw_waveform(levels):
+    waveform_canvas.delete("all")
+    width = waveform_canvas.winfo_width()
+    height = waveform_canvas.winfo_height()
+    if levels is not None and width > 1:
+        peaks, rms = levels.tolist()
+        middle = height / 2
+        for x in range(width):
+            i = x * len(peaks) // width
+            peak = max(1, peaks[i] * middle / 255)
+            waveform_canvas.create_line(x, middle - peak, x, middle + peak, fill=SECONDARY_TEXT)
+            level = rms[i] * middle / 255
+            if level >= 1:
+                waveform_canvas.create_line(x, middle - level, x, middle + level, fill=ACCENT_COLOR)
+    waveform_canvas.create_line(0, 0, 0, height, fill=TEXT_COLOR, tags="cursor")
+    rendered.forget(waveform_canvas, "cursor")
+    update_waveform_cursor()
+
+def update_waveform_cursor():
+    if WAVEFORM and engine.song_length > 0:
+        x = round(engine.position() / engine.song_length * waveform_canvas.winfo_width())
+        if rendered.changed(waveform_canvas, "cursor", x):
+            waveform_canvas.coords("cursor", x, 0, x, waveform_canvas.winfo_height())
+
+def drain_waveforms():
+    # Polls only while overviews are being worked out.
+    if waveform_loader is None:
+        return None
+    if engine.current_path in waveform_loader.collect():
+        draw_waveform(waveform_loader.get(engine.current_path))
+    return 200 if waveform_loader.pending else None
+
+def on_waveform_click(event):
+    width = waveform_canvas.winfo_width()
+    if engine.song_length > 0 and width > 1:
+        engine.seek_to(event.x / width * engine.song_length)
+
+def on_waveform_resize(event):
+    if waveform_loader and engine.current_path:
+        draw_waveform(waveform_loader.get(engine.current_path))
+
+# --- End of track ---
+# pygame posts SONG_END when the music stream finishes. The Tk loop pumps
+# pygame's event queue every few ms near the end of a song (or crossfade),
+# about once a second before that, and not at all while paused.
+def pump_audio_events():
+    if not engine.pump():
+        return None
+    quiet = engine.quiet_for()
+    return AUDIO_EVENT_INTERVAL if quiet <= 0 else min(AUDIO_PUMP_MAX, quiet * 1000)
+
+# --- Queue view ---
+# queue_tree only holds the QUEUE_ROWS rows that fit in it, starting at
+# queue index queue_top, which the scrollbar and the mouse wheel move.
+# The rows come from PlayQueue.window(), so redrawing after a change costs
+# the same with ten songs queued as with a hundred thousand. Rows use the
+# queue entry ID as their item ID; the selection is kept by entry ID in
+# queue_selection, so it survives scrolling.
+QUEUE_ROWS = 6
+queue_top = 0
+queue_selection = set()
+
+@recorder.timed("queue.view")
 def update_queue_view():
+    global queue_top
+    total = len(engine.queue)
+    queue_top = max(0, min(queue_top, total - QUEUE_ROWS))
     queue_tree.delete(*queue_tree.get_children())
-    for song_path in play_queue:
-        queue_tree.insert("", "end", text=format_song_title(song_path), values=(song_path,))
+    for entry_id, song_path in engine.queue.window(queue_top, QUEUE_ROWS):
+        title = song_titles.get(song_path) or format_song_title(song_path)
+        queue_tree.insert("", "end", iid=str(entry_id), text=title, values=(song_path,))
+    queue_tree.selection_set(*[item for item in queue_tree.get_children() if int(item) in queue_selection])
+    if total > QUEUE_ROWS:
+        queue_scrollbar.set(queue_top / total, (queue_top + QUEUE_ROWS) / total)
+    else:
+        queue_scrollbar.set(0, 1)
+
+def on_queue_scroll(action, amount, unit=None):
+    # The scrollbar's yscrollcommand protocol: ("moveto", fraction) or
+    # ("scroll", count, "units" or "pages").
+    global queue_top
+    if action == "moveto":
+        queue_top = int(float(amount) * len(engine.queue))
+    else:
+        queue_top += int(amount) * (QUEUE_ROWS if unit == "pages" else 1)
+    update_queue_view()
+
+def on_queue_wheel(event):
+    up = event.num == 4 or getattr(event, "delta", 0) > 0
+    on_queue_scroll("scroll", -1 if up else 1, "units")
+    return "break"
+
+def on_queue_click(event):
+    queue_selection.clear()  # a plain click starts a new selection
+
+def on_queue_select(event=None):
+    # Rows scrolled out of view keep their selection.
+    queue_selection.difference_update(int(item) for item in queue_tree.get_children())
+    queue_selection.update(int(item) for item in queue_tree.selection())
 
 # --- Tree building ---
 folder_structure = defaultdict(list)
-folder_nodes = {}
-
+folder_nodes = {}  # {rel_dir: tree item} for folders currently in the tree
+folder_of_item = {}  # {tree item: rel_dir}
+folder_paths = {}  # {rel_dir: folder path}
+folder_children = defaultdict(list)  # {rel_dir: [child rel_dir, ...]}
+loaded_folders = set()  # rel_dirs whose children are in the tree
+song_titles = {}  # {song_path: display title}
+folder_totals = defaultdict(float)  # {rel_dir: seconds incl. subfolders}
+counted_lengths = {}  # {song_path: seconds} in folder_totals; the engine also adds songs it probed itself to song_lengths
+
+library_index = None
+duration_prober = DurationProber()
+folder_placeholders = {}  # {rel_dir: placeholder item} for unopened folders
+scan_results = queue.Queue()  # batches of (folder, songs) from the scan thread
+scan_pending = deque()
+scan_finished = False
+scan_status_label = None
+search_index = SearchIndex(alive=tracks.ids.__contains__)  # filled by the scan thread
+SCAN_BATCH_FOLDERS = 64
+SCAN_FRAME_BUDGET = 0.012  # seconds of each Tk frame spent adding scan results
+SCAN_GC_THRESHOLD = 50_000  # allocations between young collections while the scan fills the library
+scan_gc_threshold = None  # the thresholds to restore once the scan is done
+
+@recorder.timed("scan.sync")
 def scan_music_directory(base_path):
-    for root_dir, dirs, files_in_dir in os.walk(base_path):
-        rel_dir = os.path.relpath(root_dir, base_path)
+    global library_index
+    # Folder listings and titles come from the on-disk index; only folders
+    # whose mtime changed since the last launch are listed again.
+    library_index = LibraryIndex(base_path)
+    for root_dir, songs in library_index.iter_scan(format_song_title):
+        index_for_search(root_dir, songs)
+        add_scanned_folder(root_dir, songs)
+    for rel_dir in folder_nodes:
+        update_folder_label(rel_dir)
+    finish_scan()
+
+def start_background_scan(base_path):
+    # Same as scan_music_directory, but the walk runs on a worker thread and
+    # the tree fills in from drain_scan_results while the UI stays usable.
+    global library_index, scan_started_at, scan_gc_threshold
+    scan_started_at = time.perf_counter()
+    library_index = LibraryIndex(base_path)
+    # The scan allocates the whole library in a few seconds; with the default
+    # thresholds the cyclic GC keeps re-walking it in collections that land
+    # in UI frames.
+    scan_gc_threshold = gc.get_threshold()
+    gc.set_threshold(SCAN_GC_THRESHOLD, *scan_gc_threshold[1:])
+    threading.Thread(target=scan_worker, daemon=True).start()
+    drain_scan_results()
+
+def scan_worker():
+    batch = []
+    try:
+        for item in library_index.iter_scan(format_song_title):
+            index_for_search(*item)  # here rather than in the UI thread
+            batch.append(item)
+            if len(batch) >= SCAN_BATCH_FOLDERS:
+                scan_results.put(batch)
+                batch = []
+    finally:
+        # Even if the walk fails, so the scan finishes with what was found.
+        scan_results.put(batch)
+        scan_results.put(None)  # done
+
+def index_for_search(root_dir, songs):
+    search_index.add_folder(root_dir, os.path.relpath(root_dir, PATH), [(path, title) for path, title, _ in songs])
+
+@recorder.timed("scan.drain")
+def drain_scan_results():
+    deadline = time.perf_counter() + SCAN_FRAME_BUDGET
+    dirty = set()
+    done = False
+    while time.perf_counter() < deadline:
+        if not scan_pending:
+            try:
+                batch = scan_results.get_nowait()
+            except queue.Empty:
+                break
+            if batch is None:
+                done = True
+                break
+            scan_pending.extend(batch)
+            continue
+        root_dir, songs = scan_pending.popleft()
+        dirty.update(add_scanned_folder(root_dir, songs))
+    for rel_dir in dirty:
+        if rel_dir in folder_nodes:
+            update_folder_label(rel_dir)
+    if done:
+        finish_scan()
+        if WATCH_LIBRARY:
+            start_library_watcher()
+    else:
+        scan_status_label.config(text=f"Scanning library… {len(tracks):,} songs in {len(folder_paths):,} folders")
+        root.after(15, drain_scan_results)
+
+def add_scanned_folder(root_dir, songs):
+    rel_dir = os.path.relpath(root_dir, PATH)
+    folder_paths[rel_dir] = root_dir
+
+    known_total = 0
+    for full_path, title, duration in songs:
+        folder_structure[root_dir].append(full_path)
+        tracks.add(root_dir, full_path)
+        song_titles[full_path] = title
+        if duration is not None:
+            song_lengths[full_path] = counted_lengths[full_path] = duration
+            known_total += duration
+    touched = add_to_folder_totals(rel_dir, known_total) if known_total else []
+
+    # Lazy mode only puts the top level in the tree; the rest is inserted
+    # as folders get opened.
+    if rel_dir == ".":
+        insert_folder("", ".")
+        materialize_folder(".")
+        return touched
+    parent = os.path.dirname(rel_dir) or "."
+    folder_children[parent].append(rel_dir)
+    if parent in loaded_folders:
+        insert_folder(folder_nodes[parent], rel_dir)
+        if not LAZY_TREE:
+            materialize_folder(rel_dir)
+    elif parent in folder_nodes and parent not in folder_placeholders:
+        add_placeholder(parent)
+    return touched
+
+def finish_scan():
+    global scan_finished, scan_gc_threshold
+    scan_finished = True
+    if scan_started_at:
+        recorder.add("scan.total", time.perf_counter() - scan_started_at)
+    # The library lives for the whole session: collect once, then move it
+    # out of the GC's reach so later full collections don't walk it.
+    if scan_gc_threshold:
+        gc.set_threshold(*scan_gc_threshold)
+        scan_gc_threshold = None
+    gc.collect()
+    gc.freeze()
+    refresh_search()
+    missing = [p for songs in folder_structure.values() for p in songs if p not in song_lengths]
+    duration_prober.start(missing, library_index)
+    ticks.wake("probe")
+    if NORMALIZE:
+        track_gains.update(library_index.load_gains())
+        start_loudness_analysis([p for songs in folder_structure.values() for p in songs if p not in track_gains])
+    if scan_status_label:
+        show_library_status()
+        restore_session()
+
+def show_library_status():
+    status = f"{len(tracks):,} songs in {len(folder_paths):,} folders"
+    if loudness_analyzer and loudness_analyzer.analyzed:
+        status += f" · loudness of {len(track_gains):,} known ({loudness_analyzer.rate():.1f} songs/s per core)"
+    scan_status_label.config(text=status)
+
+def add_placeholder(rel_dir):
+    depth = 0 if rel_dir == "." else rel_dir.count(os.sep) + 1
+    folder_placeholders[rel_dir] = tree.insert(folder_nodes[rel_dir], "end", text="…", values=("", depth + 1, -1))
+
+def insert_folder(parent_id, rel_dir):
+    depth = 0 if rel_dir == "." else rel_dir.count(os.sep) + 1
+    folder_id = tree.insert(parent_id, "end", values=(folder_paths[rel_dir], depth, -1))
+    folder_nodes[rel_dir] = folder_id
+    folder_of_item[folder_id] = rel_dir
+    update_folder_label(rel_dir)
+    if LAZY_TREE and (folder_children.get(rel_dir) or folder_structure.get(folder_paths[rel_dir])):
+        add_placeholder(rel_dir)
+    return folder_id
+
+@recorder.timed("tree.materialize")
+def materialize_folder(rel_dir, recursive=False):
+    folder_id = folder_nodes[rel_dir]
+    if rel_dir not in loaded_folders:
+        loaded_folders.add(rel_dir)
+        placeholder = folder_placeholders.pop(rel_dir, None)
+        if placeholder:
+            tree.delete(placeholder)
         depth = 0 if rel_dir == "." else rel_dir.count(os.sep) + 1
-        if rel_dir == ".":
-            parent_id = ""
-        else:
-            parent_key = os.path.dirname(rel_dir)
-            parent_id = "" if parent_key in (".", "") else folder_nodes.get(parent_key, "")
-
-        folder_display = os.path.basename(root_dir) if rel_dir != "." else os.path.basename(base_path)
-        folder_id = tree.insert(parent_id, "end", text=folder_display, values=(root_dir, depth, -1))
-        folder_nodes[rel_dir] = folder_id
-
-        song_index = 0
-        for file in sorted(files_in_dir):
-            if file.endswith(".mp3"):
-                full_path = os.path.join(root_dir, file)
-                folder_structure[root_dir].append(full_path)
-                tree.insert(folder_id, "end", text=format_song_title(file),
-                            values=(full_path, depth + 1, song_index))
-                song_index += 1
+        for song_index, full_path in enumerate(folder_structure.get(folder_paths[rel_dir], ())):
+            tree.insert(folder_id, "end", text=song_titles[full_path],
+                        values=(full_path, depth + 1, song_index))
+        for child in folder_children.get(rel_dir, ()):
+            insert_folder(folder_id, child)
+    if recursive:
+        for child in folder_children.get(rel_dir, ()):
+            materialize_folder(child, recursive=True)
+
+def unload_folder(rel_dir):
+    folder_id = folder_nodes[rel_dir]
+    stack = list(folder_children.get(rel_dir, ()))
+    while stack:
+        child = stack.pop()
+        child_id = folder_nodes.pop(child, None)
+        if child_id is not None:
+            del folder_of_item[child_id]
+            folder_placeholders.pop(child, None)
+            if child in loaded_folders:
+                loaded_folders.discard(child)
+                stack.extend(folder_children.get(child, ()))
+    loaded_folders.discard(rel_dir)
+    had_selection = bool(tree.selection())
+    tree.delete(*tree.get_children(folder_id))
+    add_placeholder(rel_dir)
+    if had_selection and not tree.selection():
+        tree.selection_set(folder_id)
+
+# --- Library watching ---
+library_watcher = None
+
+def start_library_watcher():
+    global library_watcher
+    ticks.add("library", drain_library_updates)
+    library_watcher = LibraryWatcher(library_index, list(folder_paths.values()), format_song_title,
+                                     notify=notify_library_updates).start()
+
+def notify_library_updates():
+    # Runs on the watcher's thread. Tkinter hands a generated event over to
+    # the Tk thread, where <<LibraryUpdated>> wakes the "library" job.
+    try:
+        root.event_generate("<<LibraryUpdated>>", when="tail")
+    except (tk.TclError, RuntimeError):
+        pass  # window closed
+
+@recorder.timed("watcher.drain")
+def drain_library_updates():
+    dirty = set()
+    missing = []
+    while True:
+        try:
+            updates = library_watcher.updates.get_nowait()
+        except queue.Empty:
+            break
+        for folder, songs, _ in updates:
+            dirty.update(apply_folder_update(folder, songs))
+            missing.extend(path for path, _, duration in songs or () if duration is None)
+    for rel_dir in dirty:
+        if rel_dir in folder_nodes:
+            update_folder_label(rel_dir)
+    if missing:
+        duration_prober.start(missing, library_index)
+        ticks.wake("probe")
+        start_loudness_analysis(missing)  # new or changed files
+    if dirty or missing:
+        engine.refresh_next()
+        refresh_search()
+        show_library_status()
+    return None  # woken by notify_library_updates
+
+def apply_folder_update(folder, songs):
+    rel_dir = os.path.relpath(folder, PATH)
+    if songs is None:
+        return remove_library_folder(rel_dir)
+    index_for_search(folder, songs)
+    if rel_dir not in folder_paths:
+        return add_scanned_folder(folder, songs)
+    return replace_folder_songs(rel_dir, songs)
+
+def replace_folder_songs(rel_dir, songs):
+    folder = folder_paths[rel_dir]
+    delta = 0
+    for path in folder_structure.get(folder, ()):
+        song_lengths.pop(path, None)
+        delta -= counted_lengths.pop(path, 0)
+        song_titles.pop(path, None)
+    folder_structure[folder] = [path for path, _, _ in songs]
+    tracks.set_folder(folder, folder_structure[folder])
+    for path, title, duration in songs:
+        song_titles[path] = title
+        if duration is not None:
+            song_lengths[path] = counted_lengths[path] = duration
+            delta += duration
+    touched = add_to_folder_totals(rel_dir, delta) if delta else []
+
+    folder_id = folder_nodes.get(rel_dir)
+    if folder_id is None:
+        return touched
+    if rel_dir in loaded_folders:
+        for item_id in tree.get_children(folder_id):
+            if int(tree.item(item_id, "values")[2]) >= 0:
+                tree.delete(item_id)
+        depth = 0 if rel_dir == "." else rel_dir.count(os.sep) + 1
+        for song_index, path in enumerate(folder_structure[folder]):
+            tree.insert(folder_id, song_index, text=song_titles[path], values=(path, depth + 1, song_index))
+    elif LAZY_TREE and songs and rel_dir not in folder_placeholders:
+        add_placeholder(rel_dir)
+    return touched
+
+def remove_library_folder(rel_dir):
+    if rel_dir == "." or rel_dir not in folder_paths:
+        return []
+    touched = add_to_folder_totals(rel_dir, -folder_totals[rel_dir]) if folder_totals.get(rel_dir) else []
+    parent = os.path.dirname(rel_dir) or "."
+    if rel_dir in folder_children.get(parent, ()):
+        folder_children[parent].remove(rel_dir)
+    folder_id = folder_nodes.get(rel_dir)
+
+    stack = [rel_dir]
+    while stack:
+        rel = stack.pop()
+        stack.extend(folder_children.pop(rel, ()))
+        folder = folder_paths.pop(rel)
+        for path in folder_structure.pop(folder, ()):
+            song_titles.pop(path, None)
+            song_lengths.pop(path, None)
+            counted_lengths.pop(path, None)
+        if folder in tracks.folders:
+            tracks.remove_folder(folder)
+        folder_totals.pop(rel, None)
+        item_id = folder_nodes.pop(rel, None)
+        folder_of_item.pop(item_id, None)
+        folder_placeholders.pop(rel, None)
+        loaded_folders.discard(rel)
+    if folder_id is not None and tree.exists(folder_id):
+        tree.delete(folder_id)
+    return [rel for rel in touched if rel in folder_paths]
+
+def on_tree_open(event):
+    rel_dir = folder_of_item.get(tree.focus())
+    if rel_dir is not None:
+        materialize_folder(rel_dir)
+        open_folders.add(rel_dir)
+        save_open_folders()
+
+def on_tree_close(event):
+    rel_dir = folder_of_item.get(tree.focus())
+    open_folders.discard(rel_dir)
+    if DROP_CLOSED_FOLDERS and rel_dir in loaded_folders:
+        unload_folder(rel_dir)
+        # Subfolders come back closed when it's opened again.
+        prefix = "" if rel_dir == "." else rel_dir + os.sep
+        open_folders.difference_update([d for d in open_folders if d.startswith(prefix)])
+    save_open_folders()
+
+# --- Durations ---
+def add_to_folder_totals(rel_dir, duration):
+    # Adds to the folder and every folder above it; returns the rel_dirs
+    # whose labels need refreshing.
+    touched = [rel_dir]
+    folder_totals[rel_dir] += duration
+    while rel_dir != ".":
+        rel_dir = os.path.dirname(rel_dir) or "."
+        folder_totals[rel_dir] += duration
+        touched.append(rel_dir)
+    return touched
+
+def update_folder_label(rel_dir):
+    folder_id = folder_nodes[rel_dir]
+    folder_path = folder_paths[rel_dir]
+    name = os.path.basename(folder_path) if rel_dir != "." else os.path.basename(PATH)
+    total = folder_totals.get(rel_dir)
+    tree.item(folder_id, text=f"{name}  ({format_time(total)})" if total else name)
+
+@recorder.timed("probe.drain")
+def drain_probe_results():
+    probed = []
+    while len(probed) < 2000:
+        try:
+            probed.append(duration_prober.results.get_nowait())
+        except queue.Empty:
+            break
+    if probed:
+        # Songs removed from the library while they were being probed are skipped.
+        probed = [(path, length) for path, length in probed if tracks.id_of(path) is not None]
+        dirty = set()
+        for path, length in probed:
+            # A song can be probed twice (a library update re-probes songs
+            # the first run hasn't reached), so only the change is added.
+            song_lengths[path] = length
+            delta = length - counted_lengths.get(path, 0)
+            counted_lengths[path] = length
+            if delta:
+                dirty.update(add_to_folder_totals(os.path.relpath(os.path.dirname(path), PATH), delta))
+        for rel_dir in dirty:
+            if rel_dir in folder_nodes:
+                update_folder_label(rel_dir)
+    if duration_prober.running or not duration_prober.results.empty():
+        return 250
+    return None
+
+# --- Loudness ---
+def start_loudness_analysis(paths):
+    pool = live_decoder_pool()
+    if NORMALIZE and pool and paths:
+        loudness_analyzer.start(pool, paths, library_index)
+        ticks.wake("loudness")
+
+def drain_loudness_results():
+    if loudness_analyzer is None:
+        return None
+    analyzed = []
+    while True:
+        try:
+            analyzed.append(loudness_analyzer.results.get_nowait())
+        except queue.Empty:
+            break
+    if analyzed:
+        # Applied from the next time each song starts, not mid-song.
+        track_gains.update(analyzed)
+        show_library_status()
+    if loudness_analyzer.running or not loudness_analyzer.results.empty():
+        return 1000
+    return None
 
 # --- Helpers ---
+def song_view():
+    # The search results or a history list while one is showing, the library otherwise.
+    return results_tree if search_active or history_view else tree
+
 def find_path_of_current_selection():
-    sel = tree.selection()
+    view = song_view()
+    sel = view.selection()
     if not sel:
         return None
-    fullpath, _, index = tree.item(sel[0], "values")
+    fullpath, _, index = view.item(sel[0], "values")
     return fullpath if int(index) >= 0 else None
 
-def find_path_by_name(name):
-    for folder, songs in folder_structure.items():
-        for song in songs:
-            if os.path.basename(song) == name:
-                return song
-    return None
+def on_selection_changed(event=None):
+    global predecode_pending
+    if predecode_cache and not predecode_pending:
+        predecode_pending = True
+        root.after(PREDECODE_DELAY, predecode_selection)
+
+def predecode_selection():
+    # P plays the selected song, so it goes ahead of the others.
+    global predecode_pending
+    predecode_pending = False
+    path = find_path_of_current_selection()
+    engine.predecode(*([path] if path else []))
 
 # --- Play ---
 def play_selected_song():
     path = find_path_of_current_selection()
     if path:
-        save_resume_position(path)  # save current before switching
-        play_song_from_path(path)
+        engine.pause()  # save current before switching
+        engine.play(path)
 
 # --- Queue add/remove ---
 def add_to_queue():
-    global queue_origin
-    sel_path = find_path_of_current_selection()
-    if not sel_path:
+    # The selected song, or every song in the selected folder.
+    view = song_view()
+    sel = view.selection()
+    if not sel:
         return
-    if current_song and not queue_origin:
-        for folder, songs in folder_structure.items():
-            for idx, song_path in enumerate(songs):
-                if os.path.basename(song_path) == current_song:
-                    queue_origin = (folder, idx)
-                    break
-    play_queue.append(sel_path)
+    fullpath, _, index = view.item(sel[0], "values")
+    if int(index) >= 0:
+        engine.enqueue(fullpath)
+    else:
+        songs = [tracks.path_of(track_id) for track_id in tracks.folders.get(fullpath, ())]
+        if not songs:
+            return
+        engine.enqueue_many(songs)
     update_queue_view()
+    save_queue()
 
 def remove_from_queue():
-    sel = queue_tree.selection()
-    if not sel:
+    if not queue_selection:
         return
-    for item_id in sel:
-        song_path = queue_tree.item(item_id, "values")[0]
-        if song_path in play_queue:
-            play_queue.remove(song_path)
+    engine.dequeue(*sorted(queue_selection))
+    queue_selection.clear()
     update_queue_view()
+    save_queue()
 
 # --- Folder navigation ---
 def play_next_in_folder():
-    if not current_song:
-        return
-    for folder, songs in folder_structure.items():
-        for idx, song_path in enumerate(songs):
-            if os.path.basename(song_path) == current_song:
-                if idx + 1 < len(songs):
-                    play_song_from_path(songs[idx + 1])
-                return
+    engine.next()
 
 def play_prev_in_folder():
-    if not current_song:
-        return
-    for folder, songs in folder_structure.items():
-        for idx, song_path in enumerate(songs):
-            if os.path.basename(song_path) == current_song:
-                if idx - 1 >= 0:
-                    play_song_from_path(songs[idx - 1])
-                return
+    engine.prev()
 
 # --- Navigation keys ---
 def move_selection(direction):
-    sel = tree.selection()
+    view = song_view()
+    sel = view.selection()
     if not sel:
         return
-    item_id = sel[0]
-    siblings = tree.get_children(tree.parent(item_id))
-    cur_pos = siblings.index(item_id)
-    new_pos = cur_pos + direction
-    if 0 <= new_pos < len(siblings):
-        tree.selection_set(siblings[new_pos])
-        tree.see(siblings[new_pos])
+    item_id = view.next(sel[0]) if direction > 0 else view.prev(sel[0])
+    if item_id:
+        view.selection_set(item_id)
+        view.see(item_id)
+
+# --- Search ---
+search_active = False
+
+def on_search_changed(*_):
+    global search_active
+    query = search_var.get()
+    if query.strip() and not search_active:
+        search_active = True
+        close_history()
+        tree.pack_forget()
+        results_tree.pack(expand=True, fill="both", padx=10, pady=(5, 5), before=queue_frame)
+    elif not query.strip() and search_active:
+        search_active = False
+        results_tree.pack_forget()
+        tree.pack(expand=True, fill="both", padx=10, pady=(5, 5), before=queue_frame)
+    refresh_search()
+
+@recorder.timed("search.refresh")
+def refresh_search():
+    if not search_active:
+        return
+    results_tree.delete(*results_tree.get_children())
+    for path in search_index.search(search_var.get()):
+        rel_dir = os.path.relpath(os.path.dirname(path), PATH)
+        results_tree.insert("", "end", text=f"{song_titles.get(path, path)}   ·   {rel_dir}", values=(path, 0, 0))
+    results = results_tree.get_children()
+    if results:
+        results_tree.selection_set(results[0])
+
+def focus_search():
+    search_entry.focus_set()
+    search_entry.select_range(0, "end")
+
+def clear_search(event=None):
+    search_var.set("")
+    close_history()
+    tree.focus_set()
+
+def focus_results(event=None):
+    if search_active and results_tree.get_children():
+        results_tree.focus_set()
+    return "break"
+
+def play_search_result(event=None):
+    if search_active or history_view:
+        play_selected_song()
+        results_tree.focus_set()
+
+# --- History ---
+# Plays, songs played through, skips and seeks go to the play history's
+# writer thread; the views read the totals it keeps in the library index.
+play_history = None
+history_view = None  # "recent" or "most" while results_tree shows that list
+history_ticket = None  # flush the open view waits for (PlayHistory.request_flush)
+HISTORY_ROWS = 200
+HISTORY_WAIT = 20  # ms between checks for the writer's flush
+
+def log_play(event, path, position=None):
+    if play_history:
+        play_history.log(event, path, position)
+
+def format_ago(seconds):
+    if seconds < 60:
+        return "just now"
+    if seconds < 3600:
+        return f"{int(seconds // 60)} min ago"
+    if seconds < 86400:
+        return f"{int(seconds // 3600)} h ago"
+    days = int(seconds // 86400)
+    return "yesterday" if days == 1 else f"{days} days ago"
+
+def show_history(kind):
+    # H and M: pressing the same key again goes back to the folder tree.
+    global history_view, history_ticket
+    if play_history is None:
+        return
+    if history_view == kind:
+        clear_search()
+        return
+    if search_active:
+        search_var.set("")
+    if history_view is None:
+        tree.pack_forget()
+        results_tree.pack(expand=True, fill="both", padx=10, pady=(5, 5), before=queue_frame)
+    history_view = kind
+    # The list is drawn once the writer thread has written the last few
+    # events, so the song just played is in it.
+    history_ticket = play_history.request_flush()
+    results_tree.delete(*results_tree.get_children())
+    ticks.wake("history")
+    results_tree.focus_set()
+
+def draw_history_when_written():
+    global history_ticket
+    if history_ticket is None or history_view is None:
+        return None
+    if play_history.flushed < history_ticket:
+        return HISTORY_WAIT
+    history_ticket = None
+    refresh_history()
+    return None
+
+def refresh_history():
+    if history_view == "recent":
+        rows = library_index.recently_played(HISTORY_ROWS)
+    else:
+        rows = library_index.most_played(HISTORY_ROWS)
+    results_tree.delete(*results_tree.get_children())
+    now = time.time()
+    for path, plays, completions, skips, last_played in rows:
+        if path not in tracks.ids:
+            continue  # removed from the library (or not scanned yet)
+        if history_view == "recent":
+            detail = format_ago(now - last_played)
+        else:
+            detail = f"{plays} plays, {completions / plays:.0%} played through"
+        results_tree.insert("", "end", text=f"{song_titles.get(path, path)}   ·   {detail}", values=(path, 0, 0))
+    results = results_tree.get_children()
+    if results:
+        results_tree.selection_set(results[0])
+
+def close_history():
+    global history_view
+    if history_view is None:
+        return
+    history_view = None
+    results_tree.pack_forget()
+    tree.pack(expand=True, fill="both", padx=10, pady=(5, 5), before=queue_frame)
 
 custom_frame = None
 custom_song_path = None
@@ -309,22 +1045,30 @@ def on_c_pressed():
         fade_entry.pack(pady=(0,10))
         custom_window_widgets.extend([fade_lbl, fade_entry])
 
+        # Loop and presets
+        loop_var = tk.BooleanVar(value=False)
+        loop_check = tk.Checkbutton(left_frame, text="Loop", variable=loop_var, fg=TEXT_COLOR, bg=PANEL_BG,
+                                    selectcolor=DARK_BG, activebackground=PANEL_BG)
+        loop_check.pack(pady=(0,5))
+        presets = library_index.clip_presets(sel_path)
+        preset_box = ttk.Combobox(left_frame, values=list(presets), state="readonly")
+        preset_box.set("Presets" if presets else "No presets")
+        preset_box.pack(pady=(0,5))
+        preset_box.bind("<<ComboboxSelected>>",
+                        lambda e: load_clip_preset(presets[preset_box.get()], start_entry, end_entry, fade_entry, loop_var))
+        custom_window_widgets.extend([loop_check, preset_box])
+
         # Play button
-        play_btn = ttk.Button(left_frame, text="▶ Play Custom", command=lambda: play_custom(sel_path, start_entry, end_entry, fade_entry))
-        play_btn.pack(pady=(0,10))
-        custom_window_widgets.append(play_btn)
+        play_btn = ttk.Button(left_frame, text="▶ Play Custom", command=lambda: play_custom(sel_path, start_entry, end_entry, fade_entry, loop_var))
+        play_btn.pack(pady=(0,5))
+        save_btn = ttk.Button(left_frame, text="Save Preset",
+                              command=lambda: save_clip_preset(sel_path, presets, preset_box, start_entry, end_entry, fade_entry, loop_var))
+        save_btn.pack(pady=(0,10))
+        custom_window_widgets.extend([play_btn, save_btn])
 
         custom_window_open = True
 
-def play_custom(path, start_entry, end_entry, fade_entry):
-    global paused, pause_cond
-
-    # Pause current song first
-    if pygame.mixer.music.get_busy():
-        pygame.mixer.music.pause()
-        paused = True
-        pause_cond = False
-
+def read_clip(path, start_entry, end_entry, fade_entry):
     try:
         start_time_sec = float(start_entry.get())
     except:
@@ -332,35 +1076,43 @@ def play_custom(path, start_entry, end_entry, fade_entry):
     try:
         end_time_sec = float(end_entry.get())
     except:
-        end_time_sec = get_song_length(path)
+        end_time_sec = engine.length_of(path)
     try:
         fade_time_sec = float(fade_entry.get())
     except:
         fade_time_sec = 0
+    return start_time_sec, end_time_sec, fade_time_sec
 
-    # Play song from start_time_sec
-    pygame.mixer.music.load(path)
-    pygame.mixer.music.play(start=start_time_sec)
-    paused = False
-    pause_cond = True
-
-    # Schedule fade out if needed
-    if fade_time_sec > 0:
-        root.after(int((end_time_sec - start_time_sec - fade_time_sec) * 1000),
-                   lambda: pygame.mixer.music.fadeout(int(fade_time_sec * 1000)))
-    
-    # Schedule pause at end_time
-    root.after(int((end_time_sec - start_time_sec) * 1000), lambda: pause_custom_play(path))
-
-def pause_custom_play(path):
-    global paused, pause_cond
-    pygame.mixer.music.pause()
-    paused = True
-    pause_cond = False
+def play_custom(path, start_entry, end_entry, fade_entry, loop_var):
+    # Pause current song first
+    if engine.busy():
+        engine.hold()
+    start_time_sec, end_time_sec, fade_time_sec = read_clip(path, start_entry, end_entry, fade_entry)
+    # Fade and end (or loop back) are timed against the song position.
+    if clip_scheduler.play(path, start_time_sec, end_time_sec, fade_time_sec, loop_var.get()):
+        ticks.wake("audio")
+
+def load_clip_preset(preset, start_entry, end_entry, fade_entry, loop_var):
+    start, end, fade, loop = preset
+    for entry, value in ((start_entry, start), (end_entry, end), (fade_entry, fade)):
+        entry.delete(0, "end")
+        entry.insert(0, f"{value:g}")
+    loop_var.set(loop)
+
+def save_clip_preset(path, presets, preset_box, start_entry, end_entry, fade_entry, loop_var):
+    start, end, fade = read_clip(path, start_entry, end_entry, fade_entry)
+    name = f"{format_time(start)}–{format_time(end)}" + (" (loop)" if loop_var.get() else "")
+    library_index.save_clip_preset(path, name, start, end, fade, loop_var.get())
+    presets[name] = (start, end, fade, loop_var.get())
+    preset_box.config(values=list(presets))
+    preset_box.set(name)
 
 
 # --- Key press handler ---
+@recorder.timed("key.press")
 def on_key_press_tree(event):
+    if root.focus_get() is search_entry:
+        return  # typing a search
     key = event.keysym.lower()
     if key == "s":
         move_selection(1)
@@ -374,29 +1126,129 @@ def on_key_press_tree(event):
         seek(5)
     elif key == "r":
         randomize_and_play()
+    elif key == "f":
+        shuffle_current_folder()
     elif key == "p":
         path = find_path_of_current_selection()
-        if pause_cond:  
+        if engine.playing:
             # If playing, just save position & pause (do not start a new song)
-            save_resume_position(path)
-        else:
+            engine.pause(path)
+        elif path:
             # If paused, resume from last position
-            pos = resume_positions.get(path, 0)
-            play_song_from_path(path, position=pos)
+            engine.play(path, engine.resume_positions.get(path, 0))
     elif key == "q":
         add_to_queue()
     elif key == "x":
         remove_from_queue()
+    elif key == "c":
+        on_c_pressed()
+    elif key == "slash":
+        focus_search()
+    elif key == "h":
+        show_history("recent")
+    elif key == "m":
+        show_history("most")
+    elif key == "i":
+        toggle_perf_overlay()
 
 # --- Random play ---
 def randomize_and_play():
-    all_songs = sum(folder_structure.values(), [])
-    if all_songs:
-        play_song_from_path(random.choice(all_songs))
+    engine.shuffle()
+
+def shuffle_current_folder():
+    # The playing song's folder, or the selected one if nothing is playing.
+    if engine.current_track is not None:
+        folder = tracks.folder_of[engine.current_track]
+    else:
+        view = song_view()
+        sel = view.selection()
+        if not sel:
+            return
+        fullpath, _, index = view.item(sel[0], "values")
+        folder = os.path.dirname(fullpath) if int(index) >= 0 else fullpath
+    engine.shuffle(folder)
+
+# --- Performance overlay ---
+perf_window = None
+perf_text = None
+perf_status = None
+PERF_REFRESH = 500  # ms
+
+def toggle_perf_overlay():
+    global perf_window, perf_text, perf_status
+    if perf_window is not None:
+        perf_window.destroy()
+        perf_window = None
+        if profiler.running:
+            profiler.stop(perf_file("prof"))
+        recorder.enabled = INSTRUMENT
+        if not INSTRUMENT:
+            lag_probe.stop()
+        return
+    recorder.enabled = True
+    lag_probe.start()
+    perf_window = tk.Toplevel(root)
+    perf_window.title("Performance")
+    perf_window.configure(bg=DARK_BG)
+    perf_window.protocol("WM_DELETE_WINDOW", toggle_perf_overlay)
+    perf_text = tk.Label(perf_window, font=("Consolas", 9), fg=TEXT_COLOR, bg=DARK_BG, justify="left", anchor="nw")
+    perf_text.pack(expand=True, fill="both", padx=10, pady=(10, 5))
+    buttons = tk.Frame(perf_window, bg=DARK_BG)
+    buttons.pack(fill="x", padx=10, pady=(0, 5))
+    ttk.Button(buttons, text="Reset", command=recorder.reset).pack(side="left")
+    ttk.Button(buttons, text="Save JSON", command=save_perf_report).pack(side="left", padx=5)
+    profile_button = ttk.Button(buttons, text="Start profile")
+    profile_button.config(command=lambda: toggle_profiler(profile_button))
+    profile_button.pack(side="left")
+    perf_status = tk.Label(perf_window, text="", font=("Segoe UI", 9), fg=SECONDARY_TEXT, bg=DARK_BG, anchor="w")
+    perf_status.pack(fill="x", padx=10, pady=(0, 10))
+    refresh_perf_overlay()
+
+def refresh_perf_overlay():
+    if perf_window is None:
+        return
+    perf_text.config(text=recorder.report())
+    root.after(PERF_REFRESH, refresh_perf_overlay)
+
+def perf_file(extension):
+    cache_dir = os.path.join(os.path.expanduser("~"), ".cache", "music_player")
+    os.makedirs(cache_dir, exist_ok=True)
+    return os.path.join(cache_dir, time.strftime(f"perf-%Y%m%d-%H%M%S.{extension}"))
+
+def save_perf_report():
+    perf_status.config(text=f"Saved {recorder.dump(perf_file('json'))}")
+
+def toggle_profiler(button):
+    if profiler.running:
+        path = perf_file("prof")
+        text_path = profiler.stop(path)
+        perf_status.config(text=f"Profile saved to {path}, top functions in {os.path.basename(text_path)}")
+        button.config(text="Start profile")
+    else:
+        profiler.start()
+        perf_status.config(text="Profiling…")
+        button.config(text="Stop profile")
 
 # --- Close ---
 def on_close():
-    pygame.mixer.music.stop()
+    save_position()
+    if session_journal:
+        session_journal.close()
+    if play_history:
+        play_history.close()
+    engine.stop()
+    if predecode_cache:
+        predecode_cache.close()
+    if loudness_analyzer:
+        loudness_analyzer.stop()
+    pool = live_decoder_pool()
+    if pool:
+        pool.shutdown(wait=False, cancel_futures=True)
+    duration_prober.stop()
+    if library_watcher:
+        library_watcher.stop()
+    if library_index:
+        library_index.close()
     root.destroy()
 
 # --- UI Setup ---
@@ -437,36 +1289,94 @@ time_label.pack()
 
 seek_bar = ttk.Scale(left_frame, from_=0, to=100, orient="horizontal")
 seek_bar.pack(fill="x", padx=20, pady=10)
+seek_bar.bind("<ButtonPress-1>", on_seek_press)
 seek_bar.bind("<ButtonRelease-1>", on_seek)
 
+waveform_canvas = tk.Canvas(left_frame, height=48, bg=PANEL_BG, highlightthickness=0)
+if WAVEFORM:
+    waveform_canvas.pack(fill="x", padx=20, pady=(0, 10))
+waveform_canvas.bind("<Button-1>", on_waveform_click)
+waveform_canvas.bind("<Configure>", on_waveform_resize)
+
 # Right panel
 right_frame = tk.Frame(main_frame, bg=PANEL_BG)
 right_frame.pack(side="right", fill="both", expand=True)
 
 # Song list
+scan_status_label = tk.Label(right_frame, text="", font=("Segoe UI", 9),
+                             bg=PANEL_BG, fg=SECONDARY_TEXT, anchor="w")
+scan_status_label.pack(fill="x", padx=10, pady=(8, 0))
+
+search_var = tk.StringVar()
+search_entry = tk.Entry(right_frame, textvariable=search_var, font=("Segoe UI", 10), bg=DARK_BG,
+                        fg=TEXT_COLOR, insertbackground=TEXT_COLOR, relief="flat")
+search_entry.pack(fill="x", padx=10, pady=(5, 0))
+search_var.trace_add("write", on_search_changed)
+
 tree = ttk.Treeview(right_frame, columns=("fullpath", "depth", "index"), show="tree")
-tree.pack(expand=True, fill="both", padx=10, pady=(10, 5))
-scan_music_directory(PATH)
+tree.pack(expand=True, fill="both", padx=10, pady=(5, 5))
+results_tree = ttk.Treeview(right_frame, columns=("fullpath", "depth", "index"), show="tree")  # shown while searching
+clip_scheduler.root = root
+ticks.root = root
+lag_probe = LagProbe(root, recorder)
+if INSTRUMENT:
+    lag_probe.start()
+start_background_scan(PATH)
+if HISTORY:
+    play_history = PlayHistory(library_index).start()
 
 # Queue list
-queue_tree = ttk.Treeview(right_frame, columns=("fullpath",), show="tree", height=6)
-queue_tree.pack(fill="x", padx=10, pady=(0, 10))
+queue_frame = tk.Frame(right_frame, bg=PANEL_BG)
+queue_frame.pack(fill="x", padx=10, pady=(0, 10))
+queue_tree = ttk.Treeview(queue_frame, columns=("fullpath",), show="tree", height=QUEUE_ROWS)
+queue_scrollbar = ttk.Scrollbar(queue_frame, orient="vertical", command=on_queue_scroll)
+queue_scrollbar.pack(side="right", fill="y")
+queue_tree.pack(side="left", fill="x", expand=True)
+queue_tree.bind("<<TreeviewSelect>>", on_queue_select)
+queue_tree.bind("<Button-1>", on_queue_click)
+queue_tree.bind("<Control-Button-1>", lambda event: None)  # adds to the selection
+queue_tree.bind("<Shift-Button-1>", lambda event: None)
+for wheel in ("<MouseWheel>", "<Button-4>", "<Button-5>"):
+    queue_tree.bind(wheel, on_queue_wheel)
 
 randomize_button = ttk.Button(right_frame, text="🔀 Random", command=randomize_and_play)
 randomize_button.pack(side="bottom", pady=10, padx=10, anchor="e")
 
 # Bindings
-tree.bind("<<TreeviewSelect>>", lambda e: None)
+tree.bind("<<TreeviewSelect>>", on_selection_changed)
+results_tree.bind("<<TreeviewSelect>>", on_selection_changed)
+tree.bind("<<TreeviewOpen>>", on_tree_open)
+tree.bind("<<TreeviewClose>>", on_tree_close)
+root.bind("<<LibraryUpdated>>", lambda event: ticks.wake("library"))
 root.bind("w", on_key_press_tree)
 root.bind("s", on_key_press_tree)
 root.bind("a", on_key_press_tree)
 root.bind("d", on_key_press_tree)
 root.bind("<space>", on_key_press_tree)
 root.bind("r", on_key_press_tree)
+root.bind("f", on_key_press_tree)
 root.bind("p", on_key_press_tree)
 root.bind("q", on_key_press_tree)
 root.bind("x", on_key_press_tree)
-root.bind("c", lambda e: on_c_pressed())
-
-update_seek_bar()
+root.bind("c", on_key_press_tree)
+root.bind("/", on_key_press_tree)
+root.bind("h", on_key_press_tree)
+root.bind("m", on_key_press_tree)
+root.bind("i", on_key_press_tree)
+search_entry.bind("<Return>", play_search_result)
+search_entry.bind("<Down>", focus_results)
+search_entry.bind("<Escape>", clear_search)
+results_tree.bind("<Escape>", clear_search)
+results_tree.bind("<Return>", play_search_result)
+results_tree.bind("<Double-1>", play_search_result)
+
+root.bind("<Map>", on_visibility_changed)
+root.bind("<Unmap>", on_visibility_changed)
+
+ticks.add("seek_bar", tick_seek_bar, visual=True)
+ticks.add("audio", pump_audio_events)
+ticks.add("probe", drain_probe_results)
+ticks.add("waveforms", drain_waveforms, visual=True)
+ticks.add("loudness", drain_loudness_results)
+ticks.add("history", draw_history_when_written)
 root.mainloop()
@@ -0,0 +1,43 @@
+import queue
+import sqlite3
+import threading
+
+
+class BackgroundRuns:
+    # Base for the components that work through a list of songs off the Tk
+    # thread (DurationProber, LoudnessAnalyzer): each run gets a thread of
+    # its own, saves what it finds to the library index and posts rows to
+    # `results` for the Tk side to drain. Subclasses implement _work().
+    def __init__(self):
+        self.results = queue.Queue()
+        self.running = 0  # runs not finished yet, so the Tk side knows when to stop polling
+        self._running_lock = threading.Lock()  # started on the Tk thread, finished on the run's own
+        self._stop = threading.Event()
+
+    def _start(self, *args):
+        with self._running_lock:
+            self.running += 1
+        threading.Thread(target=self._run, args=args, daemon=True).start()
+
+    def stop(self):
+        self._stop.set()
+
+    def _run(self, *args):
+        try:
+            self._work(*args)
+        finally:
+            with self._running_lock:
+                self.running -= 1
+
+    def _work(self, *args):
+        raise NotImplementedError
+
+    def _post(self, rows, save=None):
+        # Runs on the run's thread: `save` writes the batch to the index.
+        if save and rows:
+            try:
+                save(rows)
+            except sqlite3.Error:
+                pass  # index closed or locked: worked out again next launch
+        for row in rows:
+            self.results.put(row)
@@ -0,0 +1,115 @@
+import os
+import sys
+import time
+import heapq
+import argparse
+import tempfile
+
+os.environ.setdefault("SDL_AUDIODRIVER", "dummy")
+os.environ.setdefault("SDL_VIDEODRIVER", "dummy")
+os.environ.setdefault("PYGAME_HIDE_SUPPORT_PROMPT", "1")
+
+import pygame
+
+from common import write_silent_mp3, emit
+from track_table import TrackTable
+from player_engine import PlayerEngine
+from clip_scheduler import ClipScheduler
+
+SONG_END = pygame.USEREVENT + 1
+
+
+class RealtimeRoot:
+    # Runs after() callbacks at their due time, like Tk's event loop, with
+    # `busy_ms` of other work every 10 ms to stand in for a loaded UI.
+    def __init__(self, busy_ms=0):
+        self.timers = []
+        self.count = 0
+        self.busy_ms = busy_ms
+
+    def after(self, ms, callback, *args):
+        self.count += 1
+        heapq.heappush(self.timers, (time.perf_counter() + ms / 1000, self.count, callback, args))
+        return self.count
+
+    def after_cancel(self, timer_id):
+        self.timers = [t for t in self.timers if t[1] != timer_id]
+        heapq.heapify(self.timers)
+
+    def run(self, seconds):
+        end = time.perf_counter() + seconds
+        next_load = time.perf_counter()
+        while time.perf_counter() < end:
+            now = time.perf_counter()
+            if self.busy_ms and now >= next_load:
+                while time.perf_counter() < now + self.busy_ms / 1000:
+                    pass
+                next_load = now + 0.010
+                continue
+            if self.timers and self.timers[0][0] <= now:
+                _, _, callback, args = heapq.heappop(self.timers)
+                callback(*args)
+            else:
+                time.sleep(0.0005)
+
+
+def summary(errors):
+    errors = sorted(abs(e) * 1000 for e in errors) or [0.0]
+    return {"mean_ms": round(sum(errors) / len(errors), 2), "max_ms": round(errors[-1], 2)}
+
+
+def old_clip(engine, root, path, start, end, errors):
+    # play_custom before: a wall-clock root.after for the end of the clip.
+    engine.play_segment(path, start)
+
+    def stop():
+        errors.append(start + engine.mixer.get_pos() / 1000 - end)
+        engine.hold()
+    root.after(int((end - start) * 1000), stop)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Custom playback: clip end accuracy, wall-clock timers vs. ClipScheduler")
+    parser.add_argument("--clips", type=int, default=10)
+    parser.add_argument("--length", type=float, default=1.5, help="seconds per clip")
+    parser.add_argument("--busy-ms", default="0,8", help="simulated UI work per 10 ms")
+    args = parser.parse_args()
+
+    pygame.mixer.init()
+    pygame.display.init()
+    pygame.mixer.music.set_endevent(SONG_END)
+    results = []
+    with tempfile.TemporaryDirectory() as tmp:
+        path = os.path.join(tmp, "song.mp3")
+        write_silent_mp3(path, 2300)  # ~60 s
+        tracks = TrackTable()
+        tracks.add(tmp, path)
+        for busy in (int(b) for b in args.busy_ms.split(",")):
+            engine = PlayerEngine(tracks, {}, SONG_END)
+            root = RealtimeRoot(busy)
+            old = []
+            for i in range(args.clips):
+                start = 5.0 + i
+                old_clip(engine, root, path, start, start + args.length, old)
+                root.run(args.length + 0.1)
+
+            scheduler = ClipScheduler(engine, root)
+            for i in range(args.clips):
+                start = 5.0 + i
+                scheduler.play(path, start, start + args.length, fade=0.5)
+                root.run(args.length + 0.1)
+            new = [late for action, late in scheduler.lateness if action == "end"]
+
+            scheduler.play(path, 5.0, 5.0 + args.length / 2, loop=True)
+            root.run(args.length / 2 * args.clips + 0.1)
+            loops = [late for action, late in scheduler.lateness if action == "end"][len(new):]
+            scheduler.cancel()
+            engine.stop()
+            results.append({"busy_ms_per_10ms": busy, "wall_clock_after": summary(old),
+                            "clip_scheduler": summary(new), "loop_restarts": summary(loops),
+                            "loop_restart_count": len(loops)})
+    emit({"clips": args.clips, "clip_length_s": args.length, "results": results})
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,93 @@
+import os
+import sys
+import time
+import argparse
+import tempfile
+
+os.environ.setdefault("SDL_AUDIODRIVER", "dummy")
+os.environ.setdefault("SDL_VIDEODRIVER", "dummy")
+os.environ.setdefault("PYGAME_HIDE_SUPPORT_PROMPT", "1")
+
+import pygame
+
+from common import write_silent_mp3, emit
+from track_table import TrackTable
+from player_engine import PlayerEngine
+from crossfade import Crossfader
+
+SONG_END = pygame.USEREVENT + 1
+FRAMES_PER_SECOND = 38.3  # 26.1 ms MPEG frames
+PUMP_MS = 10  # Player_005's AUDIO_EVENT_INTERVAL
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Crossfade: decode cost, overlap timing and play order")
+    parser.add_argument("--songs", type=int, default=4, help="songs in the folder")
+    parser.add_argument("--queued", type=int, default=2, help="songs from another folder queued first")
+    parser.add_argument("--length", type=float, default=8.0, help="seconds per song")
+    parser.add_argument("--seconds", type=float, default=2.0, help="crossfade length")
+    parser.add_argument("--curve", default="equal_power")
+    args = parser.parse_args()
+
+    pygame.mixer.init()
+    pygame.display.init()
+    pygame.mixer.music.set_endevent(SONG_END)
+    with tempfile.TemporaryDirectory() as tmp:
+        tracks = TrackTable()
+        folders = {}
+        for folder, count in (("album", args.songs), ("other", args.queued)):
+            os.makedirs(os.path.join(tmp, folder))
+            paths = []
+            for i in range(count):
+                path = os.path.join(tmp, folder, f"{i:02d}.mp3")
+                write_silent_mp3(path, int(args.length * FRAMES_PER_SECOND))
+                paths.append(path)
+            tracks.add_folder(os.path.join(tmp, folder), paths)
+            folders[folder] = paths
+
+        started = []
+        overlaps = []
+        fader = Crossfader(args.seconds, args.curve)
+        # order="folder": playback stops at the album's end instead of going on into "other".
+        engine = PlayerEngine(tracks, {}, SONG_END, listener=lambda event, value: event == "started" and started.append(value),
+                              crossfader=fader, order="folder")
+        engine.play(folders["album"][0])
+        for path in folders["other"]:
+            engine.enqueue(path)
+        # Queued songs first, then back to the song after the first one.
+        expected = [folders["album"][0]] + folders["other"] + folders["album"][1:]
+
+        gaps = []
+        last = time.perf_counter()
+        fade_started = None
+        deadline = last + (args.songs + args.queued) * args.length + 5
+        while time.perf_counter() < deadline and (len(started) < len(expected) or engine.busy()):
+            time.sleep(PUMP_MS / 1000)
+            now = time.perf_counter()
+            gaps.append(now - last)
+            last = now
+            was_fading = fader.fading is not None
+            if not engine.pump() and len(started) >= len(expected):
+                break
+            if fader.fading and not was_fading:
+                fade_started = time.perf_counter()
+            elif was_fading and not fader.fading and fade_started:
+                overlaps.append(time.perf_counter() - fade_started)
+                fade_started = None
+        engine.stop()
+
+    commands = [command for command, _ in engine.latencies]
+    emit({
+        "songs": len(expected), "song_length_s": args.length, "crossfade_s": args.seconds, "curve": args.curve,
+        "order_ok": started[:len(expected)] == expected,
+        "crossfades": commands.count("crossfade"),
+        "fallback_transitions": len(expected) - 1 - commands.count("crossfade"),
+        "overlap_s": {"min": round(min(overlaps), 3), "max": round(max(overlaps), 3)} if overlaps else None,
+        "decode_pair_ms": [round(s * 1000, 1) for s in fader.decode_seconds],
+        "hand_over_ms": round(max((s for c, s in engine.latencies if c == "crossfade"), default=0) * 1000, 2),
+        "max_pump_gap_ms": round(max(gaps) * 1000, 1),
+    })
+
+
+if __name__ == "__main__":
+    sys.exit(main())
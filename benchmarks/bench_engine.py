@@ -0,0 +1,117 @@
+import os
+import sys
+import time
+import random
+import argparse
+import tempfile
+from collections import defaultdict
+
+os.environ.setdefault("SDL_AUDIODRIVER", "dummy")
+os.environ.setdefault("SDL_VIDEODRIVER", "dummy")
+os.environ.setdefault("PYGAME_HIDE_SUPPORT_PROMPT", "1")
+
+import pygame
+
+from common import make_library, emit
+from library_index import LibraryIndex
+from track_table import TrackTable
+from player_engine import PlayerEngine
+
+SONG_END = pygame.USEREVENT + 1
+
+
+def percentile(values, p):
+    values = sorted(values)
+    return values[min(len(values) - 1, int(len(values) * p))]
+
+
+def build_engine(library, index_path):
+    index = LibraryIndex(library, index_path)
+    tracks = TrackTable()
+    song_lengths = {}
+    for folder, songs in index.iter_scan(os.path.basename):
+        tracks.add_folder(folder, [path for path, _, _ in songs])
+        song_lengths.update((path, duration) for path, _, duration in songs if duration is not None)
+    index.close()
+    return PlayerEngine(tracks, song_lengths, SONG_END), [p for p in tracks.paths if p]
+
+
+def load_test(engine, paths, commands, rng):
+    # A random mix of what a user does, each command straight after the last.
+    for _ in range(commands):
+        roll = rng.random()
+        if roll < 0.3 or not engine.current_path:
+            engine.play(rng.choice(paths))
+        elif roll < 0.45:
+            engine.next()
+        elif roll < 0.55:
+            engine.prev()
+        elif roll < 0.7:
+            engine.seek(rng.choice((-5, 5)))
+        elif roll < 0.85:
+            engine.toggle()
+        elif roll < 0.95:
+            engine.enqueue(rng.choice(paths))
+        elif engine.queue:
+            engine.dequeue(engine.queue.peek()[0])
+        engine.pump()
+
+
+def play_through(engine, paths, songs):
+    # Lets `songs` tracks of one folder end on their own; the engine has to
+    # move on through its end-event handling alone.
+    engine.queue.clear()
+    engine.queue_origin = None
+    folder = engine.tracks.folder_of[engine.tracks.id_of(paths[0])]
+    first = engine.tracks.path_of(engine.tracks.folders[folder][0])
+    engine.play(first, position=0.001)
+    started = [first]
+    deadline = time.monotonic() + 5 + songs
+    while len(started) < songs and time.monotonic() < deadline:
+        time.sleep(0.005)
+        engine.pump()
+        if engine.current_path != started[-1]:
+            started.append(engine.current_path)
+    return started == [engine.tracks.path_of(t) for t in engine.tracks.folders[folder][:len(started)]], len(started)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="PlayerEngine without a UI: command latency under load")
+    parser.add_argument("--tracks", type=int, default=2000)
+    parser.add_argument("--commands", type=int, default=2000)
+    parser.add_argument("--frames", type=int, default=20, help="MP3 frames per track (26 ms each)")
+    args = parser.parse_args()
+
+    pygame.mixer.init()
+    pygame.display.init()
+    pygame.mixer.music.set_endevent(SONG_END)
+    with tempfile.TemporaryDirectory() as tmp:
+        library = make_library(os.path.join(tmp, "library"), args.tracks, 20, frames=args.frames)
+        engine, paths = build_engine(library, os.path.join(tmp, "index.sqlite"))
+        engine.latencies = type(engine.latencies)(maxlen=args.commands * 2)
+
+        start = time.perf_counter()
+        load_test(engine, paths, args.commands, random.Random(3))
+        elapsed = time.perf_counter() - start
+
+        by_command = defaultdict(list)
+        for command, seconds in engine.latencies:
+            by_command[command].append(seconds * 1000)
+        in_order, advanced = play_through(engine, paths, 5)
+        engine.stop()
+
+    emit({
+        "audio_driver": os.environ["SDL_AUDIODRIVER"],
+        "tracks": args.tracks,
+        "commands": args.commands,
+        "commands_per_s": round(args.commands / elapsed),
+        "latency_ms": {command: {"n": len(ms), "p50": round(percentile(ms, 0.5), 3),
+                                 "p95": round(percentile(ms, 0.95), 3), "max": round(max(ms), 3)}
+                       for command, ms in sorted(by_command.items())},
+        "auto_advance": {"songs": advanced, "in_folder_order": in_order},
+    })
+    pygame.quit()
+
+
+if __name__ == "__main__":
+    sys.exit(main())
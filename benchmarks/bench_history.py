@@ -0,0 +1,104 @@
+import os
+import sys
+import time
+import random
+import argparse
+import tempfile
+
+from common import emit
+from library_index import LibraryIndex
+from play_history import PlayHistory
+
+
+def percentile(values, p):
+    values = sorted(values)
+    return values[min(len(values) - 1, int(len(values) * p))]
+
+
+def synthetic_events(songs, count, rng):
+    # A year of listening: every play starts, most are played through or
+    # skipped, some are seeked in.
+    now = time.time()
+    at = now - 365 * 86400
+    step = 365 * 86400 / count
+    events = []
+    while len(events) < count:
+        path = rng.choice(songs) if rng.random() < 0.7 else songs[int(rng.paretovariate(1.2)) % len(songs)]
+        at += step
+        events.append((at, path, "start", 0.0))
+        if rng.random() < 0.2:
+            events.append((at + 30, path, "seek", rng.uniform(0, 200)))
+        if rng.random() < 0.7:
+            events.append((at + 200, path, "complete", 200.0))
+        else:
+            events.append((at + 40, path, "skip", 40.0))
+    return events[:count]
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Play history: view load times over a large log, logging cost on the UI thread")
+    parser.add_argument("--events", type=int, default=1000000)
+    parser.add_argument("--songs", type=int, default=20000)
+    parser.add_argument("--batch", type=int, default=5000, help="events per write while filling the log")
+    parser.add_argument("--logs", type=int, default=2000, help="events logged through PlayHistory")
+    args = parser.parse_args()
+
+    rng = random.Random(1)
+    songs = [f"/music/Artist{i // 100:04d}/Album/{i:05d}_Track.mp3" for i in range(args.songs)]
+    with tempfile.TemporaryDirectory() as tmp:
+        index = LibraryIndex(tmp, os.path.join(tmp, "index.sqlite"))
+        events = synthetic_events(songs, args.events, rng)
+        start = time.perf_counter()
+        for i in range(0, len(events), args.batch):
+            index.record_plays(events[i:i + args.batch])
+        fill_s = time.perf_counter() - start
+
+        views = {}
+        for name, view in (("recently_played", index.recently_played), ("most_played", index.most_played)):
+            times = []
+            for _ in range(20):
+                before = time.perf_counter()
+                rows = view(200)
+                times.append((time.perf_counter() - before) * 1000)
+            views[name] = {"rows": len(rows), "p50_ms": round(percentile(times, 0.5), 3),
+                           "max_ms": round(max(times), 3)}
+
+        # What the Tk thread pays per event, with the writer flushing behind it.
+        history = PlayHistory(index).start()
+        costs = []
+        for _ in range(args.logs):
+            before = time.perf_counter()
+            history.log(rng.choice(("start", "complete", "skip", "seek")), rng.choice(songs), 12.5)
+            costs.append(time.perf_counter() - before)
+            time.sleep(0.001)
+        # Showing a view right after a play: the Tk thread asks for a flush
+        # and draws once the writer has done it.
+        before = time.perf_counter()
+        ticket = history.request_flush()
+        request_us = (time.perf_counter() - before) * 1e6
+        while history.flushed < ticket:
+            time.sleep(0.001)
+        flush_ms = (time.perf_counter() - before) * 1000
+        history.close()
+
+        # Totals kept up to date match a full pass over the log.
+        counted = index.db.execute(
+            "SELECT count(*) FROM play_events WHERE event = 'start'").fetchone()[0]
+        summed = index.db.execute("SELECT sum(plays) FROM play_stats").fetchone()[0]
+        total = index.db.execute("SELECT count(*) FROM play_events").fetchone()[0]
+        db_mb = os.path.getsize(index.index_path) / 2 ** 20
+        index.close()
+
+    emit({
+        "events": total, "songs": args.songs, "fill_s": round(fill_s, 1),
+        "views": views, "log_us": {"p50": round(percentile(costs, 0.5) * 1e6, 2),
+                                   "p99": round(percentile(costs, 0.99) * 1e6, 2),
+                                   "max": round(max(costs) * 1e6, 1)},
+        "writer_batches": history.batches, "flush_request_us": round(request_us, 1),
+        "flush_before_view_ms": round(flush_ms, 2),
+        "totals_match_log": counted == summed, "index_mb": round(db_mb, 1),
+    })
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,65 @@
+import os
+import sys
+import argparse
+import tempfile
+
+from common import make_library, load_player_functions, timed, emit
+from library_index import LibraryIndex
+
+
+def walk_and_format(base_path, format_song_title):
+    # What Player_005 did on every launch before the index existed.
+    folders = []
+    for root_dir, dirs, files_in_dir in os.walk(base_path):
+        songs = [(os.path.join(root_dir, f), format_song_title(f))
+                 for f in sorted(files_in_dir) if f.endswith(".mp3")]
+        folders.append((root_dir, songs))
+    return folders
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Cold vs. warm library scan times")
+    parser.add_argument("--tracks", type=int, default=20000)
+    parser.add_argument("--per-folder", type=int, default=20)
+    args = parser.parse_args()
+
+    player = load_player_functions("Player_005.py", {"format_song_title"})
+    format_song_title = player["format_song_title"]
+
+    with tempfile.TemporaryDirectory() as tmp:
+        library = make_library(os.path.join(tmp, "library"), args.tracks, args.per_folder)
+        index_path = os.path.join(tmp, "index.sqlite")
+
+        walk_time, walked = timed(walk_and_format, library, format_song_title)
+
+        index = LibraryIndex(library, index_path)
+        cold_time, scanned = timed(index.scan, format_song_title)
+        index.close()
+
+        index = LibraryIndex(library, index_path)
+        warm_time, _ = timed(index.scan, format_song_title)
+        warm_stats = dict(index.stats)
+        index.close()
+
+        # One new album dropped into the library between launches.
+        changed = os.path.dirname(scanned[-1][1][0][0]) if scanned[-1][1] else library
+        open(os.path.join(changed, "99_NewArrival.mp3"), "wb").close()
+        index = LibraryIndex(library, index_path)
+        touched_time, _ = timed(index.scan, format_song_title)
+        touched_stats = dict(index.stats)
+        index.close()
+
+    emit({
+        "tracks": args.tracks,
+        "folders": len(walked),
+        "os_walk_and_format_s": round(walk_time, 4),
+        "index_cold_s": round(cold_time, 4),
+        "index_warm_s": round(warm_time, 4),
+        "index_warm_stats": warm_stats,
+        "index_one_folder_changed_s": round(touched_time, 4),
+        "index_one_folder_changed_stats": touched_stats,
+    })
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,79 @@
+import os
+import sys
+import time
+import wave
+import argparse
+import tempfile
+
+os.environ.setdefault("SDL_AUDIODRIVER", "dummy")
+os.environ.setdefault("PYGAME_HIDE_SUPPORT_PROMPT", "1")
+
+import numpy as np
+
+from common import write_silent_mp3, emit
+from decoder import start_pool
+from loudness import LoudnessAnalyzer
+from player_engine import gain_to_volume
+
+FRAMES_PER_MINUTE = 2297  # 26.1 ms MPEG frames
+
+
+def write_tone(path, amplitude, seconds=5, rate=44100):
+    # 440 Hz sine; pygame decodes WAV the same way as MP3.
+    t = np.arange(int(seconds * rate)) / rate
+    samples = (np.sin(2 * np.pi * 440 * t) * amplitude * 32767).astype(np.int16)
+    with wave.open(path, "wb") as f:
+        f.setnchannels(1)
+        f.setsampwidth(2)
+        f.setframerate(rate)
+        f.writeframes(samples.tobytes())
+
+
+def analyze_all(pool, paths):
+    analyzer = LoudnessAnalyzer()
+    start = time.perf_counter()
+    analyzer.start(pool, paths)
+    gains = {}
+    while analyzer.analyzed < len(paths):
+        time.sleep(0.01)
+    while not analyzer.results.empty():
+        path, gain = analyzer.results.get()
+        gains[path] = gain
+    return analyzer, gains, time.perf_counter() - start
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Loudness analysis throughput and gains")
+    parser.add_argument("--tracks", type=int, default=16)
+    parser.add_argument("--minutes", type=float, default=4.0)
+    parser.add_argument("--workers", type=int, default=2)
+    args = parser.parse_args()
+
+    pool = start_pool(args.workers)
+    with tempfile.TemporaryDirectory() as tmp:
+        paths = []
+        for i in range(args.tracks):
+            path = os.path.join(tmp, f"{i:03d}.mp3")
+            write_silent_mp3(path, int(args.minutes * FRAMES_PER_MINUTE))
+            paths.append(path)
+        analyzer, _, wall = analyze_all(pool, paths)
+        throughput = {"tracks": args.tracks, "minutes_each": args.minutes, "workers": args.workers,
+                      "cpus": os.cpu_count(), "wall_s": round(wall, 2),
+                      "tracks_per_s": round(args.tracks / wall, 2),
+                      "tracks_per_s_per_core": round(analyzer.rate(), 2)}
+
+        # Two tones 20 dB apart should end up 20 dB apart in gain.
+        tones = {}
+        for amplitude in (0.9, 0.09):
+            path = os.path.join(tmp, f"tone-{amplitude}.wav")
+            write_tone(path, amplitude)
+            tones[path] = amplitude
+        _, gains, _ = analyze_all(pool, list(tones))
+        levels = {f"amplitude_{tones[p]}": {"gain_db": round(g, 2), "volume": round(gain_to_volume(g), 3)}
+                  for p, g in gains.items()}
+    pool.shutdown()
+    emit({"throughput": throughput, "tones": levels})
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,106 @@
+import os
+import sys
+import random
+import argparse
+import time
+
+from common import load_player_functions, emit
+from track_table import TrackTable
+
+
+def synthetic_structure(tracks, per_folder):
+    # Paths only; navigation never touches the files.
+    structure = {}
+    for start in range(0, tracks, per_folder):
+        folder = os.path.join("/music", f"Artist{start // (per_folder * 10):05d}", f"Album_{start // per_folder:06d}")
+        structure[folder] = [os.path.join(folder, f"{i:02d}_Track{start + i}.mp3")
+                             for i in range(min(per_folder, tracks - start))]
+    return structure
+
+
+def bench_linear(structure, samples, moves):
+    # Player_004's folder navigation: scan every folder comparing basenames.
+    played = []
+    ns = {"folder_structure": structure, "play_song_from_path": played.append}
+    load_player_functions("Player_004.py", {"play_next_in_folder", "play_prev_in_folder"}, ns)
+    start = time.perf_counter()
+    for path in samples[:moves]:
+        ns["current_song"] = os.path.basename(path)
+        ns["play_next_in_folder"]()
+        ns["play_prev_in_folder"]()
+    return (time.perf_counter() - start) / (2 * moves)
+
+
+def bench_table(structure, samples, moves):
+    tracks = TrackTable()
+    for folder, songs in structure.items():
+        tracks.add_folder(folder, songs)
+    ids = [tracks.id_of(path) for path in samples[:moves]]
+    played = []
+    start = time.perf_counter()
+    for track_id in ids:
+        nxt = tracks.next_in_folder(track_id)
+        if nxt is not None:
+            played.append(tracks.path_of(nxt))
+        prv = tracks.prev_in_folder(track_id)
+        if prv is not None:
+            played.append(tracks.path_of(prv))
+    return (time.perf_counter() - start) / (2 * moves)
+
+
+def bench_order(structure, samples, moves):
+    # Library-wide play order: next/prev from the last and first song of a
+    # folder (the ones that cross into another folder), and what adding a
+    # folder in the middle of the library costs the next lookup.
+    tracks = TrackTable()
+    for folder, songs in structure.items():
+        tracks.add_folder(folder, songs)
+    edges = []
+    for path in samples[:moves]:
+        songs = tracks.folders[os.path.dirname(path)]
+        edges.append(songs[-1])
+        edges.append(songs[0])
+    start = time.perf_counter()
+    for track_id in edges:
+        tracks.step(track_id, 1)
+        tracks.step(track_id, -1)
+    crossing = (time.perf_counter() - start) / (2 * len(edges))
+
+    folders = list(structure)
+    middle = folders[len(folders) // 2]
+    start = time.perf_counter()
+    tracks.add_folder(middle + "_bonus", [middle + "_bonus/01_Bonus.mp3"])
+    tracks.step(tracks.folders[folders[-1]][0], -1)  # renumbers the ranks after it
+    update = time.perf_counter() - start
+    return crossing, update
+
+
+def main():
+    parser = argparse.ArgumentParser(description="next/prev latency, linear scan vs. track table and play order")
+    parser.add_argument("--sizes", default="10000,100000,1000000")
+    parser.add_argument("--per-folder", type=int, default=12)
+    parser.add_argument("--linear-moves", type=int, default=20)
+    parser.add_argument("--table-moves", type=int, default=100000)
+    args = parser.parse_args()
+
+    results = []
+    rng = random.Random(1)
+    for size in (int(s) for s in args.sizes.split(",")):
+        structure = synthetic_structure(size, args.per_folder)
+        all_paths = [p for songs in structure.values() for p in songs]
+        samples = [rng.choice(all_paths) for _ in range(max(args.linear_moves, args.table_moves))]
+        linear = bench_linear(structure, samples, args.linear_moves)
+        table = bench_table(structure, samples, args.table_moves)
+        crossing, update = bench_order(structure, samples, args.table_moves)
+        results.append({
+            "tracks": size,
+            "linear_scan_us": round(linear * 1e6, 2),
+            "track_table_us": round(table * 1e6, 3),
+            "cross_folder_us": round(crossing * 1e6, 3),
+            "insert_folder_ms": round(update * 1000, 3),
+        })
+    emit({"next_prev_latency": results})
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,138 @@
+import os
+import sys
+import time
+import random
+import argparse
+import tempfile
+import threading
+
+os.environ.setdefault("SDL_AUDIODRIVER", "dummy")
+os.environ.setdefault("SDL_VIDEODRIVER", "dummy")
+os.environ.setdefault("PYGAME_HIDE_SUPPORT_PROMPT", "1")
+
+import pygame
+
+from common import make_library, emit
+from track_table import TrackTable
+from player_engine import PlayerEngine
+from predecode import PredecodeCache
+
+SONG_END = pygame.USEREVENT + 1
+FRAMES_PER_MINUTE = 2297  # 26.1 ms MPEG frames
+
+
+def drop_page_cache():
+    # Makes every file read come from the disk again; needs root.
+    try:
+        os.sync()
+        with open("/proc/sys/vm/drop_caches", "w") as f:
+            f.write("3")
+        return True
+    except OSError:
+        return False
+
+
+def percentile(values, p):
+    values = sorted(values)
+    return values[min(len(values) - 1, int(len(values) * p))]
+
+
+def session(library, cache, commands, dwell, cold, seed):
+    # Skips around the way a listener does, waiting `dwell` seconds after
+    # each command (what the predecoder gets to work with), and times each
+    # command until the mixer plays.
+    tracks = TrackTable()
+    for folder, _, files in sorted(os.walk(library)):
+        songs = sorted(os.path.join(folder, f) for f in files if f.endswith(".mp3"))
+        if songs:
+            tracks.add_folder(folder, songs)
+    engine = PlayerEngine(tracks, {}, SONG_END, cache=cache)
+    rng = random.Random(seed)
+    paths = [p for p in tracks.paths if p]
+    engine.play(paths[0])
+    stalls = []  # how late 1 ms sleeps wake up while the predecoder works, like Tk's timers would
+    for _ in range(commands):
+        until = time.perf_counter() + dwell
+        while time.perf_counter() < until:
+            before = time.perf_counter()
+            time.sleep(0.001)
+            stalls.append(time.perf_counter() - before - 0.001)
+        if cold:
+            drop_page_cache()
+        roll = rng.random()
+        if roll < 0.4:
+            engine.next()
+        elif roll < 0.55:
+            engine.prev()
+        elif roll < 0.7:
+            engine.shuffle()
+        elif roll < 0.85:
+            engine.pause()
+            engine.toggle()  # resume from where it was paused
+        else:
+            engine.enqueue(rng.choice(paths))
+            engine.song_ended()  # the song ends and the queued one starts
+        engine.pump()
+    engine.stop()
+    latencies = [seconds * 1000 for command, seconds in engine.latencies if command != "enqueue"]
+    return {"p50_ms": round(percentile(latencies, 0.5), 2), "p95_ms": round(percentile(latencies, 0.95), 2),
+            "max_ms": round(max(latencies), 2), "commands": len(latencies),
+            "max_timer_stall_ms": round(max(stalls) * 1000, 1)}
+
+
+def playback_lag(cache, path, threads, seconds=10.0):
+    # How far playback falls behind the clock in `seconds` while `threads`
+    # CPU-bound Python threads run; the audio thread loses whatever time it
+    # spends waiting, e.g. for the GIL. SDL's dummy driver runs a little
+    # ahead of the clock, so without stalls this is slightly negative.
+    cache.want([path])
+    while path not in cache.entries:
+        time.sleep(0.05)
+    stop = threading.Event()
+
+    def burn():
+        while not stop.is_set():
+            sum(range(10000))
+
+    for _ in range(threads):
+        threading.Thread(target=burn, daemon=True).start()
+    pygame.mixer.music.load(cache.open(path), "wav")
+    pygame.mixer.music.play()
+    time.sleep(0.5)  # past the start-up
+    started, position = time.perf_counter(), pygame.mixer.music.get_pos()
+    time.sleep(seconds)
+    behind = time.perf_counter() - started - (pygame.mixer.music.get_pos() - position) / 1000
+    stop.set()
+    pygame.mixer.music.stop()
+    return round(behind * 1000)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Skip-to-audio latency with and without the predecode cache")
+    parser.add_argument("--tracks", type=int, default=60)
+    parser.add_argument("--minutes", type=float, default=4.0)
+    parser.add_argument("--commands", type=int, default=60)
+    parser.add_argument("--dwell", type=float, default=1.0, help="seconds between commands")
+    parser.add_argument("--budget-mb", type=int, default=256)
+    args = parser.parse_args()
+
+    pygame.mixer.init()
+    pygame.display.init()
+    cold = drop_page_cache()
+    results = {}
+    with tempfile.TemporaryDirectory() as tmp:
+        make_library(tmp, args.tracks, per_folder=12, frames=int(args.minutes * FRAMES_PER_MINUTE))
+        results["no_cache"] = session(tmp, None, args.commands, args.dwell, cold, seed=1)
+        cache = PredecodeCache(args.budget_mb * 1024 * 1024)
+        results["predecode"] = session(tmp, cache, args.commands, args.dwell, cold, seed=1)
+        results["predecode"].update(hits=cache.hits, misses=cache.misses,
+                                    cached_mb=round(cache.size / 2 ** 20, 1), cached_songs=len(cache.entries))
+        song = next(os.path.join(folder, f) for folder, _, files in sorted(os.walk(tmp)) for f in sorted(files))
+        results["playback_behind_ms"] = {f"{n}_busy_threads": playback_lag(cache, song, n) for n in (0, 8)}
+        cache.close()
+    emit({"tracks": args.tracks, "minutes_each": args.minutes, "dwell_s": args.dwell, "budget_mb": args.budget_mb,
+          "page_cache_dropped": cold, "results": results})
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,78 @@
+import os
+import sys
+import time
+import argparse
+
+from common import FakeTree, FakeWidget, load_player_functions, emit
+from track_table import TrackTable
+from player_engine import PlayerEngine
+
+FUNCTIONS = {"update_queue_view", "on_queue_scroll", "on_queue_select", "remove_from_queue",
+             "format_song_title", "save_queue", "on_engine_event", "log_play"}
+
+
+def full_rebuild(queue_tree, engine, titles):
+    # What the queue panel did before: one widget row per queued song.
+    queue_tree.delete(*queue_tree.get_children())
+    for entry_id, song_path in engine.queue:
+        queue_tree.insert("", "end", iid=str(entry_id), text=titles[song_path], values=(song_path,))
+
+
+def per_call_ms(fn, calls):
+    start = time.perf_counter()
+    for _ in range(calls):
+        fn()
+    return (time.perf_counter() - start) / calls * 1000
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Queue panel: cost of a redraw against queue length")
+    parser.add_argument("--sizes", default="10,1000,10000,100000")
+    parser.add_argument("--calls", type=int, default=200)
+    args = parser.parse_args()
+
+    tk_root = None
+    if os.environ.get("DISPLAY"):
+        import tkinter as tk
+        from tkinter import ttk
+        tk_root = tk.Tk()
+
+    def make_tree():
+        return ttk.Treeview(tk_root, columns=("fullpath",), show="tree", height=6) if tk_root else FakeTree()
+
+    results = []
+    for size in (int(s) for s in args.sizes.split(",")):
+        tracks = TrackTable()
+        folder = "/music/Artist/Album"
+        paths = [f"{folder}/{i:06d}_Track.mp3" for i in range(size)]
+        tracks.add_folder(folder, paths)
+        engine = PlayerEngine(tracks, dict.fromkeys(paths, 180.0))
+        engine.enqueue_many(paths)
+        queue_tree = make_tree()
+        ns = load_player_functions("Player_005.py", FUNCTIONS, {"PATH": "/music"}, state=True, overrides={
+            "engine": engine, "queue_tree": queue_tree, "queue_scrollbar": FakeWidget(), "session_journal": None})
+        ns["song_titles"].update((path, ns["format_song_title"](os.path.basename(path))) for path in paths)
+
+        row = {"queued": size}
+        row["redraw_ms"] = per_call_ms(ns["update_queue_view"], args.calls)
+        scroll = iter([i / args.calls for i in range(args.calls)])
+        row["scroll_ms"] = per_call_ms(lambda: ns["on_queue_scroll"]("moveto", next(scroll)), args.calls)
+
+        old_tree = make_tree()
+        calls = max(1, min(args.calls, 2000000 // max(size, 1)))
+        row["full_rebuild_ms"] = per_call_ms(lambda: full_rebuild(old_tree, engine, ns["song_titles"]), calls)
+
+        def remove_visible():
+            queue_tree.selection_set(queue_tree.get_children()[0])
+            ns["on_queue_select"]()
+            ns["remove_from_queue"]()
+        row["remove_ms"] = per_call_ms(remove_visible, min(args.calls, size))
+        row["widget_rows"] = len(queue_tree.get_children())
+
+        results.append({k: round(v, 4) if isinstance(v, float) else v for k, v in row.items()})
+
+    emit({"widget": "ttk.Treeview" if tk_root is not None else "FakeTree (no DISPLAY)", "results": results})
+
+
+if __name__ == "__main__":
+    sys.exit(main())
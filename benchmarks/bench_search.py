@@ -0,0 +1,79 @@
+import os
+import sys
+import time
+import random
+import argparse
+
+from common import emit
+from search_index import SearchIndex
+
+WORDS = ("love night heart fire dream light rain blue road home time world sky gold wild river "
+         "summer shadow dance storm moon star ghost city ocean young stone silver midnight echo "
+         "winter paradise angel thunder desert velvet crystal highway sugar neon electric honey").split()
+QUERIES = ["a", "lo", "love", "mid", "night rain", "artist01", "album 03 fire", "velvet thun",
+           "o", "zzz", "echo star sky", "part"]
+
+
+def synthetic_library(tracks, per_folder, seed=4):
+    # [(folder, label, [(path, title), ...]), ...] with word-salad titles.
+    rng = random.Random(seed)
+    folders = []
+    for start in range(0, tracks, per_folder):
+        artist = f"Artist{start // (per_folder * 10):05d} {rng.choice(WORDS).title()}"
+        label = f"{artist}/Album_{start // per_folder % 10:02d} {rng.choice(WORDS).title()}"
+        folder = "/music/" + label
+        songs = []
+        for i in range(min(per_folder, tracks - start)):
+            title = " ".join(rng.choice(WORDS).title() for _ in range(rng.randint(1, 4)))
+            songs.append((f"{folder}/{i:02d}_{title.replace(' ', '')}.mp3", f"{i:02d} {title}"))
+        folders.append((folder, label, songs))
+    return folders
+
+
+def rss_mb():
+    with open("/proc/self/statm") as f:
+        return int(f.read().split()[1]) * os.sysconf("SC_PAGE_SIZE") / 2**20
+
+
+def linear_search(folders, query):
+    # What finding a song amounts to without an index: test every title.
+    query = query.lower()
+    return [path for _, _, songs in folders for path, title in songs if query in title.lower()][:200]
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Type-to-search: index build and query latency")
+    parser.add_argument("--sizes", default="100000,1000000")
+    parser.add_argument("--per-folder", type=int, default=12)
+    parser.add_argument("--repeat", type=int, default=5)
+    args = parser.parse_args()
+
+    results = []
+    for size in (int(s) for s in args.sizes.split(",")):
+        folders = synthetic_library(size, args.per_folder)
+        before = rss_mb()
+        index = SearchIndex()
+        start = time.perf_counter()
+        for folder, label, songs in folders:
+            index.add_folder(folder, label, songs)
+        build = time.perf_counter() - start
+        row = {"tracks": size, "build_s": round(build, 2), "build_us_per_song": round(build / size * 1e6, 2),
+               "rss_delta_mb": round(rss_mb() - before, 1), "queries": {}}
+        for query in QUERIES:
+            timings = []
+            for _ in range(args.repeat):
+                start = time.perf_counter()
+                hits = index.search(query)
+                timings.append((time.perf_counter() - start) * 1000)
+            row["queries"][query] = {"hits": len(hits), "best_ms": round(min(timings), 3),
+                                     "max_ms": round(max(timings), 3)}
+        start = time.perf_counter()
+        linear_search(folders, "velvet")
+        row["linear_scan_ms"] = round((time.perf_counter() - start) * 1000, 1)
+        results.append(row)
+        print(f"{size} tracks done", file=sys.stderr)
+    emit({"per_folder": args.per_folder, "results": results})
+
+
+if __name__ == "__main__":
+    sys.exit(main())
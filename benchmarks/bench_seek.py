@@ -0,0 +1,81 @@
+import os
+import sys
+import time
+import argparse
+import tempfile
+
+os.environ.setdefault("SDL_AUDIODRIVER", "dummy")
+os.environ.setdefault("SDL_VIDEODRIVER", "dummy")
+os.environ.setdefault("PYGAME_HIDE_SUPPORT_PROMPT", "1")
+
+import pygame
+
+from common import write_silent_mp3, emit
+from track_table import TrackTable
+from player_engine import PlayerEngine
+
+SONG_END = pygame.USEREVENT + 1
+
+
+def reload_seek(engine, position):
+    # What seek() did before: reload the file and restart playback.
+    engine.play(engine.current_path, position)
+
+
+def in_place_seek(engine, position):
+    engine.seek_to(position)
+
+
+def measure(engine, path, seek, presses):
+    engine.play(path)
+    timings = []
+    position = 1.0
+    for _ in range(presses):
+        position = 1.0 if position > engine.song_length - 10 else position + 5
+        start = time.perf_counter()
+        seek(engine, position)
+        timings.append((time.perf_counter() - start) * 1000)
+    timings.sort()
+    return {"mean_ms": round(sum(timings) / len(timings), 3),
+            "p95_ms": round(timings[int(len(timings) * 0.95)], 3), "max_ms": round(timings[-1], 3)}
+
+
+def end_after_seek(engine, path, seek, remaining):
+    # Seeks to `remaining` seconds before the end and times until the song
+    # actually stops; shows the seek landed where the clock says it did.
+    engine.play(path)
+    time.sleep(0.1)
+    pygame.event.clear()
+    seek(engine, engine.song_length - remaining)
+    start = time.perf_counter()
+    while engine.busy():
+        time.sleep(0.002)
+    return round(time.perf_counter() - start, 3)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Seek latency: reload-and-restart vs. in-place set_pos")
+    parser.add_argument("--minutes", type=float, default=5, help="length of the test song")
+    parser.add_argument("--presses", type=int, default=200)
+    args = parser.parse_args()
+
+    pygame.mixer.init()
+    pygame.display.init()
+    pygame.mixer.music.set_endevent(SONG_END)
+    with tempfile.TemporaryDirectory() as tmp:
+        path = os.path.join(tmp, "long.mp3")
+        write_silent_mp3(path, int(args.minutes * 60 / 0.026))
+        tracks = TrackTable()
+        tracks.add(tmp, path)
+        engine = PlayerEngine(tracks, {}, SONG_END, gapless=False)
+        results = {"audio_driver": os.environ["SDL_AUDIODRIVER"], "song_s": round(engine.length_of(path), 1)}
+        for name, seek in (("reload", reload_seek), ("in_place", in_place_seek)):
+            results[name] = measure(engine, path, seek, args.presses)
+            results[name]["stops_after_s_when_1s_left"] = end_after_seek(engine, path, seek, 1.0)
+        engine.stop()
+    emit(results)
+    pygame.quit()
+
+
+if __name__ == "__main__":
+    sys.exit(main())
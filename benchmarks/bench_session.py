@@ -0,0 +1,87 @@
+import os
+import sys
+import json
+import time
+import random
+import argparse
+import tempfile
+
+from common import emit
+from session_journal import SessionJournal
+
+
+def percentile(values, p):
+    values = sorted(values)
+    return values[min(len(values) - 1, int(len(values) * p))]
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Session journal: cost of a change on the UI thread, load time, size")
+    parser.add_argument("--songs", type=int, default=20000, help="songs with a resume position")
+    parser.add_argument("--seconds", type=float, default=5.0, help="how long to keep recording")
+    parser.add_argument("--rate", type=int, default=500, help="changes per second")
+    args = parser.parse_args()
+
+    rng = random.Random(1)
+    songs = [f"/music/Artist{i // 100:04d}/Album/{i:05d}_Track.mp3" for i in range(args.songs)]
+    with tempfile.TemporaryDirectory() as tmp:
+        path = os.path.join(tmp, "session.jsonl")
+        journal = SessionJournal(path).start()
+        for song in songs:
+            journal.record("resume", song, rng.uniform(0, 3600))
+        journal.close()
+
+        start = time.perf_counter()
+        journal = SessionJournal(path).start()
+        start_ms = (time.perf_counter() - start) * 1000
+        while journal.state is None:
+            time.sleep(0.001)
+        load_ms = (time.perf_counter() - start) * 1000
+
+        # Pauses, songs played through, position saves and queue edits, as
+        # they'd be recorded from Tk callbacks.
+        costs = []
+        end = time.perf_counter() + args.seconds
+        changes = 0
+        while time.perf_counter() < end:
+            roll = rng.random()
+            if roll < 0.5:
+                change = ("session", "current", [rng.choice(songs), rng.uniform(0, 3600)])
+            elif roll < 0.8:
+                change = ("resume", rng.choice(songs), rng.uniform(0, 3600))
+            elif roll < 0.9:
+                change = ("resume", rng.choice(songs), None)
+            else:
+                change = ("session", "queue", rng.sample(songs, 20))
+            before = time.perf_counter()
+            journal.record(*change)
+            costs.append(time.perf_counter() - before)
+            changes += 1
+            time.sleep(1 / args.rate)
+        before = time.perf_counter()
+        journal.close()
+        close_ms = (time.perf_counter() - before) * 1000
+        size = os.path.getsize(path)
+
+        # The same changes written through, one append per change.
+        direct = []
+        with open(os.path.join(tmp, "direct.jsonl"), "a", encoding="utf-8") as f:
+            for _ in range(min(changes, 2000)):
+                before = time.perf_counter()
+                f.write(json.dumps(["resume", rng.choice(songs), rng.uniform(0, 3600)]) + "\n")
+                f.flush()
+                os.fsync(f.fileno())
+                direct.append(time.perf_counter() - before)
+
+    emit({
+        "songs": args.songs, "changes": changes, "start_ms": round(start_ms, 2), "background_load_ms": round(load_ms, 1),
+        "record_us": {"p50": round(percentile(costs, 0.5) * 1e6, 1), "p99": round(percentile(costs, 0.99) * 1e6, 1),
+                      "max": round(max(costs) * 1e6, 1)},
+        "write_through_us": {"p50": round(percentile(direct, 0.5) * 1e6, 1), "max": round(max(direct) * 1e6, 1)},
+        "close_ms": round(close_ms, 1), "compactions": journal.compactions,
+        "journal_lines": journal.lines, "journal_kb": round(size / 1024, 1),
+    })
+
+
+if __name__ == "__main__":
+    sys.exit(main())
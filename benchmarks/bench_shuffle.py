@@ -0,0 +1,93 @@
+import sys
+import time
+import random
+import argparse
+
+from common import emit
+from track_table import TrackTable
+from shuffle_bag import ShuffleBag, folder_weight, duration_weight
+
+
+def synthetic_tracks(count, per_folder):
+    tracks = TrackTable()
+    folder_structure = {}
+    song_lengths = {}
+    rng = random.Random(1)
+    for start in range(0, count, per_folder):
+        folder = f"/music/Artist{start // (per_folder * 10):05d}/Album_{start // per_folder % 10:02d}"
+        paths = [f"{folder}/{i:02d}_Song.mp3" for i in range(min(per_folder, count - start))]
+        folder_structure[folder] = paths
+        tracks.add_folder(folder, paths)
+        song_lengths.update((p, rng.uniform(60, 600)) for p in paths)
+    return tracks, folder_structure, song_lengths
+
+
+def old_randomize(folder_structure):
+    # Player_005 before: flatten the library on every R press.
+    return random.choice(sum(folder_structure.values(), []))
+
+
+def time_draws(bag, draws):
+    start = time.perf_counter()
+    bag.draw()
+    first = time.perf_counter() - start
+    worst = 0.0
+    start = time.perf_counter()
+    for _ in range(draws):
+        t = time.perf_counter()
+        bag.draw()
+        worst = max(worst, time.perf_counter() - t)
+    mean = (time.perf_counter() - start) / draws
+    return {"first_draw_ms": round(first * 1000, 3), "mean_draw_us": round(mean * 1e6, 3),
+            "max_draw_us": round(worst * 1e6, 1)}
+
+
+def no_repeats(tracks):
+    bag = ShuffleBag(tracks, rng=random.Random(5))
+    live = len(tracks)
+    drawn = [bag.draw() for _ in range(live)]
+    return len(set(drawn)) == live
+
+
+def weighting_effect(tracks, song_lengths, draws):
+    # Mean length of drawn songs: ~330 s unweighted for lengths spread over
+    # 60-600 s, higher when weighted by duration.
+    bag = ShuffleBag(tracks, None, *duration_weight(tracks, song_lengths), rng=random.Random(9))
+    picks = [song_lengths[tracks.path_of(bag.draw())] for _ in range(draws)]
+    return round(sum(picks) / len(picks), 1)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Random play: flattening per press vs. shuffle bags")
+    parser.add_argument("--sizes", default="10000,100000,1000000")
+    parser.add_argument("--per-folder", type=int, default=12)
+    parser.add_argument("--draws", type=int, default=10000)
+    parser.add_argument("--old-max", type=int, default=100000,
+                        help="skip the old method above this size (it is quadratic)")
+    args = parser.parse_args()
+
+    results = []
+    for size in (int(s) for s in args.sizes.split(",")):
+        tracks, folder_structure, song_lengths = synthetic_tracks(size, args.per_folder)
+        row = {"tracks": size}
+        if size <= args.old_max:
+            start = time.perf_counter()
+            for _ in range(3):
+                old_randomize(folder_structure)
+            row["old_sum_flatten_ms"] = round((time.perf_counter() - start) / 3 * 1000, 2)
+        row["bag"] = time_draws(ShuffleBag(tracks), args.draws)
+        row["folder_weighted"] = time_draws(ShuffleBag(tracks, None, *folder_weight(tracks)), args.draws)
+        row["duration_weighted"] = time_draws(
+            ShuffleBag(tracks, None, *duration_weight(tracks, song_lengths)), args.draws)
+        folder = next(iter(tracks.folders))
+        row["current_folder"] = time_draws(ShuffleBag(tracks, folder), args.draws)
+        if size <= 100000:
+            row["no_repeat_within_round"] = no_repeats(tracks)
+            row["duration_weighted_mean_length_s"] = weighting_effect(tracks, song_lengths, min(size // 10, 5000))
+        results.append(row)
+        print(f"{size} tracks done", file=sys.stderr)
+    emit({"per_folder": args.per_folder, "results": results})
+
+
+if __name__ == "__main__":
+    sys.exit(main())
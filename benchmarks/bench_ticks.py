@@ -0,0 +1,251 @@
+import os
+import sys
+import time
+import queue
+import heapq
+import argparse
+import tempfile
+import subprocess
+from collections import deque
+
+os.environ.setdefault("SDL_AUDIODRIVER", "dummy")
+os.environ.setdefault("SDL_VIDEODRIVER", "dummy")
+os.environ.setdefault("PYGAME_HIDE_SUPPORT_PROMPT", "1")
+
+import pygame
+
+from common import REPO_DIR, make_library, load_player_functions, FakeWidget, FakeTree, emit
+from library_index import LibraryIndex
+
+FRAMES_PER_MINUTE = 2297  # 26.1 ms MPEG frames
+WIDGETS = ["song_title_label", "play_pause_button", "time_label", "seek_bar", "scan_status_label", "queue_scrollbar"]
+
+
+class LoopRoot:
+    # Stands in for Tk's event loop, in real time: after() callbacks run
+    # when due, after_idle() ones once the current callback returns, and
+    # event_generate() (callable from any thread, like Tkinter's) wakes the
+    # loop to run what is bound to the event. `wakeups` counts how often the
+    # loop had to wake up from waiting (callbacks due at the same moment
+    # count once), which is what keeps an idle machine out of its low-power
+    # states.
+    def __init__(self):
+        self.timers = []  # heap of (due, seq, after ID, callback, args)
+        self.idle = deque()
+        self.cancelled = set()
+        self.events = queue.Queue()
+        self.bindings = {}
+        self.seq = 0
+        self.wakeups = 0
+
+    def after(self, ms, callback, *args):
+        self.seq += 1
+        after_id = f"after#{self.seq}"
+        heapq.heappush(self.timers, (time.perf_counter() + ms / 1000, self.seq, after_id, callback, args))
+        return after_id
+
+    def after_idle(self, callback, *args):
+        self.idle.append((callback, args))
+        return "idle"
+
+    def after_cancel(self, after_id):
+        self.cancelled.add(after_id)
+
+    def bind(self, sequence, callback):
+        self.bindings[sequence] = callback
+
+    def event_generate(self, sequence, when=None):
+        self.events.put(sequence)
+
+    def run(self, seconds):
+        end = time.perf_counter() + seconds
+        while True:
+            while self.idle:
+                callback, args = self.idle.popleft()
+                callback(*args)
+            while self.timers and self.timers[0][2] in self.cancelled:
+                self.cancelled.discard(heapq.heappop(self.timers)[2])
+            due = min(self.timers[0][0] if self.timers else end, end)
+            try:
+                sequence = self.events.get(timeout=max(0.0, due - time.perf_counter()))
+            except queue.Empty:
+                sequence = None
+            if sequence is None and due >= end:
+                return
+            self.wakeups += 1
+            if sequence is not None:
+                if sequence in self.bindings:
+                    self.bindings[sequence](None)
+                continue
+            now = time.perf_counter()
+            while self.timers and self.timers[0][0] <= now:
+                _, _, after_id, callback, args = heapq.heappop(self.timers)
+                if after_id in self.cancelled:
+                    self.cancelled.discard(after_id)
+                else:
+                    callback(*args)
+
+
+class CountingWidget(FakeWidget):
+    # Counts the calls that would reach Tcl.
+    calls = 0
+
+    def config(self, **kw):
+        CountingWidget.calls += 1
+        super().config(**kw)
+
+    configure = config
+
+    def set(self, *value):
+        CountingWidget.calls += 1
+        super().set(*value)
+
+    def winfo_width(self):
+        return 300
+
+
+def load(script, library, loop, index_path):
+    # The script as its last lines leave it, with its own settings: library
+    # scanned, the watcher started if WATCH_LIBRARY is on, periodic work
+    # running. Works back to the original script, which has no engine.
+    overrides = {"root": loop, "tree": FakeTree(), "WAVEFORM": False, "NORMALIZE": False,
+                 "session_journal": None, "play_history": None,
+                 "LibraryIndex": lambda base: LibraryIndex(base, index_path)}
+    overrides.update({name: CountingWidget() for name in WIDGETS})
+    ns = load_player_functions(script, None, {"PATH": library}, state=True, overrides=overrides)
+    ns["scan_music_directory"](library)
+    if "SONG_END" in ns:
+        pygame.mixer.music.set_endevent(ns["SONG_END"])
+    if "ticks" in ns:
+        ticks = ns["ticks"]
+        ticks.add("seek_bar", ns["tick_seek_bar"], visual=True)
+        ticks.add("audio", ns["pump_audio_events"])
+        ticks.add("probe", ns["drain_probe_results"])
+        ticks.add("waveforms", ns["drain_waveforms"], visual=True)
+        ticks.add("loudness", ns["drain_loudness_results"])
+        loop.bind("<<LibraryUpdated>>", lambda event: ticks.wake("library"))
+    else:
+        for name in ("update_seek_bar", "drain_probe_results", "drain_waveforms", "drain_loudness_results"):
+            if name in ns:
+                ns[name]()
+    if ns.get("WATCH_LIBRARY") and "start_library_watcher" in ns:
+        ns["start_library_watcher"]()
+    return ns
+
+
+class EngineControls:
+    # Play/pause/resume/minimize/stop through the PlayerEngine.
+    def __init__(self, ns, results):
+        self.ns = ns
+        self.engine = ns["engine"]
+        listener = self.engine.listener
+
+        def count_starts(event, value):
+            if event == "started":
+                results["songs_started"] += 1
+            listener(event, value)
+
+        self.engine.listener = count_starts
+
+    def play(self):
+        self.engine.play(next(p for p in self.ns["tracks"].paths if p))
+
+    def pause(self):
+        self.engine.pause()
+
+    def resume(self):
+        self.engine.toggle()
+
+    def minimize(self):
+        if "ticks" in self.ns:
+            self.ns["ticks"].hide()  # what <Unmap> does
+
+    def stop(self):
+        self.engine.stop()
+
+
+class OriginalControls:
+    # The same through the original script's functions; it has nothing to
+    # do when minimized.
+    def __init__(self, ns, results):
+        self.ns = ns
+        self.path = min(p for songs in ns["folder_structure"].values() for p in songs)
+        play_song_from_path = ns["play_song_from_path"]
+
+        def count_starts(path, position=0):
+            results["songs_started"] += 1
+            play_song_from_path(path, position)
+
+        ns["play_song_from_path"] = count_starts
+
+    def play(self):
+        self.ns["play_song_from_path"](self.path)
+
+    def pause(self):
+        self.ns["save_resume_position"](self.path)  # what toggle_play_pause does
+
+    def resume(self):
+        self.ns["play_song_from_path"](self.path, self.ns["resume_positions"].get(self.path, 0))
+
+    def minimize(self):
+        pass
+
+    def stop(self):
+        pygame.mixer.music.stop()
+
+
+def measure(script, library, phase_seconds, index_path):
+    loop = LoopRoot()
+    ns = load(script, library, loop, index_path)
+    results = {"songs_started": 0}
+    controls = (EngineControls if "engine" in ns else OriginalControls)(ns, results)
+
+    def phase(name, seconds):
+        wakeups, calls = loop.wakeups, CountingWidget.calls
+        loop.run(seconds)
+        results[name] = {"wakeups_per_min": round((loop.wakeups - wakeups) * 60 / seconds),
+                         "widget_calls_per_min": round((CountingWidget.calls - calls) * 60 / seconds)}
+
+    loop.run(1.0)  # startup
+    controls.play()
+    phase("playing", phase_seconds)
+    controls.pause()
+    phase("paused", phase_seconds)
+    controls.resume()
+    controls.minimize()
+    phase("minimized_playing", phase_seconds)
+    controls.stop()
+    if ns.get("library_watcher"):
+        ns["library_watcher"].stop()
+    if ns.get("duration_prober"):
+        ns["duration_prober"].stop()
+    if ns.get("library_index"):
+        ns["library_index"].close()
+    results["watch_library"] = bool(ns.get("library_watcher"))
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Timer wakeups and widget updates per minute, playing/paused/minimized")
+    parser.add_argument("--seconds", type=float, default=30.0, help="length of each phase")
+    parser.add_argument("--song-seconds", type=float, default=240.0, help="length of the generated songs")
+    parser.add_argument("--before", default=None, help="git revision of Player_005.py to compare against")
+    args = parser.parse_args()
+
+    pygame.mixer.init()
+    pygame.display.init()
+    report = {"phase_seconds": args.seconds, "song_seconds": args.song_seconds}
+    with tempfile.TemporaryDirectory() as tmp:
+        library = os.path.join(tmp, "library")
+        make_library(library, 12, per_folder=12, frames=int(args.song_seconds / 60 * FRAMES_PER_MINUTE))
+        if args.before:
+            old = os.path.join(tmp, "Player_005_before.py")
+            with open(old, "wb") as f:
+                f.write(subprocess.check_output(["git", "show", f"{args.before}:Player_005.py"], cwd=REPO_DIR))
+            report["before"] = measure(old, library, args.seconds, os.path.join(tmp, "before.sqlite"))
+        report["after"] = measure("Player_005.py", library, args.seconds, os.path.join(tmp, "after.sqlite"))
+    emit(report)
+
+
+if __name__ == "__main__":
+    sys.exit(main())
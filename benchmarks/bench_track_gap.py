@@ -0,0 +1,94 @@
+import os
+import sys
+import time
+import argparse
+import tempfile
+import threading
+
+os.environ.setdefault("SDL_AUDIODRIVER", "dummy")
+os.environ.setdefault("SDL_VIDEODRIVER", "dummy")
+
+import pygame
+
+from common import write_silent_mp3, emit
+
+SONG_END = pygame.USEREVENT + 1
+
+
+class EndSampler(threading.Thread):
+    # Notes when the stream actually stops, at ~1 ms resolution.
+    def __init__(self):
+        super().__init__(daemon=True)
+        self.ended_at = []
+        self.running = True
+
+    def run(self):
+        busy = False
+        while self.running:
+            now_busy = pygame.mixer.music.get_busy()
+            if busy and not now_busy:
+                self.ended_at.append(time.perf_counter())
+            busy = now_busy
+            time.sleep(0.001)
+
+
+def play_through(paths, tick, use_endevent):
+    # Mimics the Tk loop: wake every `tick` seconds and either check
+    # get_busy() (old update_seek_bar) or pump pygame's end event.
+    pygame.event.clear()
+    sampler = EndSampler()
+    started_at = []
+    pygame.mixer.music.load(paths[0])
+    pygame.mixer.music.play()
+    sampler.start()
+    remaining = list(paths[1:])
+    while True:
+        time.sleep(tick)
+        if use_endevent:
+            ended = any(e.type == SONG_END for e in pygame.event.get())
+            ended = ended and not pygame.mixer.music.get_busy()
+        else:
+            ended = not pygame.mixer.music.get_busy()
+        if ended:
+            if not remaining:
+                break
+            pygame.mixer.music.load(remaining.pop(0))
+            pygame.mixer.music.play()
+            started_at.append(time.perf_counter())
+    sampler.running = False
+    sampler.join()
+    # A transition faster than the sampler's 1 ms tick shows no end at all.
+    gaps = []
+    previous = 0
+    for start in started_at:
+        ends = [end for end in sampler.ended_at if previous < end <= start]
+        gaps.append((start - ends[-1]) * 1000 if ends else 0.0)
+        previous = start
+    return {"mean_gap_ms": round(sum(gaps) / len(gaps), 2), "max_gap_ms": round(max(gaps), 2),
+            "transitions": len(gaps)}
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Silence between tracks: get_busy polling vs. end events")
+    parser.add_argument("--tracks", type=int, default=6)
+    parser.add_argument("--frames", type=int, default=30, help="MP3 frames per track (26 ms each)")
+    args = parser.parse_args()
+
+    pygame.mixer.init()
+    pygame.display.init()
+    pygame.mixer.music.set_endevent(SONG_END)
+    with tempfile.TemporaryDirectory() as tmp:
+        paths = []
+        for i in range(args.tracks):
+            paths.append(os.path.join(tmp, f"{i:02d}.mp3"))
+            write_silent_mp3(paths[-1], args.frames)
+        emit({
+            "audio_driver": os.environ["SDL_AUDIODRIVER"],
+            "poll_get_busy_500ms": play_through(paths, 0.5, use_endevent=False),
+            "end_event_pump_10ms": play_through(paths, 0.01, use_endevent=True),
+        })
+    pygame.quit()
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,145 @@
+import os
+import sys
+import time
+import argparse
+import json
+import subprocess
+
+from common import FakeTree, synthetic_listing, load_player_functions, emit
+
+TREE_FUNCTIONS = {
+    "format_song_title", "format_time", "scan_music_directory", "insert_folder", "materialize_folder",
+    "unload_folder", "update_folder_label", "add_to_folder_totals",
+    "add_scanned_folder", "add_placeholder", "finish_scan", "on_engine_event",
+    "index_for_search", "refresh_search", "show_library_status",
+    "restore_session", "save_position", "save_queue", "log_play",
+}
+
+
+class ListingIndex:
+    # Stands in for LibraryIndex so the numbers are about the Treeview only.
+    listing = []
+
+    def __init__(self, base_path):
+        self.base_path = base_path
+
+    def iter_scan(self, format_title):
+        return iter(self.listing)
+
+    def close(self):
+        pass
+
+
+class TimedTree:
+    # Passes calls through to the tree widget, adding up how many there are
+    # and how long they take, so the tree's share of the first paint can be
+    # told apart from the scan bookkeeping around it.
+    def __init__(self, tree):
+        self.tree = tree
+        self.calls = 0
+        self.seconds = 0.0
+
+    def __len__(self):
+        return len(self.tree)
+
+    def __getattr__(self, name):
+        attr = getattr(self.tree, name)
+        if not callable(attr):
+            return attr
+
+        def timed(*args, **kw):
+            start = time.perf_counter()
+            try:
+                return attr(*args, **kw)
+            finally:
+                self.calls += 1
+                self.seconds += time.perf_counter() - start
+        return timed
+
+
+def rss_bytes():
+    with open("/proc/self/statm") as f:
+        return int(f.read().split()[1]) * os.sysconf("SC_PAGE_SIZE")
+
+
+def populate(lazy, base_path, tk_root):
+    if tk_root is not None:
+        from tkinter import ttk
+        tree = ttk.Treeview(tk_root, columns=("fullpath", "depth", "index"), show="tree")
+        tree.pack(expand=True, fill="both")
+    else:
+        tree = FakeTree()
+    tree = TimedTree(tree)
+    ns = load_player_functions("Player_005.py", TREE_FUNCTIONS, state=True, overrides={
+        "PATH": base_path, "tree": tree, "LAZY_TREE": lazy, "LibraryIndex": ListingIndex, "NORMALIZE": False,
+    })
+
+    rss_before = rss_bytes()
+    start = time.perf_counter()
+    ns["scan_music_directory"](base_path)
+    if tk_root is not None:
+        paint_start = time.perf_counter()
+        tk_root.update()
+        tree.seconds += time.perf_counter() - paint_start
+    first_paint = time.perf_counter() - start
+    rss_after = rss_bytes()
+    tree_calls, tree_seconds = tree.calls, tree.seconds
+
+    items = len(tree.tree) if tk_root is None else count_items(tree.tree)
+    artist = ns["folder_children"]["."][0]
+    album = ns["folder_children"][artist][0]
+    start = time.perf_counter()
+    ns["materialize_folder"](artist)
+    ns["materialize_folder"](album)
+    open_folder = time.perf_counter() - start
+
+    result = {
+        "tree_items": items,
+        "first_paint_s": round(first_paint, 4),
+        "tree_calls": tree_calls,
+        "tree_s": round(tree_seconds, 4),
+        "other_s": round(first_paint - tree_seconds, 4),  # titles, folder totals, search index
+        "open_artist_and_album_ms": round(open_folder * 1000, 3),
+        "rss_delta_mb": round((rss_after - rss_before) / 2**20, 1),
+    }
+    if tk_root is not None:
+        tree.tree.destroy()
+    return result
+
+
+def count_items(tree, item=""):
+    children = tree.get_children(item)
+    return len(children) + sum(count_items(tree, c) for c in children)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Eager vs. lazy Treeview population")
+    parser.add_argument("--tracks", type=int, default=200000)
+    parser.add_argument("--per-folder", type=int, default=12)
+    parser.add_argument("--mode", choices=["eager", "lazy"])
+    args = parser.parse_args()
+
+    if args.mode is None:
+        # Each mode runs in its own process so RSS numbers don't overlap.
+        results = {"tracks": args.tracks}
+        for mode in ("eager", "lazy"):
+            out = subprocess.run([sys.executable, __file__, "--mode", mode, "--tracks", str(args.tracks),
+                                  "--per-folder", str(args.per_folder)],
+                                 check=True, capture_output=True, text=True).stdout
+            results.update(json.loads(out[out.index("{"):]))
+        emit(results)
+        return
+
+    base_path = "/music"
+    ListingIndex.listing = synthetic_listing(base_path, args.tracks, args.per_folder)
+    tk_root = None
+    if os.environ.get("DISPLAY"):
+        import tkinter as tk
+        tk_root = tk.Tk()
+    result = populate(args.mode == "lazy", base_path, tk_root)
+    result["widget"] = "ttk.Treeview" if tk_root is not None else "FakeTree (no DISPLAY)"
+    emit({args.mode: result})
+
+
+if __name__ == "__main__":
+    sys.exit(main())
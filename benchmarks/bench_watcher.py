@@ -0,0 +1,118 @@
+import os
+import sys
+import time
+import shutil
+import argparse
+import tempfile
+
+from common import make_library, write_silent_mp3, load_player_functions, FakeTree, emit
+from library_index import LibraryIndex
+from library_watcher import LibraryWatcher
+
+PLAYER_FUNCTIONS = {
+    "format_song_title", "format_time", "scan_music_directory", "add_scanned_folder", "finish_scan",
+    "insert_folder", "materialize_folder", "add_placeholder", "update_folder_label", "add_to_folder_totals",
+    "drain_library_updates", "apply_folder_update", "replace_folder_songs", "remove_library_folder",
+    "on_engine_event", "index_for_search", "refresh_search",
+    "show_library_status", "start_loudness_analysis", "live_decoder_pool",
+    "restore_session", "save_position", "save_queue", "log_play",
+}
+
+
+class FakeRoot:
+    def after(self, ms, callback, *args):
+        pass
+
+    def after_idle(self, callback, *args):
+        pass
+
+
+class FakeLabel:
+    def config(self, **kw):
+        pass
+
+
+def on_disk(library):
+    expected = {}
+    for root_dir, dirs, files in os.walk(library):
+        expected[root_dir] = sorted(os.path.join(root_dir, f) for f in files if f.endswith(".mp3"))
+    return expected
+
+
+def converged(ns, library):
+    expected = on_disk(library)
+    if set(ns["folder_paths"].values()) != set(expected):
+        return False
+    structure = {folder: songs for folder, songs in ns["folder_structure"].items() if songs}
+    if structure != {folder: songs for folder, songs in expected.items() if songs}:
+        return False
+    tree = ns["tree"]
+    rows = {tree.item(i, "values")[0] for i in tree.items if i and int(tree.item(i, "values")[2]) >= 0}
+    all_songs = {p for songs in expected.values() for p in songs}
+    return rows == all_songs and len(ns["tracks"]) == len(all_songs)
+
+
+def run(use_inotify, copies, tracks):
+    with tempfile.TemporaryDirectory() as tmp:
+        library = make_library(os.path.join(tmp, "library"), tracks, 20)
+        index_path = os.path.join(tmp, "index.sqlite")
+        ns = load_player_functions("Player_005.py", PLAYER_FUNCTIONS, state=True, overrides={
+            "PATH": library, "tree": FakeTree(), "root": FakeRoot(), "scan_status_label": FakeLabel(),
+            "LAZY_TREE": False, "LibraryIndex": lambda base: LibraryIndex(base, index_path),
+        })
+        ns["scan_music_directory"](library)
+        watcher = LibraryWatcher(ns["library_index"], list(ns["folder_paths"].values()),
+                                 ns["format_song_title"], poll_interval=1.0, use_inotify=use_inotify).start()
+        ns["library_watcher"] = watcher
+
+        # A 2,000-file album copy, a deleted album, a renamed artist and a renamed song.
+        start = time.perf_counter()
+        album = os.path.join(library, "NewArtist", "Big_Box_Set")
+        os.makedirs(album)
+        for i in range(copies):
+            write_silent_mp3(os.path.join(album, f"{i:04d}_BoxSetTrack.mp3"))
+        artists = sorted(d for d in os.listdir(library) if d.startswith("Artist"))
+        shutil.rmtree(os.path.join(library, artists[0], "Album_01"))
+        os.rename(os.path.join(library, artists[1]), os.path.join(library, "Renamed_Artist"))
+        song_dir = os.path.join(library, artists[2], "Album_00")
+        first = sorted(os.listdir(song_dir))[0]
+        os.rename(os.path.join(song_dir, first), os.path.join(song_dir, "Renamed_" + first))
+        changed = time.perf_counter() - start
+
+        batches = 0
+        ui_waits = []  # an index read the Tk thread makes (H view), while the watcher refreshes
+        deadline = time.monotonic() + 30
+        while not converged(ns, library):
+            if time.monotonic() > deadline:
+                raise SystemExit(f"{watcher.mode}: library did not converge")
+            batches += watcher.updates.qsize()
+            ns["drain_library_updates"]()
+            for _ in range(10):
+                before = time.perf_counter()
+                ns["library_index"].recently_played(200)
+                ui_waits.append(time.perf_counter() - before)
+                time.sleep(0.005)
+        elapsed = time.perf_counter() - start
+        watcher.stop()
+        ns["library_index"].close()
+
+        # The persisted index must agree with the disk too.
+        index = LibraryIndex(library, index_path)
+        persisted = {folder: sorted(p for p, _, _ in songs) for folder, songs in index.scan(str)}
+        index.close()
+        assert persisted == on_disk(library), "index did not converge"
+        return {"mode": watcher.mode, "update_batches": batches,
+                "changes_made_s": round(changed, 3), "converged_after_s": round(elapsed, 3),
+                "max_index_read_ms": round(max(ui_waits, default=0) * 1000, 2)}
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Library watcher: time until tree and index match the disk")
+    parser.add_argument("--tracks", type=int, default=1000)
+    parser.add_argument("--copies", type=int, default=2000)
+    args = parser.parse_args()
+    emit({"watcher": [run(True, args.copies, args.tracks), run(False, args.copies, args.tracks)]})
+
+
+if __name__ == "__main__":
+    sys.exit(main())
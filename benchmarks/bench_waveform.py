@@ -0,0 +1,71 @@
+import os
+import sys
+import time
+import argparse
+import tempfile
+
+os.environ.setdefault("SDL_AUDIODRIVER", "dummy")
+os.environ.setdefault("PYGAME_HIDE_SUPPORT_PROMPT", "1")
+
+from common import write_silent_mp3, emit
+from decoder import start_pool
+from waveform import WaveformLoader, load_waveform
+
+FRAMES_PER_MINUTE = 2297  # 26.1 ms MPEG frames
+
+
+def run_loader(loader, paths):
+    # Requests everything the way the Tk thread does and polls for results;
+    # returns the longest a request() call held the caller, and the wall time
+    # until every overview had arrived.
+    start = time.perf_counter()
+    worst = 0.0
+    for path in paths:
+        t = time.perf_counter()
+        loader.request(path)
+        worst = max(worst, time.perf_counter() - t)
+    arrived = 0
+    while arrived < len(paths):
+        t = time.perf_counter()
+        arrived += len(loader.collect())
+        worst = max(worst, time.perf_counter() - t)
+        time.sleep(0.005)
+    return {"max_tk_block_ms": round(worst * 1000, 3), "all_ready_s": round(time.perf_counter() - start, 3)}
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Waveform overviews: decode cost, process pool and disk cache")
+    parser.add_argument("--tracks", type=int, default=16)
+    parser.add_argument("--minutes", type=float, default=4.0)
+    parser.add_argument("--workers", type=int, default=2)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        paths = []
+        for i in range(args.tracks):
+            path = os.path.join(tmp, f"{i:03d}.mp3")
+            write_silent_mp3(path, int(args.minutes * FRAMES_PER_MINUTE))
+            paths.append(path)
+        cache_dir = os.path.join(tmp, "cache")
+
+        pool = start_pool(args.workers)
+        # What a song change would cost if the Tk thread decoded it itself.
+        inline_dir = os.path.join(tmp, "inline")
+        start = time.perf_counter()
+        pool.submit(load_waveform, paths[0], inline_dir).result()
+        inline = time.perf_counter() - start
+
+        cold = run_loader(WaveformLoader(cache_dir).start(pool), paths)
+        # Next launch: nothing in memory, everything on disk.
+        warm = run_loader(WaveformLoader(cache_dir).start(pool), paths)
+        pool.shutdown()
+
+        cached = [os.path.join(d, f) for d, _, files in os.walk(cache_dir) for f in files]
+        emit({"tracks": args.tracks, "minutes_each": args.minutes, "workers": args.workers,
+              "decode_one_song_ms": round(inline * 1000, 1),
+              "cold": cold, "warm_from_disk": warm,
+              "cache_bytes_per_song": round(sum(map(os.path.getsize, cached)) / max(1, len(cached)))})
+
+
+if __name__ == "__main__":
+    sys.exit(main())
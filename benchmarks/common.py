@@ -0,0 +1,302 @@
+import os
+import ast
+import sys
+import json
+import time
+
+REPO_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+if REPO_DIR not in sys.path:
+    sys.path.insert(0, REPO_DIR)
+
+# One MPEG-1 Layer III frame, 128 kbps, 44.1 kHz, mono, all-zero side info:
+# decoders treat it as 26 ms of silence.
+SILENT_FRAME = bytes([0xFF, 0xFB, 0x90, 0xC0]) + bytes(413)
+
+
+def write_silent_mp3(path, frames=4):
+    with open(path, "wb") as f:
+        f.write(SILENT_FRAME * frames)
+
+
+def make_library(base_path, tracks, per_folder=20, fanout=10, frames=4):
+    # Nested folders: artist/album/NN_TrackName.mp3 style, `fanout` albums
+    # per artist, `per_folder` songs per album.
+    made = 0
+    folder_no = 0
+    while made < tracks:
+        artist = f"Artist{folder_no // fanout:05d}"
+        album = os.path.join(base_path, artist, f"Album_{folder_no % fanout:02d}")
+        os.makedirs(album, exist_ok=True)
+        for i in range(min(per_folder, tracks - made)):
+            write_silent_mp3(os.path.join(album, f"{i:02d}_SomeTrackName-Part{i}.mp3"), frames)
+            made += 1
+        folder_no += 1
+    return base_path
+
+
+UI_NAMES = {"input", "tk", "ttk", "root", "style", "pygame"}
+
+
+def _touches_ui(node):
+    for sub in ast.walk(node):
+        if isinstance(sub, ast.Call):
+            func = sub.func
+            while isinstance(func, ast.Attribute):
+                func = func.value
+            if isinstance(func, ast.Name) and func.id in UI_NAMES:
+                return True
+        elif isinstance(sub, ast.Name) and sub.id == "root":
+            return True  # handing the Tk root to something set up headless
+    return False
+
+
+def synthetic_listing(base_path, tracks, per_folder=20, fanout=10):
+    # What LibraryIndex.scan returns for a make_library() tree, without
+    # touching the disk: [(folder, [(song_path, title, duration), ...]), ...]
+    # in top-down order.
+    listing = [(base_path, [])]
+    made = 0
+    folder_no = 0
+    while made < tracks:
+        artist = os.path.join(base_path, f"Artist{folder_no // fanout:05d}")
+        if folder_no % fanout == 0:
+            listing.append((artist, []))
+        album = os.path.join(artist, f"Album_{folder_no % fanout:02d}")
+        songs = []
+        for i in range(min(per_folder, tracks - made)):
+            songs.append((os.path.join(album, f"{i:02d}_SomeTrackName-Part{i}.mp3"),
+                          f"{i:02d} Some Track Name Part{i}", 180.0))
+            made += 1
+        listing.append((album, songs))
+        folder_no += 1
+    return listing
+
+
+def load_player_functions(script, names, namespace=None, state=False, overrides=None):
+    # The Player scripts prompt for a path and build their UI at import time,
+    # so pull just the named top-level functions (all of them if names is
+    # None) out of the source. With state=True, module-level assignments
+    # that don't create widgets or call input()/pygame are kept too; they see
+    # anything passed in `namespace` (e.g. PATH), and `overrides` (e.g. tree)
+    # go in last. The tick scheduler gets the overriding root (or a
+    # FakeRoot), as the script's skipped `ticks.root = root` gives it Tk's.
+    with open(os.path.join(REPO_DIR, script), encoding="utf-8") as f:
+        tree = ast.parse(f.read())
+    keep = []
+    for node in tree.body:
+        if isinstance(node, (ast.Import, ast.ImportFrom)):
+            keep.append(node)
+        elif isinstance(node, ast.FunctionDef) and (names is None or node.name in names):
+            keep.append(node)
+        elif state and isinstance(node, (ast.Assign, ast.AnnAssign)) and not _touches_ui(node):
+            keep.append(node)
+    ns = {} if namespace is None else namespace
+    ns.setdefault("__name__", f"bench_{os.path.splitext(script)[0]}")
+    exec(compile(ast.Module(body=keep, type_ignores=[]), script, "exec"), ns)
+    ns.update(overrides or {})
+    if hasattr(ns.get("ticks"), "root"):
+        ns["ticks"].root = ns["root"] if "root" in ns else FakeRoot()
+    return ns
+
+
+class FakeWidget:
+    # Labels, buttons and the seek bar: remembers what it was set to.
+    def __init__(self):
+        self.options = {}
+        self.value = 0
+
+    def config(self, **kw):
+        self.options.update(kw)
+
+    configure = config
+
+    def set(self, *value):
+        # Scales take a value, scrollbars (first, last).
+        self.value = value[0] if len(value) == 1 else value
+
+    def get(self):
+        return self.value
+
+    def destroy(self):
+        pass
+
+
+class FakeRoot:
+    # Collects root.after callbacks without running them.
+    def __init__(self):
+        self.scheduled = []
+
+    def after(self, ms, callback, *args):
+        self.scheduled.append((ms, callback, args))
+        return f"after#{len(self.scheduled)}"
+
+    def after_idle(self, callback, *args):
+        return self.after(0, callback, *args)
+
+    def after_cancel(self, after_id):
+        pass
+
+
+class FakeListbox:
+    # Player_001's song list.
+    def __init__(self):
+        self.rows = []
+        self.selected = []
+        self.active = 0
+
+    def insert(self, index, value):
+        if index == "end":
+            self.rows.append(value)
+        else:
+            self.rows.insert(int(index), value)
+
+    def delete(self, first, last=None):
+        if last == "end":
+            del self.rows[int(first):]
+        else:
+            del self.rows[int(first):(int(last) if last is not None else int(first)) + 1]
+
+    def get(self, index):
+        return self.rows[self.active if index == "active" else int(index)]
+
+    def size(self):
+        return len(self.rows)
+
+    def curselection(self):
+        return tuple(self.selected)
+
+    def selection_clear(self, first, last=None):
+        self.selected = []
+
+    def selection_set(self, index):
+        self.selected = [int(index)]
+
+    def activate(self, index):
+        self.active = int(index)
+
+
+class FakeMixer:
+    # Stands in for pygame.mixer.music in PlayerEngine when only the
+    # engine's own bookkeeping should be timed.
+    def __init__(self):
+        self.loaded = []
+        self.queued = None
+        self.busy = False
+
+    def load(self, path, namehint=""):
+        self.loaded.append(path)
+        self.queued = None
+
+    def play(self, start=0.0):
+        self.busy = True
+
+    def queue(self, path, namehint=""):
+        self.queued = path
+
+    def pause(self):
+        pass
+
+    def stop(self):
+        self.busy = False
+
+    def fadeout(self, ms):
+        self.busy = False
+
+    def set_volume(self, volume):
+        pass
+
+    def get_busy(self):
+        return self.busy
+
+
+class FakeTree:
+    # Enough of ttk.Treeview to run the Player's tree code without a display.
+    # Children are kept in insertion-ordered dicts so deletes are O(1).
+    def __init__(self):
+        self.items = {"": {"children": {}, "parent": None, "text": "", "values": (), "open": False}}
+        self.counter = 0
+        self.selected = ()
+        self.focused = ""
+
+    def insert(self, parent, index, iid=None, text="", values=(), **kw):
+        self.counter += 1
+        iid = iid or f"I{self.counter:06X}"
+        self.items[iid] = {"children": {}, "parent": parent, "text": text,
+                           "values": tuple(str(v) for v in values), "open": kw.get("open", False)}
+        siblings = self.items[parent]["children"]
+        if index == "end" or int(index) >= len(siblings):
+            siblings[iid] = None
+        else:
+            order = list(siblings)
+            order.insert(int(index), iid)
+            self.items[parent]["children"] = dict.fromkeys(order)
+        return iid
+
+    def delete(self, *iids):
+        for iid in iids:
+            if iid not in self.items:
+                continue
+            self.delete(*self.items[iid]["children"])
+            del self.items[self.items[iid]["parent"]]["children"][iid]
+            del self.items[iid]
+        if self.selected:
+            self.selected = tuple(i for i in self.selected if i in self.items)
+
+    def item(self, iid, option=None, **kw):
+        if kw:
+            self.items[iid].update(kw)
+            return None
+        return self.items[iid][option] if option else dict(self.items[iid])
+
+    def get_children(self, iid=""):
+        return tuple(self.items[iid]["children"])
+
+    def parent(self, iid):
+        return self.items[iid]["parent"]
+
+    def exists(self, iid):
+        return iid in self.items
+
+    def index(self, iid):
+        return list(self.items[self.parent(iid)]["children"]).index(iid)
+
+    def next(self, iid):
+        siblings = list(self.items[self.parent(iid)]["children"])
+        pos = siblings.index(iid) + 1
+        return siblings[pos] if pos < len(siblings) else ""
+
+    def prev(self, iid):
+        siblings = list(self.items[self.parent(iid)]["children"])
+        pos = siblings.index(iid) - 1
+        return siblings[pos] if pos >= 0 else ""
+
+    def selection(self):
+        return self.selected
+
+    def selection_set(self, *iids):
+        self.selected = tuple(iids)
+
+    def focus(self, iid=None):
+        if iid is None:
+            return self.focused
+        self.focused = iid
+
+    def see(self, iid):
+        pass
+
+    def __len__(self):
+        return len(self.items) - 1
+
+
+def timed(fn, *args, repeat=1):
+    best = None
+    for _ in range(repeat):
+        start = time.perf_counter()
+        result = fn(*args)
+        elapsed = time.perf_counter() - start
+        best = elapsed if best is None else min(best, elapsed)
+    return best, result
+
+
+def emit(results):
+    print(json.dumps(results, indent=2))
@@ -0,0 +1,259 @@
+import os
+import sys
+import json
+import time
+import random
+import argparse
+import platform
+import tempfile
+
+os.environ.setdefault("SDL_AUDIODRIVER", "dummy")
+os.environ.setdefault("SDL_VIDEODRIVER", "dummy")
+os.environ.setdefault("PYGAME_HIDE_SUPPORT_PROMPT", "1")  # keep stdout pure JSON
+
+import pygame
+
+from common import (make_library, write_silent_mp3, load_player_functions,
+                    FakeTree, FakeRoot, FakeWidget, FakeListbox, FakeMixer)
+from library_index import LibraryIndex
+
+PLAYERS = ["Player_001.py", "Player_002.py", "Player_003.py", "Player_004.py", "Player_005.py"]
+WIDGETS = ["song_title_label", "play_pause_button", "time_label", "seek_bar", "scan_status_label",
+           "queue_scrollbar"]
+
+
+# --- Libraries ---
+def library_for(cache_dir, tracks, per_folder, flat):
+    # Generated once per size and reused between runs; 1M files takes a while.
+    name = f"{'flat' if flat else 'nested'}-{tracks}-{per_folder}"
+    path = os.path.join(cache_dir, name)
+    marker = os.path.join(path, ".complete")
+    if not os.path.exists(marker):
+        if flat:
+            os.makedirs(path, exist_ok=True)
+            for i in range(tracks):
+                write_silent_mp3(os.path.join(path, f"{i:07d}_SomeTrackName-Part{i % 97}.mp3"))
+        else:
+            make_library(path, tracks, per_folder)
+        open(marker, "w").close()
+    return path
+
+
+# --- Loading a player headless ---
+def load_player(script, library, index_path):
+    played = []
+    namespace = {"PATH": library}
+    overrides = {
+        "tree": FakeTree(), "queue_tree": FakeTree(), "song_listbox": FakeListbox(), "root": FakeRoot(),
+        "LibraryIndex": lambda base: LibraryIndex(base, index_path),
+        "WATCH_LIBRARY": False,
+        "WAVEFORM": False, "NORMALIZE": False,  # decoding is timed in bench_waveform/bench_loudness.py
+    }
+    overrides.update({name: FakeWidget() for name in WIDGETS})
+    ns = load_player_functions(script, None, namespace, state=True, overrides=overrides)
+    # Navigation and shuffle are timed up to the point a song is picked; the
+    # mixer itself is measured separately (bench_track_gap.py).
+    ns["play_song_from_path"] = lambda path, position=0: played.append(path)
+    ns["play_song"] = lambda song=None, position=0: played.append(song)
+    if "engine" in ns:
+        # Same for Player_005's engine. Its __slots__ leave no room for an
+        # instance attribute, so play goes through a subclass instead.
+        engine = ns["engine"]
+        engine.mixer = FakeMixer()
+        engine.__class__ = type("RecordingEngine", (type(engine),), {
+            "__slots__": (), "play": lambda self, path, position=0: played.append(path)})
+    return ns, played
+
+
+def stop_prober(prober):
+    # And wait for its threads, so they don't compete with what's timed next.
+    prober.stop()
+    deadline = time.monotonic() + 10
+    while getattr(prober, "running", 0) and time.monotonic() < deadline:
+        time.sleep(0.01)
+
+
+def per_op(fn, ops):
+    start = time.perf_counter()
+    for _ in range(ops):
+        fn()
+    return (time.perf_counter() - start) / ops * 1e6
+
+
+def song_rows(tree):
+    return [iid for iid, item in tree.items.items() if iid and len(item["values"]) == 3 and item["values"][2] != "-1"]
+
+
+# --- Measurements ---
+def bench_player(script, library, flat_library, args, tmp):
+    ns, played = load_player(script, flat_library if script == "Player_001.py" else library,
+                             os.path.join(tmp, f"{script}.sqlite"))
+    rng = random.Random(7)
+    metrics = {}
+    is_001 = script == "Player_001.py"
+
+    # Scanning (Player_001 lists its folder while loading, so time that).
+    if is_001:
+        start = time.perf_counter()
+        ns["files"] = [f for f in os.listdir(ns["PATH"]) if f.endswith(".mp3")]
+        metrics["scan_s"] = time.perf_counter() - start
+        for song in ns["files"]:
+            ns["song_listbox"].insert("end", song)
+        names = ns["files"]
+    else:
+        start = time.perf_counter()
+        ns["scan_music_directory"](ns["PATH"])
+        metrics["scan_s"] = time.perf_counter() - start
+        if "duration_prober" in ns:
+            stop_prober(ns["duration_prober"])
+        if "library_index" in ns:
+            # Second launch: served from the on-disk index.
+            ns["library_index"].close()
+            warm, _ = load_player(script, library, os.path.join(tmp, f"{script}.sqlite"))
+            start = time.perf_counter()
+            warm["scan_music_directory"](warm["PATH"])
+            metrics["scan_warm_s"] = time.perf_counter() - start
+            stop_prober(warm["duration_prober"])
+            warm["library_index"].close()
+        names = [p for songs in ns["folder_structure"].values() for p in songs]
+    metrics["tracks_found"] = len(names)
+    if "engine" in ns:
+        ns["engine"].song_lengths = dict.fromkeys(names, 180.0)  # don't probe files mid-measurement
+    if not names:
+        return metrics
+
+    start = time.perf_counter()
+    for name in names:
+        ns["format_song_title"](name)
+    metrics["format_title_us"] = (time.perf_counter() - start) / len(names) * 1e6
+
+    samples = [rng.choice(names) for _ in range(args.lookups)]
+    if "find_path_by_name" in ns:
+        it = iter(samples * 2)
+        metrics["find_path_us"] = per_op(lambda: ns["find_path_by_name"](os.path.basename(next(it))), args.lookups)
+    elif "tracks" in ns:
+        it = iter(samples * 2)
+        metrics["find_path_us"] = per_op(lambda: ns["tracks"].path_of(ns["tracks"].id_of(next(it))), args.lookups)
+
+    # next/prev from a random song.
+    if is_001:
+        def step():
+            ns["song_listbox"].selection_set(rng.randrange(len(names)))
+            ns["play_next"]()
+            ns["play_previous"]()
+    else:
+        def step():
+            path = rng.choice(names)
+            if "engine" in ns:
+                ns["engine"].current_path = path
+                ns["engine"].current_track = ns["tracks"].id_of(path)
+            else:
+                ns["current_song"] = os.path.basename(path)
+            ns["play_next_in_folder"]()
+            ns["play_prev_in_folder"]()
+    metrics["next_prev_us"] = per_op(step, args.lookups) / 2
+
+    metrics["randomize_us"] = per_op(ns["randomize_and_play"], args.shuffles)
+
+    if "search_index" in ns:
+        # Type-to-search: the first few letters of random titles.
+        it = iter([ns["song_titles"][path][3:7] for path in samples] * 2)
+        metrics["search_ms"] = per_op(lambda: ns["search_index"].search(next(it)), args.lookups) / 1000
+
+    if "add_to_queue" in ns:
+        tree, queue_tree = ns["tree"], ns["queue_tree"]
+        rows = song_rows(tree)
+        if not rows and "materialize_folder" in ns:
+            for rel_dir in list(ns["folder_paths"])[:50]:
+                if rel_dir in ns["folder_nodes"]:
+                    ns["materialize_folder"](rel_dir)
+            rows = song_rows(tree)
+        if "engine" in ns:
+            ns["engine"].current_path = None
+        else:
+            ns["current_song"] = None
+
+        def add():
+            tree.selection_set(rng.choice(rows))
+            ns["add_to_queue"]()
+        metrics["queue_add_us"] = per_op(add, args.queue_ops)
+
+        start = time.perf_counter()
+        ns["update_queue_view"]()
+        metrics["update_queue_view_ms"] = (time.perf_counter() - start) * 1000
+
+        def remove():
+            queue_tree.selection_set(rng.choice(queue_tree.get_children()))
+            if "on_queue_select" in ns:
+                ns["on_queue_select"]()  # the <<TreeviewSelect>> Tk would send
+            ns["remove_from_queue"]()
+        metrics["queue_remove_us"] = per_op(remove, args.queue_ops // 2)
+
+    if "library_index" in ns and ns["library_index"]:
+        ns["library_index"].close()
+    return {k: round(v, 4) if isinstance(v, float) else v for k, v in metrics.items()}
+
+
+# --- Regression check ---
+def compare(results, baseline_path, threshold):
+    with open(baseline_path) as f:
+        baseline = json.load(f)
+    old = {(r["player"], r["tracks"]): r["metrics"] for r in baseline["results"]}
+    regressions = []
+    for r in results:
+        before = old.get((r["player"], r["tracks"]), {})
+        for key, value in r["metrics"].items():
+            if key == "tracks_found" or key not in before or not before[key]:
+                continue
+            ratio = value / before[key]
+            if ratio > threshold:
+                regressions.append(f"{r['player']} @ {r['tracks']}: {key} {before[key]} -> {value} ({ratio:.2f}x)")
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Headless benchmark suite for Player_001 to Player_005")
+    parser.add_argument("--sizes", default="1000,10000", help="comma-separated track counts, up to 1000000")
+    parser.add_argument("--players", default=",".join(PLAYERS))
+    parser.add_argument("--per-folder", type=int, default=12)
+    parser.add_argument("--lookups", type=int, default=200)
+    parser.add_argument("--shuffles", type=int, default=20)
+    parser.add_argument("--queue-ops", type=int, default=500)
+    parser.add_argument("--library-cache", default=os.path.join(tempfile.gettempdir(), "music_player_bench"))
+    parser.add_argument("--output", help="write the JSON report here as well as to stdout")
+    parser.add_argument("--compare", help="earlier JSON report; exit 1 if a metric got slower by --threshold")
+    parser.add_argument("--threshold", type=float, default=1.5)
+    args = parser.parse_args()
+
+    pygame.mixer.init()
+    players = args.players.split(",")
+    results = []
+    with tempfile.TemporaryDirectory() as tmp:
+        for size in (int(s) for s in args.sizes.split(",")):
+            library = library_for(args.library_cache, size, args.per_folder, flat=False)
+            flat = library_for(args.library_cache, size, args.per_folder, flat=True) if "Player_001.py" in players else None
+            for script in players:
+                print(f"{script} @ {size} tracks", file=sys.stderr)
+                results.append({"player": os.path.splitext(script)[0], "tracks": size,
+                                "metrics": bench_player(script, library, flat, args, tmp)})
+
+    report = {
+        "meta": {"python": platform.python_version(), "platform": platform.platform(),
+                 "audio_driver": os.environ["SDL_AUDIODRIVER"], "time": time.strftime("%Y-%m-%dT%H:%M:%S")},
+        "results": results,
+    }
+    text = json.dumps(report, indent=2)
+    print(text)
+    if args.output:
+        with open(args.output, "w") as f:
+            f.write(text)
+    if args.compare:
+        regressions = compare(results, args.compare, args.threshold)
+        for line in regressions:
+            print("REGRESSION", line, file=sys.stderr)
+        return 1 if regressions else 0
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,104 @@
+import heapq
+from collections import deque
+
+LEAD = 0.030  # seconds before an event the timer aims for; the rest is covered in short hops
+HOP_MS = 2
+FADE_STEP = 0.05  # seconds between volume steps while fading out
+
+
+class ClipScheduler:
+    # Plays part of a song (custom playback: start, end, fade-out, loop) and
+    # runs what has to happen during it from a single Tk timer. Events sit
+    # in a heap keyed by position in the song, and the timer is re-armed
+    # against the mixer's own clock (get_pos), so a busy Tk loop makes an
+    # event run a few ms late instead of drifting for the rest of the clip.
+    #
+    # Anything else that moves the transport (play, pause, seek, next) has
+    # to call cancel(); the player does this from its engine listener.
+    def __init__(self, engine, root=None):
+        self.engine = engine
+        self.root = root          # anything with after/after_cancel, set once Tk is up
+        self.clip = None          # (path, start, end, fade, loop) while one is playing
+        self.volume = 1.0         # the song's normal volume, restored after a fade
+        self.events = []          # heap of (position, seq, action)
+        self.seq = 0
+        self.timer = None
+        self.anchor = (0.0, 0)    # (song position, mixer.get_pos() ms) at the last jump
+        self.lateness = deque(maxlen=200)  # (action, seconds late against the song position)
+
+    def position(self):
+        start, ms = self.anchor
+        return start + (self.engine.mixer.get_pos() - ms) / 1000
+
+    def play(self, path, start, end, fade=0.0, loop=False):
+        self.cancel()
+        end = min(end, self.engine.length_of(path))
+        if end <= start:
+            return False
+        self.clip = (path, start, end, min(fade, end - start), loop)
+        self.volume = self.engine.volume_of(path)
+        self.engine.play_segment(path, start)
+        self._begin_pass()
+        return True
+
+    def cancel(self):
+        if self.timer is not None:
+            self.root.after_cancel(self.timer)
+            self.timer = None
+        if self.clip and self.engine.loaded_path == self.clip[0]:
+            self.engine.mixer.set_volume(self.volume)  # undo a fade in progress
+        self.clip = None
+        self.events = []
+
+    def _begin_pass(self):
+        path, start, end, fade, loop = self.clip
+        self.anchor = (start, self.engine.mixer.get_pos())
+        self.events = []
+        if fade > 0:
+            step = end - fade
+            while step < end:
+                self._push(step, "fade")
+                step += FADE_STEP
+        self._push(end, "end")
+        self._arm()
+
+    def _push(self, position, action):
+        self.seq += 1
+        heapq.heappush(self.events, (position, self.seq, action))
+
+    def _arm(self):
+        if self.timer is not None:
+            self.root.after_cancel(self.timer)
+            self.timer = None
+        if not self.events:
+            return
+        remaining = self.events[0][0] - self.position()
+        if remaining > LEAD + HOP_MS / 1000:
+            delay = int((remaining - LEAD) * 1000)
+        else:
+            delay = max(0, min(HOP_MS, int(remaining * 1000)))
+        self.timer = self.root.after(delay, self._tick)
+
+    def _tick(self):
+        self.timer = None
+        position = self.position()
+        while self.events and self.events[0][0] <= position + 0.001:
+            due, _, action = heapq.heappop(self.events)
+            self.lateness.append((action, position - due))
+            if action == "fade":
+                path, start, end, fade, loop = self.clip
+                self.engine.mixer.set_volume(self.volume * max(0.0, end - position) / fade)
+            elif action == "end":
+                self._clip_end()
+                return
+        self._arm()
+
+    def _clip_end(self):
+        path, start, end, fade, loop = self.clip
+        self.engine.mixer.set_volume(self.volume)
+        if loop:
+            self.engine.mixer.set_pos(start)
+            self._begin_pass()
+        else:
+            self.engine.hold()
+            self.clip = None
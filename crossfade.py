@@ -0,0 +1,113 @@
+import time
+import threading
+import numpy as np
+import pygame
+
+MARGIN = 0.25  # seconds of the next song past the overlap, so the hand-over never runs dry
+KEEP_TAILS = 4
+
+
+def fade_in(n, curve):
+    t = np.linspace(0.0, 1.0, n, dtype=np.float32)
+    if curve == "equal_power":
+        return np.sin(t * (np.pi / 2))  # the sum stays equally loud, not equally high
+    return t
+
+
+def fade_out(n, curve):
+    return fade_in(n, curve)[::-1]
+
+
+class Crossfader:
+    # Overlaps the end of one song with the start of the next, which
+    # pygame.mixer.music (a single stream) can't do. The last `seconds` of
+    # the current song and the first of the next are decoded in a
+    # background thread into Sound buffers with the fade curve applied,
+    # and played on two reserved channels. The stream pauses while they
+    # play and picks up the next song after the overlap.
+    #
+    # PlayerEngine decides when to start and when to hand over (its pump);
+    # this class only prepares and plays the buffers.
+    def __init__(self, seconds=4.0, curve="equal_power"):
+        self.seconds = seconds
+        self.curve = curve              # "equal_power" or "linear"
+        self.rate = pygame.mixer.get_init()[0]
+        pygame.mixer.set_reserved(2)
+        self.channels = (pygame.mixer.Channel(0), pygame.mixer.Channel(1))
+        self.wanted = None              # (current path, next path) the worker should decode
+        self.pair = None                # (key, tail samples, head samples) once decoded
+        self.tails = {}                 # {song_path: tail samples}, kept from decoding heads
+        self.fading = None              # (upcoming, perf_counter at start) while overlapping
+        self.decode_seconds = []        # how long each pair took, for the benchmark
+        self._wake = threading.Event()
+        threading.Thread(target=self._run, daemon=True).start()
+
+    def prepare(self, current, upcoming):
+        # `upcoming` as from PlayerEngine.next_after_current().
+        key = None if upcoming is None else (current, upcoming[0])
+        if key == self.wanted:
+            return
+        self.wanted = key
+        if key is not None:
+            self._wake.set()
+
+    def ready(self, current, upcoming):
+        pair = self.pair
+        return upcoming is not None and pair is not None and pair[0] == (current, upcoming[0])
+
+    def start(self, upcoming, offset, volume_out, volume_in):
+        # Plays the rest of the current song's tail from `offset` seconds
+        # into it, together with the next song's head.
+        _, tail, head = self.pair
+        tail = tail[int(max(0.0, offset) * self.rate):]
+        out_channel, in_channel = self.channels
+        out_channel.set_volume(volume_out)
+        in_channel.set_volume(volume_in)
+        out_channel.play(pygame.sndarray.make_sound(tail))
+        in_channel.play(pygame.sndarray.make_sound(head))
+        self.fading = (upcoming, time.perf_counter())
+
+    def elapsed(self):
+        return time.perf_counter() - self.fading[1] if self.fading else 0.0
+
+    def cancel(self):
+        if self.fading:
+            for channel in self.channels:
+                channel.stop()
+            self.fading = None
+
+    def _run(self):
+        while True:
+            self._wake.wait()
+            self._wake.clear()
+            key = self.wanted
+            if key is None or (self.pair and self.pair[0] == key):
+                continue
+            started = time.perf_counter()
+            current, upcoming = key
+            tail = self.tails.get(current)
+            if tail is None:
+                tail = self._decode(current, tail=True)
+            head = self._decode(upcoming, tail=False)
+            if tail is None or head is None or key != self.wanted:
+                continue
+            self.pair = (key, tail, head)
+            self.decode_seconds.append(time.perf_counter() - started)
+
+    def _decode(self, path, tail):
+        try:
+            samples = pygame.sndarray.array(pygame.mixer.Sound(path))
+        except (pygame.error, OSError):
+            return None
+        n = int(self.seconds * self.rate)
+        # The next song's tail comes from the same decode, for when it's
+        # the one fading out.
+        end = samples[-n:].T * fade_out(min(n, len(samples)), self.curve)
+        self.tails[path] = np.ascontiguousarray(end.T, dtype=np.int16)
+        while len(self.tails) > KEEP_TAILS:
+            del self.tails[next(iter(self.tails))]
+        if tail:
+            return self.tails[path]
+        head = samples[:n + int(MARGIN * self.rate)].T.astype(np.float32)
+        head[..., :n] *= fade_in(min(n, head.shape[-1]), self.curve)
+        return np.ascontiguousarray(head.T, dtype=np.int16)
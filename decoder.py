@@ -0,0 +1,43 @@
+import os
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor
+
+DECODE_RATE = 11025  # mono samples per second; plenty for overviews and loudness
+
+
+def init_worker():
+    # Worker processes only decode; they never open the sound card.
+    os.environ["SDL_AUDIODRIVER"] = "dummy"
+    os.environ["PYGAME_HIDE_SUPPORT_PROMPT"] = "1"
+    # SDL would turn SIGTERM into a quit event, and the executor could no
+    # longer terminate the workers of a broken pool (it then waits for them
+    # forever, at exit too).
+    os.environ["SDL_NO_SIGNAL_HANDLERS"] = "1"
+    import pygame
+    if not pygame.mixer.get_init():
+        pygame.mixer.init(DECODE_RATE, -16, 1)
+
+
+def decode(path):
+    # The whole song as mono int16 samples, or None if it can't be decoded.
+    # Only call this in a pool worker: it needs the mixer set up there.
+    import pygame
+    try:
+        samples = pygame.sndarray.array(pygame.mixer.Sound(path))
+    except (pygame.error, OSError):
+        return None
+    if samples.ndim > 1:
+        samples = samples.mean(axis=1)
+    return samples
+
+
+def start_pool(workers=2):
+    # Forked rather than spawned: spawn would run the player script again in
+    # every worker. Call it before the mixer and Tk are set up, so nothing
+    # but a bare interpreter is copied into the workers. Returns None where
+    # there is no fork (Windows), and the caller does without decoding.
+    if "fork" not in multiprocessing.get_all_start_methods():
+        return None
+    pool = ProcessPoolExecutor(workers, mp_context=multiprocessing.get_context("fork"), initializer=init_worker)
+    pool.submit(os.getpid).result()  # fork the workers now
+    return pool
@@ -0,0 +1,340 @@
+import os
+import hashlib
+import sqlite3
+import threading
+from collections import defaultdict
+from concurrent.futures import ThreadPoolExecutor
+from mutagen import MutagenError
+from mutagen.mp3 import MP3
+from background_runs import BackgroundRuns
+
+SCHEMA_VERSION = 2
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS folders (
+    path TEXT PRIMARY KEY,
+    mtime_ns INTEGER NOT NULL,
+    subdirs TEXT NOT NULL
+);
+CREATE TABLE IF NOT EXISTS tracks (
+    path TEXT PRIMARY KEY,
+    folder TEXT NOT NULL,
+    name TEXT NOT NULL,
+    title TEXT NOT NULL,
+    size INTEGER NOT NULL,
+    mtime_ns INTEGER NOT NULL,
+    duration REAL
+);
+CREATE INDEX IF NOT EXISTS tracks_by_folder ON tracks(folder, name);
+CREATE TABLE IF NOT EXISTS gains (
+    path TEXT PRIMARY KEY,
+    mtime_ns INTEGER NOT NULL,
+    gain REAL NOT NULL
+);
+CREATE TABLE IF NOT EXISTS clip_presets (
+    path TEXT NOT NULL,
+    name TEXT NOT NULL,
+    start REAL NOT NULL,
+    end REAL NOT NULL,
+    fade REAL NOT NULL,
+    loop INTEGER NOT NULL,
+    PRIMARY KEY (path, name)
+);
+CREATE TABLE IF NOT EXISTS play_events (
+    time REAL NOT NULL,
+    path TEXT NOT NULL,
+    event TEXT NOT NULL,
+    position REAL
+);
+CREATE TABLE IF NOT EXISTS play_stats (
+    path TEXT PRIMARY KEY,
+    plays INTEGER NOT NULL,
+    completions INTEGER NOT NULL,
+    skips INTEGER NOT NULL,
+    last_played REAL NOT NULL
+);
+CREATE INDEX IF NOT EXISTS play_stats_by_last_played ON play_stats(last_played);
+CREATE INDEX IF NOT EXISTS play_stats_by_plays ON play_stats(plays, last_played);
+"""
+
+
+def default_index_path(base_path):
+    # Kept in the user's cache dir rather than inside the library, so writing
+    # the index never bumps the mtime of the folder it describes.
+    key = hashlib.sha1(os.path.abspath(base_path).encode("utf-8")).hexdigest()[:16]
+    cache_dir = os.path.join(os.path.expanduser("~"), ".cache", "music_player")
+    os.makedirs(cache_dir, exist_ok=True)
+    return os.path.join(cache_dir, f"library-{key}.sqlite")
+
+
+class LibraryIndex:
+    def __init__(self, base_path, index_path=None):
+        self.base_path = base_path
+        self.index_path = index_path or default_index_path(base_path)
+        # The scan runs on a worker thread while the Tk thread saves probed
+        # durations, so the connection is shared under a lock.
+        self.db = sqlite3.connect(self.index_path, check_same_thread=False)
+        self.lock = threading.Lock()
+        self.db.execute("PRAGMA journal_mode=WAL")
+        self.db.execute("PRAGMA synchronous=NORMAL")
+        if self.db.execute("PRAGMA user_version").fetchone()[0] != SCHEMA_VERSION:
+            self.db.executescript("DROP TABLE IF EXISTS folders; DROP TABLE IF EXISTS tracks; DROP TABLE IF EXISTS gains;")
+            self.db.execute(f"PRAGMA user_version={SCHEMA_VERSION}")
+        self.db.executescript(SCHEMA)
+        self.stats = {"folders_restatted": 0, "folders_rescanned": 0, "titles_formatted": 0}
+
+    def close(self):
+        with self.lock:
+            self.db.close()
+
+    def _load(self):
+        folders = {}
+        for path, mtime_ns, subdirs in self.db.execute("SELECT path, mtime_ns, subdirs FROM folders"):
+            folders[path] = (mtime_ns, subdirs.split("\n") if subdirs else [])
+        tracks = defaultdict(list)
+        for row in self.db.execute(
+                "SELECT folder, name, path, title, size, mtime_ns, duration FROM tracks ORDER BY folder, name"):
+            tracks[row[0]].append(row[1:])
+        return folders, tracks
+
+    def _rescan_folder(self, folder, cached_songs, format_title):
+        # Directory mtime changed: list it again, but keep titles of files
+        # whose size and mtime are unchanged (and their probed duration).
+        # Entries that can't be stat'ed (dangling symlinks, files deleted
+        # mid-listing) are skipped; OSError from the folder itself is raised.
+        known = {song[0]: song[2:] for song in cached_songs}
+        subdirs = []
+        songs = []
+        with os.scandir(folder) as entries:
+            for entry in entries:
+                try:
+                    if entry.is_dir(follow_symlinks=False):
+                        subdirs.append(entry.name)
+                        continue
+                    if not entry.name.endswith(".mp3"):
+                        continue
+                    st = entry.stat()
+                except OSError:
+                    continue
+                old = known.get(entry.name)
+                if old and old[1] == st.st_size and old[2] == st.st_mtime_ns:
+                    title, duration = old[0], old[3]
+                else:
+                    title, duration = format_title(entry.name), None
+                    self.stats["titles_formatted"] += 1
+                songs.append((entry.name, entry.path, title, st.st_size, st.st_mtime_ns, duration))
+        subdirs.sort()
+        songs.sort()
+        return subdirs, songs
+
+    def scan(self, format_title):
+        return list(self.iter_scan(format_title))
+
+    # Walks the library top-down (sorted subfolders) and yields
+    # (folder_path, [(song_path, title, duration_or_None), ...]) as it goes.
+    # Folders whose mtime matches the index are served from it without
+    # listing their contents; the index is updated once the walk is done.
+    def iter_scan(self, format_title):
+        with self.lock:
+            cached_folders, cached_tracks = self._load()
+        seen = set()
+        folder_rows = []
+        track_rows = []
+        dropped = []
+
+        stack = [self.base_path]
+        while stack:
+            folder = stack.pop()
+            try:
+                mtime_ns = os.stat(folder).st_mtime_ns
+            except OSError:
+                continue
+            self.stats["folders_restatted"] += 1
+            cached = cached_folders.get(folder)
+            if cached and cached[0] == mtime_ns:
+                subdirs = cached[1]
+                songs = cached_tracks.get(folder, [])
+            else:
+                self.stats["folders_rescanned"] += 1
+                try:
+                    subdirs, songs = self._rescan_folder(folder, cached_tracks.get(folder, []), format_title)
+                except OSError:
+                    continue  # unreadable: left out, and dropped from the index below
+                folder_rows.append((folder, mtime_ns, "\n".join(subdirs)))
+                names = {song[0] for song in songs}
+                dropped.extend(s[1] for s in cached_tracks.get(folder, []) if s[0] not in names)
+                track_rows.extend((s[1], folder, s[0]) + s[2:] for s in songs)
+
+            seen.add(folder)
+            yield folder, [(song[1], song[2], song[5]) for song in songs]
+            for name in reversed(subdirs):
+                stack.append(os.path.join(folder, name))
+
+        gone = [path for path in cached_folders if path not in seen]
+        if folder_rows or track_rows or dropped or gone:
+            with self.lock, self.db:
+                self.db.executemany("INSERT OR REPLACE INTO folders VALUES (?, ?, ?)", folder_rows)
+                self.db.executemany("INSERT OR REPLACE INTO tracks VALUES (?, ?, ?, ?, ?, ?, ?)", track_rows)
+                self.db.executemany("DELETE FROM tracks WHERE path = ?", ((p,) for p in dropped))
+                self.db.executemany("DELETE FROM folders WHERE path = ?", ((p,) for p in gone))
+                self.db.executemany("DELETE FROM tracks WHERE folder = ?", ((p,) for p in gone))
+
+    # Re-reads the given folders (and any new folders found under them) and
+    # returns [(folder_path, songs_or_None_if_gone, subdirs), ...], parents
+    # before children, with songs in the same form iter_scan yields. The
+    # lock is only held for each folder's reads and writes, not while the
+    # folder is listed, so the Tk thread's index calls don't wait on a
+    # slow disk.
+    def refresh(self, folders, format_title):
+        base = os.path.normpath(self.base_path)
+        pending = [f for f in folders if os.path.normpath(f) == base
+                   or os.path.normpath(f).startswith(base + os.sep)]
+        done = set()
+        updates = []
+        while pending:
+            folder = pending.pop()
+            if folder in done:
+                continue
+            done.add(folder)
+            with self.lock:
+                row = self.db.execute("SELECT subdirs FROM folders WHERE path = ?", (folder,)).fetchone()
+                cached = self.db.execute(
+                    "SELECT name, path, title, size, mtime_ns, duration FROM tracks WHERE folder = ? ORDER BY name",
+                    (folder,)).fetchall()
+            old_subdirs = set(row[0].split("\n")) if row and row[0] else set()
+            try:
+                mtime_ns = os.stat(folder).st_mtime_ns
+                subdirs, songs = self._rescan_folder(folder, cached, format_title)
+            except OSError:
+                # Gone or unreadable: either way it leaves the library.
+                with self.lock, self.db:
+                    self._drop_tree(folder)
+                updates.append((folder, None, []))
+                continue
+            names = {song[0] for song in songs}
+            gone = [os.path.join(folder, name) for name in sorted(old_subdirs - set(subdirs))]
+            with self.lock, self.db:
+                self.db.execute("INSERT OR REPLACE INTO folders VALUES (?, ?, ?)", (folder, mtime_ns, "\n".join(subdirs)))
+                self.db.executemany("INSERT OR REPLACE INTO tracks VALUES (?, ?, ?, ?, ?, ?, ?)",
+                                    ((s[1], folder, s[0]) + s[2:] for s in songs))
+                self.db.executemany("DELETE FROM tracks WHERE path = ?", ((s[1],) for s in cached if s[0] not in names))
+                for path in gone:
+                    self._drop_tree(path)
+            for path in gone:
+                done.add(path)
+                updates.append((path, None, []))
+            for name in subdirs:
+                if name not in old_subdirs:
+                    pending.append(os.path.join(folder, name))
+            updates.append((folder, [(song[1], song[2], song[5]) for song in songs], subdirs))
+        updates.sort(key=lambda update: update[0].count(os.sep))
+        return updates
+
+    def _drop_tree(self, folder):
+        # Everything at or below `folder`: paths in [folder + sep, folder + next char).
+        low, high = folder + os.sep, folder + chr(ord(os.sep) + 1)
+        self.db.execute("DELETE FROM folders WHERE path = ? OR (path >= ? AND path < ?)", (folder, low, high))
+        self.db.execute("DELETE FROM tracks WHERE folder = ? OR (folder >= ? AND folder < ?)", (folder, low, high))
+
+    def save_durations(self, rows):
+        with self.lock, self.db:
+            self.db.executemany("UPDATE tracks SET duration = ? WHERE path = ?",
+                                ((length, path) for path, length in rows))
+
+    # Loudness gains (dB) are stored against the file's mtime at the time,
+    # so a re-encoded or retagged file is analyzed again.
+    def save_gains(self, rows):
+        with self.lock, self.db:
+            self.db.executemany(
+                "INSERT OR REPLACE INTO gains SELECT path, mtime_ns, ? FROM tracks WHERE path = ?",
+                ((gain, path) for path, gain in rows))
+
+    def load_gains(self):
+        with self.lock:
+            return dict(self.db.execute(
+                "SELECT g.path, g.gain FROM gains g JOIN tracks t ON t.path = g.path AND t.mtime_ns = g.mtime_ns"))
+
+    # Custom playback presets: {name: (start, end, fade, loop)} per song.
+    def save_clip_preset(self, path, name, start, end, fade, loop):
+        with self.lock, self.db:
+            self.db.execute("INSERT OR REPLACE INTO clip_presets VALUES (?, ?, ?, ?, ?, ?)",
+                            (path, name, start, end, fade, int(loop)))
+
+    def clip_presets(self, path):
+        with self.lock:
+            return {name: (start, end, fade, bool(loop)) for name, start, end, fade, loop in self.db.execute(
+                "SELECT name, start, end, fade, loop FROM clip_presets WHERE path = ? ORDER BY start, name", (path,))}
+
+    # Play history: every event is appended to play_events, and the totals
+    # per song in play_stats are updated in the same transaction, so the
+    # views read a few rows by index instead of going through the log.
+    # `events` are (time, path, event, position), event being one of
+    # "start", "complete", "skip" or "seek".
+    def record_plays(self, events):
+        totals = {}
+        for time, path, event, _ in events:
+            row = totals.setdefault(path, [0, 0, 0, 0.0])
+            if event == "start":
+                row[0] += 1
+                row[3] = max(row[3], time)
+            elif event == "complete":
+                row[1] += 1
+            elif event == "skip":
+                row[2] += 1
+        with self.lock, self.db:
+            self.db.executemany("INSERT INTO play_events VALUES (?, ?, ?, ?)", events)
+            self.db.executemany(
+                "INSERT INTO play_stats VALUES (?, ?, ?, ?, ?) ON CONFLICT(path) DO UPDATE SET "
+                "plays = plays + excluded.plays, completions = completions + excluded.completions, "
+                "skips = skips + excluded.skips, last_played = max(last_played, excluded.last_played)",
+                ((path,) + tuple(row) for path, row in totals.items()))
+
+    # Rows are (path, plays, completions, skips, last_played).
+    def recently_played(self, limit=200):
+        with self.lock:
+            return self.db.execute(
+                "SELECT path, plays, completions, skips, last_played FROM play_stats WHERE plays > 0 "
+                "ORDER BY last_played DESC LIMIT ?", (limit,)).fetchall()
+
+    def most_played(self, limit=200):
+        with self.lock:
+            return self.db.execute(
+                "SELECT path, plays, completions, skips, last_played FROM play_stats WHERE plays > 0 "
+                "ORDER BY plays DESC, last_played DESC LIMIT ?", (limit,)).fetchall()
+
+    def play_stats(self, path):
+        with self.lock:
+            return self.db.execute(
+                "SELECT path, plays, completions, skips, last_played FROM play_stats WHERE path = ?",
+                (path,)).fetchone()
+
+
+# --- Duration probing ---
+def probe_duration(path):
+    try:
+        return MP3(path).info.length
+    except (MutagenError, OSError):
+        return None
+
+
+class DurationProber(BackgroundRuns):
+    # Reads MP3 headers on a thread pool, saves the durations to the library
+    # index given to start() and posts (path, seconds) to `results`; the Tk
+    # side drains the queue, so no widget (and no index write) is done there.
+    def __init__(self, workers=8, chunk=256):
+        super().__init__()
+        self.workers = workers
+        self.chunk = chunk
+
+    def start(self, paths, index=None):
+        self._start(list(paths), index)
+
+    def _work(self, paths, index):
+        with ThreadPoolExecutor(max_workers=self.workers) as pool:
+            for i in range(0, len(paths), self.chunk):
+                if self._stop.is_set():
+                    return
+                batch = paths[i:i + self.chunk]
+                probed = [(path, length) for path, length in zip(batch, pool.map(probe_duration, batch))
+                          if length is not None]
+                self._post(probed, index and index.save_durations)
@@ -0,0 +1,198 @@
+import os
+import time
+import queue
+import select
+import struct
+import threading
+import ctypes
+import ctypes.util
+
+IN_CLOSE_WRITE = 0x00000008
+IN_MOVED_FROM = 0x00000040
+IN_MOVED_TO = 0x00000080
+IN_CREATE = 0x00000100
+IN_DELETE = 0x00000200
+IN_DELETE_SELF = 0x00000400
+IN_MOVE_SELF = 0x00000800
+IN_Q_OVERFLOW = 0x00004000
+IN_IGNORED = 0x00008000
+IN_ONLYDIR = 0x01000000
+IN_ISDIR = 0x40000000
+
+WATCH_MASK = (IN_CLOSE_WRITE | IN_MOVED_FROM | IN_MOVED_TO | IN_CREATE | IN_DELETE
+              | IN_DELETE_SELF | IN_MOVE_SELF | IN_ONLYDIR)
+EVENT_HEADER = struct.Struct("iIII")
+
+
+class InotifySource:
+    # Linux only. Raises OSError if inotify is missing or the watch limit
+    # (fs.inotify.max_user_watches) is too low for the library.
+    def __init__(self, folders):
+        libc = ctypes.CDLL(ctypes.util.find_library("c") or "libc.so.6", use_errno=True)
+        self._add_watch = libc.inotify_add_watch
+        self._add_watch.argtypes = [ctypes.c_int, ctypes.c_char_p, ctypes.c_uint32]
+        self.fd = libc.inotify_init1(os.O_NONBLOCK | os.O_CLOEXEC)
+        if self.fd < 0:
+            raise OSError(ctypes.get_errno(), "inotify_init1 failed")
+        self.folders = {}  # wd -> folder path
+        try:
+            for folder in folders:
+                self.watch(folder)
+        except OSError:
+            os.close(self.fd)
+            raise
+
+    def watch(self, folder):
+        wd = self._add_watch(self.fd, os.fsencode(folder), WATCH_MASK)
+        if wd < 0:
+            err = ctypes.get_errno()
+            if err in (2, 20):  # ENOENT/ENOTDIR: gone already, the parent event covers it
+                return
+            raise OSError(err, f"inotify_add_watch failed for {folder}: {os.strerror(err)}")
+        self.folders[wd] = folder
+
+    def watch_tree(self, folder):
+        for root_dir, dirs, _ in os.walk(folder):
+            self.watch(root_dir)
+
+    # Blocks up to `timeout` seconds; returns the set of folders whose
+    # contents changed, or None on queue overflow (rescan everything).
+    def read(self, timeout):
+        ready, _, _ = select.select([self.fd], [], [], timeout)
+        if not ready:
+            return set()
+        try:
+            buf = os.read(self.fd, 1 << 16)
+        except BlockingIOError:
+            return set()
+        dirty = set()
+        offset = 0
+        while offset < len(buf):
+            wd, mask, _, length = EVENT_HEADER.unpack_from(buf, offset)
+            name = buf[offset + EVENT_HEADER.size:offset + EVENT_HEADER.size + length].rstrip(b"\0")
+            offset += EVENT_HEADER.size + length
+            if mask & IN_Q_OVERFLOW:
+                return None
+            folder = self.folders.get(wd)
+            if mask & IN_IGNORED:
+                self.folders.pop(wd, None)
+            if folder is None:
+                continue
+            if mask & (IN_DELETE_SELF | IN_MOVE_SELF):
+                dirty.add(os.path.dirname(folder))
+                continue
+            dirty.add(folder)
+            if mask & IN_ISDIR and mask & (IN_CREATE | IN_MOVED_TO):
+                child = os.path.join(folder, os.fsdecode(name))
+                self.watch_tree(child)
+                dirty.add(child)
+        return dirty
+
+    def all_folders(self):
+        return set(self.folders.values())
+
+    def close(self):
+        os.close(self.fd)
+
+
+class PollingSource:
+    # Fallback: re-stat every known folder each `interval` seconds and
+    # report the ones whose mtime moved.
+    def __init__(self, folders, interval=5.0):
+        self.interval = interval
+        self.mtimes = {}
+        for folder in folders:
+            self.watch(folder)
+        self._next = time.monotonic() + interval
+
+    def watch(self, folder):
+        try:
+            self.mtimes[folder] = os.stat(folder).st_mtime_ns
+        except OSError:
+            pass
+
+    def read(self, timeout):
+        wait = self._next - time.monotonic()
+        if wait > timeout:
+            time.sleep(timeout)
+            return set()
+        time.sleep(max(0, wait))
+        self._next = time.monotonic() + self.interval
+        dirty = set()
+        for folder, mtime_ns in list(self.mtimes.items()):
+            try:
+                now = os.stat(folder).st_mtime_ns
+            except OSError:
+                del self.mtimes[folder]
+                dirty.add(os.path.dirname(folder))
+                continue
+            if now != mtime_ns:
+                self.mtimes[folder] = now
+                dirty.add(folder)
+        return dirty
+
+    def all_folders(self):
+        return set(self.mtimes)
+
+    def close(self):
+        pass
+
+
+class LibraryWatcher:
+    # Collects changed folders from inotify (or polling), waits until the
+    # burst has been quiet for `settle` seconds (at most `max_delay`), then
+    # re-reads just those folders through the library index and posts the
+    # resulting updates to `updates` for the Tk thread to apply. `notify` is
+    # called (on the watcher's thread) after each post, so the Tk side can
+    # sleep until there is something to apply.
+    def __init__(self, library_index, folders, format_title, settle=0.5, max_delay=3.0,
+                 poll_interval=5.0, use_inotify=True, notify=None):
+        self.index = library_index
+        self.format_title = format_title
+        self.notify = notify
+        self.settle = settle
+        self.max_delay = max_delay
+        self.updates = queue.Queue()
+        self._stop = threading.Event()
+        folders = list(folders)
+        try:
+            if not use_inotify:
+                raise OSError("inotify disabled")
+            self.source = InotifySource(folders)
+            self.mode = "inotify"
+        except (OSError, AttributeError):
+            self.source = PollingSource(folders, poll_interval)
+            self.mode = "polling"
+
+    def start(self):
+        threading.Thread(target=self._run, daemon=True).start()
+        return self
+
+    def stop(self):
+        self._stop.set()
+
+    def _run(self):
+        pending = set()
+        first_event = last_event = None
+        try:
+            while not self._stop.is_set():
+                dirty = self.source.read(self.settle / 2)
+                now = time.monotonic()
+                if dirty is None:
+                    dirty = self.source.all_folders()
+                if dirty:
+                    pending |= dirty
+                    last_event = now
+                    first_event = first_event or now
+                if pending and (now - last_event >= self.settle or now - first_event >= self.max_delay):
+                    updates = self.index.refresh(pending, self.format_title)
+                    for folder, songs, _ in updates:
+                        if songs is not None:
+                            self.source.watch(folder)
+                    self.updates.put(updates)
+                    if self.notify:
+                        self.notify()
+                    pending = set()
+                    first_event = last_event = None
+        finally:
+            self.source.close()
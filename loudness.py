@@ -0,0 +1,68 @@
+import time
+import numpy as np
+from decoder import decode, DECODE_RATE
+from background_runs import BackgroundRuns
+
+BLOCK_SECONDS = 0.05  # ReplayGain's RMS window
+LOUD_PERCENTILE = 95  # the level the song sits at when it's loud, not its peaks
+TARGET_LEVEL = -18.0  # dBFS; louder songs are turned down to this
+MAX_GAIN = 24.0  # dB either way; silence and broken files don't get extreme values
+
+
+def gain_of(samples, rate=DECODE_RATE):
+    # ReplayGain-style: RMS over 50 ms blocks, vectorized as one reshape;
+    # the 95th-percentile block is the song's loudness. Without scipy there
+    # is no equal-loudness filter, so bass counts a little more than in
+    # real ReplayGain.
+    samples = samples.astype(np.float32) / 32768.0
+    block = int(rate * BLOCK_SECONDS)
+    blocks = samples[:len(samples) // block * block].reshape(-1, block)
+    if not len(blocks):
+        return 0.0
+    rms = np.sqrt(np.mean(np.square(blocks), axis=1))
+    level = 20 * np.log10(max(float(np.percentile(rms, LOUD_PERCENTILE)), 1e-9))
+    return float(np.clip(TARGET_LEVEL - level, -MAX_GAIN, MAX_GAIN))
+
+
+def analyze(path):
+    # Runs in a decoder worker: (gain in dB or None, seconds spent).
+    start = time.process_time()
+    samples = decode(path)
+    gain = None if samples is None else gain_of(samples)
+    return gain, time.process_time() - start
+
+
+class LoudnessAnalyzer(BackgroundRuns):
+    # Works out per-song gains in a decoder pool (decoder.start_pool), saves
+    # them to the library index given to start() and posts (path, gain) to
+    # `results` for the Tk side to apply. Batches are kept small so waveform
+    # requests sharing the pool don't wait long behind them.
+    def __init__(self, chunk=4):
+        super().__init__()
+        self.chunk = chunk
+        self.analyzed = 0
+        self.cpu_seconds = 0.0  # worker CPU time spent, for tracks/s per core
+
+    def start(self, pool, paths, index=None):
+        self._start(pool, list(paths), index)
+
+    def rate(self):
+        # Songs analyzed per second of one core.
+        return self.analyzed / self.cpu_seconds if self.cpu_seconds else 0.0
+
+    def _work(self, pool, paths, index):
+        for i in range(0, len(paths), self.chunk):
+            if self._stop.is_set():
+                return
+            batch = paths[i:i + self.chunk]
+            try:
+                outcomes = list(pool.map(analyze, batch))
+            except RuntimeError:
+                return  # pool shut down
+            gains = []
+            for path, (gain, seconds) in zip(batch, outcomes):
+                self.analyzed += 1
+                self.cpu_seconds += seconds
+                if gain is not None:
+                    gains.append((path, gain))
+            self._post(gains, index and index.save_gains)
@@ -0,0 +1,170 @@
+import io
+import os
+import json
+import math
+import time
+import pstats
+import cProfile
+import functools
+import threading
+
+SUB_BUCKETS = 4  # per doubling of the duration, so a percentile is within ~19%
+LAG_INTERVAL = 50  # ms between event-loop lag probes
+
+
+class Histogram:
+    # Durations in log-spaced buckets: adding one is a frexp and two
+    # increments, and memory stays fixed however many are added.
+    def __init__(self):
+        self.counts = {}  # bucket -> count
+        self.count = 0
+        self.total = 0.0
+        self.max = 0.0
+
+    def add(self, seconds):
+        mantissa, exponent = math.frexp(seconds * 1e6)  # microseconds = mantissa * 2**exponent
+        bucket = exponent * SUB_BUCKETS + int((mantissa - 0.5) * 2 * SUB_BUCKETS)
+        self.counts[bucket] = self.counts.get(bucket, 0) + 1
+        self.count += 1
+        self.total += seconds
+        if seconds > self.max:
+            self.max = seconds
+
+    def percentile(self, p):
+        # Upper edge of the bucket holding the p-th duration, in seconds.
+        rank = p * self.count
+        seen = 0
+        for bucket in sorted(self.counts):
+            seen += self.counts[bucket]
+            if seen >= rank:
+                exponent, sub = divmod(bucket, SUB_BUCKETS)
+                return min(self.max, (0.5 + (sub + 1) / (2 * SUB_BUCKETS)) * 2.0 ** exponent / 1e6)
+        return self.max
+
+    def summary(self):
+        return {"count": self.count, "total_ms": round(self.total * 1000, 3),
+                "p50_ms": round(self.percentile(0.5) * 1000, 3), "p95_ms": round(self.percentile(0.95) * 1000, 3),
+                "p99_ms": round(self.percentile(0.99) * 1000, 3), "max_ms": round(self.max * 1000, 3)}
+
+
+class Recorder:
+    # Named timing spans for the Tk thread and the engine, aggregated into
+    # histograms. While `enabled` is False a timed function costs one
+    # attribute check on top of the call, so the spans can stay in place.
+    def __init__(self, enabled=False):
+        self.enabled = enabled
+        self.histograms = {}  # span name -> Histogram
+        self.started = time.time()
+        self._lock = threading.Lock()  # spans may end on worker threads
+
+    def add(self, name, seconds):
+        if not self.enabled:
+            return
+        with self._lock:
+            histogram = self.histograms.get(name)
+            if histogram is None:
+                histogram = self.histograms[name] = Histogram()
+            histogram.add(seconds)
+
+    def timed(self, name):
+        # Decorator: records each call of the function under `name`.
+        def decorate(fn):
+            @functools.wraps(fn)
+            def wrapper(*args, **kwargs):
+                if not self.enabled:
+                    return fn(*args, **kwargs)
+                start = time.perf_counter()
+                try:
+                    return fn(*args, **kwargs)
+                finally:
+                    self.add(name, time.perf_counter() - start)
+            return wrapper
+        return decorate
+
+    def reset(self):
+        with self._lock:
+            self.histograms = {}
+            self.started = time.time()
+
+    def snapshot(self):
+        with self._lock:
+            return {name: histogram.summary() for name, histogram in sorted(self.histograms.items())}
+
+    def report(self):
+        # The overlay's text: one line per span, slowest p99 first.
+        rows = sorted(self.snapshot().items(), key=lambda item: -item[1]["p99_ms"])
+        lines = [f"{'span':<24}{'count':>8}{'p50':>9}{'p95':>9}{'p99':>9}{'max':>9}  ms"]
+        for name, s in rows:
+            lines.append(f"{name[:23]:<24}{s['count']:>8}{s['p50_ms']:>9.2f}{s['p95_ms']:>9.2f}"
+                         f"{s['p99_ms']:>9.2f}{s['max_ms']:>9.2f}")
+        return "\n".join(lines)
+
+    def dump(self, path):
+        with open(path, "w", encoding="utf-8") as f:
+            json.dump({"started": self.started, "dumped": time.time(), "spans": self.snapshot()}, f, indent=2)
+        return path
+
+
+class LagProbe:
+    # Event-loop lag: a Tk timer asks to run every LAG_INTERVAL ms and
+    # records how late it actually ran. Anything blocking the Tk thread
+    # (a slow callback, a long insert) shows up here even if it has no span.
+    def __init__(self, root, recorder):
+        self.root = root
+        self.recorder = recorder
+        self.running = False
+        self.due = 0
+        self.timer = None  # after ID of the next tick
+
+    def start(self):
+        if not self.running:
+            self.running = True
+            self._arm()
+
+    def stop(self):
+        self.running = False
+        if self.timer is not None:
+            self.root.after_cancel(self.timer)
+            self.timer = None
+
+    def _arm(self):
+        self.due = time.perf_counter() + LAG_INTERVAL / 1000
+        self.timer = self.root.after(LAG_INTERVAL, self._tick)
+
+    def _tick(self):
+        self.timer = None
+        if not self.running:
+            return
+        self.recorder.add("tk.loop_lag", max(0.0, time.perf_counter() - self.due))
+        self._arm()
+
+
+class Profiler:
+    # cProfile capture that can be switched on and off from the UI; the
+    # stats go to a .prof file (for snakeviz/pstats) and a short text top
+    # list next to it (a windowed app may have no console to print to).
+    def __init__(self):
+        self.profile = None
+
+    @property
+    def running(self):
+        return self.profile is not None
+
+    def start(self):
+        if self.profile is None:
+            self.profile = cProfile.Profile()
+            self.profile.enable()
+
+    def stop(self, path, top=25):
+        # Returns the path of the text top list, or None if not running.
+        if self.profile is None:
+            return None
+        profile, self.profile = self.profile, None
+        profile.disable()
+        profile.dump_stats(path)
+        text = io.StringIO()
+        pstats.Stats(profile, stream=text).sort_stats("cumulative").print_stats(top)
+        text_path = os.path.splitext(path)[0] + ".txt"
+        with open(text_path, "w", encoding="utf-8") as f:
+            f.write(text.getvalue())
+        return text_path
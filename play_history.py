@@ -0,0 +1,76 @@
+import time
+import sqlite3
+import threading
+
+FLUSH_INTERVAL = 1.0  # seconds events wait so they go to the index in one transaction
+
+
+class PlayHistory:
+    # What was played, for the "Recently played" and "Most played" views.
+    # log() only appends to a list, so the Tk thread never waits on SQLite;
+    # a writer thread hands whatever has piled up to the library index
+    # every FLUSH_INTERVAL, which appends it to the event log and updates
+    # the per-song totals in one transaction.
+    def __init__(self, index):
+        self.index = index
+        self.pending = []         # [(time, path, event, position)] not written yet
+        self.written = 0
+        self.batches = 0
+        self.requested = 0        # flush requests so far
+        self.flushed = 0          # the last request whose events have been written
+        self._lock = threading.Lock()
+        self._stop = threading.Event()
+        self._wake = threading.Event()
+        self._thread = None
+
+    def log(self, event, path, position=None):
+        if path:
+            with self._lock:
+                self.pending.append((time.time(), path, event, position))
+
+    def start(self):
+        self._thread = threading.Thread(target=self._run, daemon=True)
+        self._thread.start()
+        return self
+
+    def request_flush(self):
+        # Has the writer thread write now instead of at its next interval.
+        # Returns a ticket: once `flushed` reaches it, everything logged
+        # before the call is in the index.
+        with self._lock:
+            self.requested += 1
+            ticket = self.requested
+        if self._thread:
+            self._wake.set()
+        else:
+            self.flush()
+        return ticket
+
+    def close(self):
+        # Writes what is still pending before returning.
+        self._stop.set()
+        self._wake.set()
+        if self._thread:
+            self._thread.join()
+        else:
+            self.flush()
+
+    def _run(self):
+        while not self._stop.is_set():
+            self._wake.wait(FLUSH_INTERVAL)
+            self._wake.clear()
+            self.flush()
+        self.flush()
+
+    def flush(self):
+        with self._lock:
+            batch, self.pending = self.pending, []
+            ticket = self.requested
+        try:
+            if batch:
+                self.index.record_plays(batch)
+                self.written += len(batch)
+                self.batches += 1
+        except sqlite3.Error:
+            pass  # a locked or full database loses this batch, not the player
+        self.flushed = ticket
@@ -0,0 +1,525 @@
+import time
+from collections import deque
+import pygame
+from mutagen.mp3 import MP3
+from library_index import probe_duration
+from song_queue import PlayQueue
+from shuffle_bag import ShuffleBag, folder_weight, duration_weight
+
+END_MARGIN = 1.5  # seconds before a song's end (or crossfade) from which pump() is needed promptly
+
+
+def gain_to_volume(gain):
+    # pygame's music volume only goes down, so songs that would need a
+    # boost (gain from loudness analysis, in dB) play at full volume.
+    if gain is None:
+        return 1.0
+    return min(1.0, 10 ** (gain / 20))
+
+
+class PlayerEngine:
+    # Playback state and commands without any UI: what is playing, where,
+    # the play queue and what follows the current song. A front-end calls
+    # the commands, pumps pygame's events through pump(), and is told about
+    # changes through `listener(event, value)` with event one of
+    # "started" (song path, also on resuming and on a seek that unpauses),
+    # "new_song" (song path, sent before "started" when a different song
+    # starts, or the same one again after it ended), "paused" (song path),
+    # "seeked" (position),
+    # "dequeued" (entry ID), "resume" ((song path, seconds or None when
+    # the song's resume position is dropped)), "ended" (song path, played
+    # to its end) or "left" ((song path, position) when another song
+    # starts before it ended).
+    __slots__ = (
+        "tracks", "song_lengths", "gains", "end_event", "gapless", "listener", "mixer",
+        "current_path", "current_track", "loaded_path", "finished", "paused", "playing", "start_time", "paused_at",
+        "song_length", "resume_positions", "queue", "queue_origin", "prequeued", "mixer_queued",
+        "order", "shuffle_weight", "shuffle_bag", "folder_bag", "crossfader", "cache", "latencies", "recorder", "_command",
+    )
+
+    def __init__(self, tracks, song_lengths, end_event=None, gapless=True, listener=None, mixer=None,
+                 shuffle_weight=None, gains=None, crossfader=None, cache=None, order="library",
+                 recorder=None):
+        self.tracks = tracks                # TrackTable shared with the library view
+        self.song_lengths = song_lengths    # {song_path: seconds}, shared cache
+        self.gains = gains if gains is not None else {}  # {song_path: dB}, from loudness analysis
+        self.end_event = end_event          # pygame event type set with set_endevent
+        self.gapless = gapless
+        self.listener = listener
+        self.mixer = mixer or pygame.mixer.music
+        self.current_path = None
+        self.current_track = None   # track ID of current_path
+        self.loaded_path = None     # song the mixer's stream is playing
+        self.finished = False       # current_path played to its end
+        self.paused = False
+        self.playing = False        # the old pause_cond: True = playing, False = paused
+        self.start_time = 0         # time.monotonic() at which position 0 would have played
+        self.paused_at = 0          # position the song was paused at
+        self.song_length = 0        # seconds
+        self.resume_positions = {}  # {song_path: last_position_seconds}
+        self.queue = PlayQueue()
+        self.queue_origin = None    # track ID of the song before the queue started
+        # Gapless playback: what we asked the mixer to play next, as
+        # (song_path, queue entry ID or None). pygame can't un-queue a song,
+        # so mixer_queued remembers what it actually holds even after
+        # `prequeued` is withdrawn.
+        self.prequeued = None
+        self.mixer_queued = None
+        # What next/prev and the end of a song move to once the current
+        # folder runs out: "library" (on into the neighbouring folder),
+        # "folder" (nothing) or "repeat_folder" (its other end).
+        self.order = order
+        # Shuffle: None (every song alike), "folder" or "duration"; one bag
+        # for the whole library and one for the folder last shuffled.
+        self.shuffle_weight = shuffle_weight
+        self.shuffle_bag = None
+        self.folder_bag = None
+        # crossfade.Crossfader when songs should overlap instead of following
+        # each other; the gapless hand-over stays as the fallback for when
+        # its buffers aren't decoded in time.
+        self.crossfader = crossfader
+        # predecode.PredecodeCache: the songs likely_next() names are decoded
+        # ahead and loaded from WAV files on tmpfs.
+        self.cache = cache
+        # (command, seconds from the call until the mixer started playing)
+        self.latencies = deque(maxlen=1000)
+        # perf.Recorder: command times, MP3 header parses and mixer loads
+        # also go into its histograms (it ignores them while disabled).
+        self.recorder = recorder
+        self._command = None
+
+    # --- Command timing ---
+    def _begin(self, command):
+        # Commands can run other commands (next -> play); the outermost one
+        # is the one that gets timed.
+        if self._command is None:
+            self._command = (command, time.perf_counter())
+
+    def _end(self):
+        if self._command is not None:
+            command, started = self._command
+            self._command = None
+            seconds = time.perf_counter() - started
+            self.latencies.append((command, seconds))
+            if self.recorder:
+                self.recorder.add("engine." + command, seconds)
+
+    def _notify(self, event, value):
+        if self.listener:
+            self.listener(event, value)
+
+    # --- State ---
+    def length_of(self, path):
+        # Filled in by the background prober; only probe here if it hasn't
+        # reached this song yet.
+        length = self.song_lengths.get(path)
+        if length is None:
+            started = time.perf_counter()
+            length = probe_duration(path)
+            if length is None:
+                length = MP3(path).info.length
+            self.song_lengths[path] = length
+            if self.recorder:
+                self.recorder.add("engine.length_of", time.perf_counter() - started)
+        return length
+
+    def position(self):
+        if self.paused:
+            return self.paused_at
+        return max(0, min(time.monotonic() - self.start_time, self.song_length))
+
+    def _set_resume(self, path, position):
+        if position is None:
+            if self.resume_positions.pop(path, None) is None:
+                return
+        else:
+            self.resume_positions[path] = position
+        self._notify("resume", (path, position))
+
+    def _current_finished(self):
+        self._set_resume(self.current_path, None)  # reset resume when fully played
+        if self.current_path and not self.finished:
+            self.finished = True
+            self._notify("ended", self.current_path)
+
+    def restore(self, path, position):
+        # Picks up a saved session: `path` becomes the current song, paused
+        # at `position`, without loading it into the mixer yet.
+        self.current_path = path
+        self.finished = False
+        self.current_track = self.tracks.id_of(path)
+        self.song_length = self.length_of(path)
+        self.resume_positions[path] = self.paused_at = max(0, min(position, self.song_length))
+        self.paused = True
+        self.playing = False
+        self.predecode()  # the mixer has nothing to queue behind yet
+
+    def busy(self):
+        # The stream is paused while a crossfade plays on its own channels.
+        return self.mixer.get_busy() or bool(self.crossfader and self.crossfader.fading)
+
+    def volume_of(self, path):
+        return gain_to_volume(self.gains.get(path))
+
+    def _apply_gain(self, path):
+        self.mixer.set_volume(self.volume_of(path))
+
+    def _source(self, path):
+        # Arguments for mixer.load/queue: the predecoded copy if there is one.
+        cached = self.cache.open(path) if self.cache else None
+        return (path,) if cached is None else (cached, "wav")
+
+    def _load(self, path):
+        started = time.perf_counter()
+        self.mixer.load(*self._source(path))  # also drops whatever was queued
+        if self.recorder:
+            self.recorder.add("mixer.load", time.perf_counter() - started)
+
+    # --- Commands ---
+    def play(self, path, position=0):
+        self._begin("play")
+        if path in self.resume_positions and position == 0:
+            position = self.resume_positions[path]
+        try:
+            self._load(path)
+            self.prequeued = self.mixer_queued = None
+            self.loaded_path = path
+            self._apply_gain(path)
+            self.mixer.play(start=position)
+            self._stop_crossfade()
+        finally:
+            self._end()
+        self._started(path, position)
+        self.refresh_next()
+
+    def play_segment(self, path, start):
+        # Plays part of a song outside the normal flow (custom playback):
+        # current song, resume positions and the queue are left alone.
+        self._begin("play_segment")
+        self._load(path)
+        self.prequeued = self.mixer_queued = None
+        self.loaded_path = path
+        self._apply_gain(path)
+        self.mixer.play(start=start)
+        self._stop_crossfade()
+        self._end()
+        self.paused = False
+        self.playing = True
+
+    def _started(self, path, position):
+        new_song = path != self.current_path or self.finished
+        if self.current_path and path != self.current_path and not self.finished:
+            self._notify("left", (self.current_path, self.position()))
+        self.finished = False
+        self.current_path = path
+        self.current_track = self.tracks.id_of(path)
+        self.song_length = self.length_of(path)
+        self.paused = False
+        self.playing = True
+        self.start_time = time.monotonic() - position
+        if new_song:
+            self._notify("new_song", path)
+        self._notify("started", path)
+
+    def pause(self, path=None):
+        # Remembers where `path` (default: the current song) was paused so
+        # playing it again continues from there.
+        path = path or self.current_path
+        if not path or self.song_length <= 0:
+            return
+        self._begin("pause")
+        position = self.position()
+        self._set_resume(path, position)
+        self.mixer.pause()
+        self._stop_crossfade()
+        self._end()
+        self.paused_at = position
+        self.paused = True
+        self.playing = False
+        self._notify("paused", path)
+
+    def hold(self):
+        # Pause without saving a resume position.
+        self.mixer.pause()
+        self._stop_crossfade()
+        self.paused_at = self.position()
+        self.paused = True
+        self.playing = False
+
+    def toggle(self, path=None):
+        path = path or self.current_path
+        if self.busy() and not self.paused:
+            self.pause(path)
+        elif self.paused and path:
+            self._begin("resume")
+            self.play(path, self.resume_positions.get(path, 0))
+
+    def seek(self, seconds_delta):
+        if self.current_path and self.song_length > 0:
+            self.seek_to(self.position() + seconds_delta)
+
+    def seek_to(self, position):
+        if not self.current_path or self.song_length <= 0:
+            return
+        self._begin("seek")
+        position = max(0, min(position, self.song_length))
+        # Reposition the stream that is already loaded; the file is only
+        # opened again if the mixer has moved off this song.
+        if self.loaded_path == self.current_path and (self.paused or self.mixer.get_busy()):
+            try:
+                self.mixer.set_pos(position)
+            except pygame.error:
+                self.play(self.current_path, position)
+                return
+            self.start_time = time.monotonic() - position
+            if self.paused:
+                self.mixer.unpause()  # seeking while paused starts playing, as before
+                self.paused = False
+                self.playing = True
+                self._end()
+                self._notify("started", self.current_path)
+            else:
+                self._end()
+                self._notify("seeked", position)
+        else:
+            self.play(self.current_path, position)
+
+    def next(self):
+        self._begin("next")
+        next_track = self.tracks.step(self.current_track, 1, self.order)
+        if next_track is not None:
+            self.play(self.tracks.path_of(next_track))
+        self._end()
+
+    def prev(self):
+        self._begin("prev")
+        prev_track = self.tracks.step(self.current_track, -1, self.order)
+        if prev_track is not None:
+            self.play(self.tracks.path_of(prev_track))
+        self._end()
+
+    def enqueue(self, path):
+        self._begin("enqueue")
+        if self.current_path and self.queue_origin is None:
+            self.queue_origin = self.current_track
+        entry_id = self.queue.append(path)
+        self.refresh_next()
+        self._end()
+        return entry_id
+
+    def enqueue_many(self, paths):
+        # A whole folder at once: what follows the current song is worked
+        # out once, not per song.
+        self._begin("enqueue")
+        if paths and self.current_path and self.queue_origin is None:
+            self.queue_origin = self.current_track
+        entry_ids = [self.queue.append(path) for path in paths]
+        self.refresh_next()
+        self._end()
+        return entry_ids
+
+    def dequeue(self, *entry_ids):
+        self._begin("dequeue")
+        for entry_id in entry_ids:
+            self.queue.remove(entry_id)
+        self.refresh_next()
+        self._end()
+
+    def shuffle(self, folder=None):
+        # Plays a random song from the library, or from `folder`, that
+        # hasn't come up since the bag was last emptied.
+        self._begin("shuffle")
+        if folder is None:
+            if self.shuffle_bag is None:
+                self.shuffle_bag = self._new_bag(None)
+            bag = self.shuffle_bag
+        else:
+            if self.folder_bag is None or self.folder_bag.folder != folder:
+                self.folder_bag = self._new_bag(folder)
+            bag = self.folder_bag
+        track_id = bag.draw()
+        if track_id is not None:
+            self.play(self.tracks.path_of(track_id))
+        self._end()
+
+    def set_shuffle_weight(self, weight):
+        self.shuffle_weight = weight
+        self.shuffle_bag = self.folder_bag = None
+
+    def _new_bag(self, folder):
+        if self.shuffle_weight == "folder":
+            return ShuffleBag(self.tracks, folder, *folder_weight(self.tracks))
+        if self.shuffle_weight == "duration":
+            return ShuffleBag(self.tracks, folder, *duration_weight(self.tracks, self.song_lengths))
+        return ShuffleBag(self.tracks, folder)
+
+    def stop(self):
+        self.mixer.stop()
+        self._stop_crossfade()
+        self.loaded_path = None
+
+    # --- End of track ---
+    def quiet_for(self):
+        # Seconds pump() can be left alone: nothing happens before the song
+        # is within its crossfade (and END_MARGIN, for a length that is a
+        # little off) of the end. 0 when pumping should go on as usual.
+        if self.paused or self.loaded_path != self.current_path:
+            return 0
+        if self.crossfader and self.crossfader.fading:
+            return 0
+        fade = self.crossfader.seconds if self.crossfader else 0
+        return max(0, self.song_length - self.position() - fade - END_MARGIN)
+
+    def pump(self):
+        # Handles the mixer's end event; returns True while the front-end
+        # should keep calling (something is playing, or a stopped stream's
+        # end event hasn't arrived yet).
+        if self.crossfader:
+            self._crossfade_tick()
+        ended = any(event.type == self.end_event for event in pygame.event.get())
+        if ended and not self.paused and self.current_path:
+            if not self.mixer.get_busy():
+                self.song_ended()
+            elif self.mixer_queued is not None:
+                self._queued_song_started()  # the mixer already moved on by itself
+        return not self.paused and (self.busy() or not ended)
+
+    def song_ended(self):
+        self._begin("advance")
+        self._current_finished()
+        if self.queue:
+            entry_id, next_song = self.queue.popleft()
+            self._notify("dequeued", entry_id)
+            self.play(next_song)
+        elif self.queue_origin is not None:
+            next_track = self.tracks.step(self.queue_origin, 1, self.order)
+            self.queue_origin = None
+            if next_track is not None:
+                self.play(self.tracks.path_of(next_track))
+        else:
+            self.next()
+        self._end()
+
+    # --- Gapless playback ---
+    def next_after_current(self):
+        # The same choice song_ended makes: queue head, then the song after
+        # queue_origin, then the next song in play order.
+        head = self.queue.peek()
+        if head:
+            entry_id, path = head
+            return path, entry_id
+        origin = self.queue_origin if self.queue_origin is not None else self.current_track
+        next_track = self.tracks.step(origin, 1, self.order)
+        return None if next_track is None else (self.tracks.path_of(next_track), None)
+
+    def refresh_next(self):
+        # Called after anything that can change what plays next: a new song,
+        # queue edits, library updates. load() clears pygame's queue, so skips
+        # and song changes always start from a clean slate.
+        if self.crossfader and self.current_path:
+            self.crossfader.prepare(self.current_path, self.next_after_current())
+        self.predecode()
+        if not self.gapless or not self.current_path:
+            return
+        upcoming = self.next_after_current()
+        if upcoming == self.prequeued:
+            return
+        self.prequeued = None
+        if upcoming is None:
+            return
+        try:
+            self.mixer.queue(*self._source(upcoming[0]))
+        except pygame.error:
+            # Unreadable next song: nothing is queued, so song_ended deals
+            # with it once the current song is over.
+            return
+        self.prequeued = upcoming
+        self.mixer_queued = upcoming[0]
+
+    def likely_next(self):
+        # Songs that may well be played next, most likely first: what
+        # follows the current song, its neighbours, the next shuffle draws
+        # and the current song itself (resuming reloads it).
+        likely = []
+        upcoming = self.next_after_current()
+        if upcoming is not None:
+            likely.append(upcoming[0])
+        if self.current_track is not None:
+            for track_id in (self.tracks.step(self.current_track, 1, self.order),
+                             self.tracks.step(self.current_track, -1, self.order)):
+                if track_id is not None:
+                    likely.append(self.tracks.path_of(track_id))
+        for bag in (self.shuffle_bag, self.folder_bag):
+            track_id = bag.peek() if bag else None
+            if track_id is not None:
+                likely.append(self.tracks.path_of(track_id))
+        if self.current_path:
+            likely.append(self.current_path)
+        return list(dict.fromkeys(likely))
+
+    def predecode(self, *extra):
+        # Hands likely_next() to the predecode cache, after `extra` (e.g.
+        # the selected song).
+        if self.cache:
+            self.cache.want(list(dict.fromkeys(extra + tuple(self.likely_next()))))
+
+    def _queued_song_started(self):
+        wanted, started = self.prequeued, self.mixer_queued
+        self.prequeued = self.mixer_queued = None
+        if wanted is None or wanted[0] != started:
+            # Queued before the queue/library changed and nothing should follow.
+            self.mixer.stop()
+            self.song_ended()
+            return
+        path = self._take_upcoming(wanted)
+        # pygame has one volume for the stream, so the new song's gain can
+        # only be set once the hand-over is noticed (within one pump).
+        self.loaded_path = path
+        self._apply_gain(path)
+        self._started(path, 0)
+        self.refresh_next()
+
+    def _take_upcoming(self, upcoming):
+        # Bookkeeping for moving on to `upcoming` (from next_after_current)
+        # other than by song_ended: the queue entry or queue_origin is used up.
+        self._current_finished()
+        path, entry_id = upcoming
+        if entry_id is not None:
+            self.queue.remove(entry_id)
+            self._notify("dequeued", entry_id)
+        else:
+            self.queue_origin = None
+        return path
+
+    # --- Crossfade ---
+    def _crossfade_tick(self):
+        # From pump(): starts the overlap once the current song is within
+        # the crossfade of its end, and hands the stream to the next song
+        # once the overlap is over.
+        fader = self.crossfader
+        if fader.fading:
+            if fader.elapsed() >= fader.seconds:
+                self._crossfade_over()
+            return
+        if self.paused or not self.current_path or self.loaded_path != self.current_path:
+            return
+        remaining = self.song_length - self.position()
+        if not 0 < remaining <= fader.seconds or not self.mixer.get_busy():
+            return
+        upcoming = self.next_after_current()
+        if not fader.ready(self.current_path, upcoming):
+            return
+        self.mixer.pause()
+        fader.start(upcoming, fader.seconds - remaining, self.volume_of(self.current_path), self.volume_of(upcoming[0]))
+
+    def _crossfade_over(self):
+        self._begin("crossfade")
+        upcoming, _ = self.crossfader.fading
+        position = self.crossfader.elapsed()
+        path = self._take_upcoming(upcoming)
+        self.play(path, position)  # stops the channels once the stream is playing
+        self._end()
+
+    def _stop_crossfade(self):
+        if self.crossfader:
+            self.crossfader.cancel()
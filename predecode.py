@@ -0,0 +1,136 @@
+import os
+import shutil
+import struct
+import tempfile
+import threading
+import itertools
+from collections import OrderedDict
+import pygame
+
+
+def wav_header(data_bytes, rate, channels, width=2):
+    # A 44-byte PCM WAV header, so decoded samples can go back into
+    # pygame.mixer.music, which seeks in a WAV without decoding up to it.
+    return struct.pack("<4sI4s4sIHHIIHH4sI", b"RIFF", 36 + data_bytes, b"WAVE", b"fmt ", 16, 1, channels,
+                       rate, rate * channels * width, channels * width, width * 8, b"data", data_bytes)
+
+
+def default_cache_dir():
+    # tmpfs where there is one, so the decoded songs stay in memory.
+    return tempfile.mkdtemp(prefix="music_player_predecode_", dir="/dev/shm" if os.path.isdir("/dev/shm") else None)
+
+
+class PredecodeCache:
+    # Songs that are likely to be played next, decoded ahead of time in a
+    # background thread and written out as WAV files, by default to tmpfs.
+    # Loading one of those skips the disk read and the MP3 decoder's start-up
+    # (and, for a resume position, decoding up to it). SDL reads the files
+    # itself, so its audio thread never waits for the GIL the way it would
+    # for a Python file object. Least recently used songs are dropped once
+    # `budget` bytes are used; a 4-minute song takes ~42 MB.
+    def __init__(self, budget=256 * 1024 * 1024, cache_dir=None):
+        self.budget = budget
+        self.cache_dir = cache_dir or default_cache_dir()
+        self.entries = OrderedDict()  # {song_path: (mtime_ns, wav_path, bytes)}, least recently used first
+        self.size = 0
+        self.hits = 0
+        self.misses = 0
+        self.wanted = []
+        self._names = itertools.count()
+        self._lock = threading.Lock()
+        self._wake = threading.Event()
+        threading.Thread(target=self._run, daemon=True).start()
+
+    def want(self, paths):
+        # Most likely first; songs already cached are kept the longest.
+        with self._lock:
+            for path in reversed(paths):
+                if path in self.entries:
+                    self.entries.move_to_end(path)
+        self.wanted = list(paths)
+        self._wake.set()
+
+    def open(self, path):
+        # The WAV file to give mixer.load/queue, or None if the song isn't
+        # cached (or changed on disk since).
+        with self._lock:
+            entry = self.entries.get(path)
+            if entry is not None and entry[0] == _mtime(path):
+                self.entries.move_to_end(path)
+                self.hits += 1
+                return entry[1]
+            self.misses += 1
+        return None
+
+    def close(self):
+        # Removes the decoded files; the cache can't be used afterwards.
+        with self._lock:
+            self.entries.clear()
+            self.size = 0
+        shutil.rmtree(self.cache_dir, ignore_errors=True)
+
+    def _run(self):
+        while True:
+            self._wake.wait()
+            self._wake.clear()
+            for path in self.wanted:
+                if self._wake.is_set():
+                    break  # a newer list came in
+                mtime = _mtime(path)
+                with self._lock:
+                    entry = self.entries.get(path)
+                if mtime is None or (entry is not None and entry[0] == mtime):
+                    continue
+                decoded = self._decode(path)
+                if decoded is not None:
+                    self._store(path, mtime, *decoded)
+
+    def _decode(self, path):
+        try:
+            sound = pygame.mixer.Sound(path)
+        except (pygame.error, OSError):
+            return None
+        samples = memoryview(sound).cast("B")
+        if samples.nbytes > self.budget:
+            return None
+        rate, size, channels = pygame.mixer.get_init()
+        wav_path = os.path.join(self.cache_dir, f"{next(self._names)}.wav")
+        try:
+            with open(wav_path, "wb") as f:
+                f.write(wav_header(samples.nbytes, rate, channels, abs(size) // 8))
+                f.write(samples)  # straight from the Sound, without the GIL
+        except OSError:
+            _remove(wav_path)  # tmpfs full, or closed
+            return None
+        return wav_path, samples.nbytes
+
+    def _store(self, path, mtime, wav_path, nbytes):
+        dropped = []
+        with self._lock:
+            old = self.entries.pop(path, None)
+            if old is not None:
+                self.size -= old[2]
+                dropped.append(old[1])
+            self.entries[path] = (mtime, wav_path, nbytes)
+            self.size += nbytes
+            while self.size > self.budget:
+                _, (_, old_path, old_bytes) = self.entries.popitem(last=False)
+                self.size -= old_bytes
+                dropped.append(old_path)
+        # A file the mixer is playing stays readable until it's closed.
+        for old_path in dropped:
+            _remove(old_path)
+
+
+def _mtime(path):
+    try:
+        return os.stat(path).st_mtime_ns
+    except OSError:
+        return None
+
+
+def _remove(path):
+    try:
+        os.remove(path)
+    except OSError:
+        pass
@@ -0,0 +1,177 @@
+import re
+import heapq
+from array import array
+from itertools import chain
+from collections import defaultdict
+
+EMPTY = array("i")
+CHECK_COST = 10  # checking a song by hand vs. putting it through a set intersection
+SET_FILTER_MAX = 200000  # words matching more songs are checked song by song instead
+NON_WORD = re.compile(r"[\W_]+")
+
+
+def normalize(text):
+    return NON_WORD.sub(" ", text.lower()).strip()
+
+
+def gram_keys(text):
+    # `text` is normalized and starts with a space. Its trigrams cover
+    # substring search (" ab" marks a word starting with "ab"), and " a"
+    # adds one-letter word prefixes.
+    keys = {text[i:i + 3] for i in range(len(text) - 2)}
+    keys.update(" " + word[0] for word in text.split())
+    return keys
+
+
+def query_keys(term):
+    # One- and two-letter terms match word starts only; longer ones match
+    # anywhere, found through their rarest trigram.
+    if len(term) <= 2:
+        return [" " + term]
+    return [term[i:i + 3] for i in range(len(term) - 2)]
+
+
+class SearchIndex:
+    # Type-to-search over song titles and folder names. Entries are only
+    # ever added: a song that left the library stays in the postings and is
+    # filtered out by `alive(path)` when it comes up, so the index can be
+    # filled from the scan thread and topped up from library updates
+    # without any bookkeeping for removals.
+    def __init__(self, alive=None, limit=200):
+        self.alive = alive
+        self.limit = limit
+        self.paths = []         # entry -> song path
+        self.texts = []         # entry -> " " + normalized title
+        self.folder_of = []     # entry -> folder entry
+        self.entry_of = {}      # song path -> entry
+        self.folder_texts = []  # folder entry -> " " + normalized folder name(s)
+        self.folder_songs = []  # folder entry -> [song entry, ...]
+        self.folder_entry = {}  # folder path -> folder entry
+        self.grams = defaultdict(lambda: array("i"))         # key -> song entries
+        self.folder_grams = defaultdict(lambda: array("i"))  # key -> folder entries
+
+    def __len__(self):
+        return len(self.paths)
+
+    # `label` is the folder's path relative to the library root (its artist
+    # and album names); songs are (song_path, title) pairs.
+    def add_folder(self, folder, label, songs):
+        folder_id = self.folder_entry.get(folder)
+        if folder_id is None:
+            folder_id = len(self.folder_texts)
+            self.folder_entry[folder] = folder_id
+            text = " " + normalize(label)
+            self.folder_texts.append(text)
+            self.folder_songs.append([])
+            for key in gram_keys(text):
+                self.folder_grams[key].append(folder_id)
+        grams = self.grams
+        entries = []
+        for path, title in songs:
+            entry = self.entry_of.get(path)
+            if entry is None:
+                entry = len(self.paths)
+                text = " " + normalize(title)
+                self.paths.append(path)
+                self.texts.append(text)
+                self.folder_of.append(folder_id)
+                self.entry_of[path] = entry
+                for key in gram_keys(text):
+                    grams[key].append(entry)
+            entries.append(entry)
+        self.folder_songs[folder_id] = entries
+
+    def _postings(self, grams, term):
+        # The term's keys' posting lists, shortest first.
+        return sorted((grams.get(key, EMPTY) for key in query_keys(term)), key=len)
+
+    def _titles(self, term):
+        # Songs whose titles hold the term's rarest key. When few titles
+        # are expected to hold its next rarest key as well ("par" and "art"
+        # for "part"), walking the first list would mostly turn up misses,
+        # so the two are intersected instead.
+        postings = self._postings(self.grams, term)
+        if len(postings) == 1 or len(postings[0]) * len(postings[1]) >= len(self.paths) * self.limit * 4:
+            return postings[0]
+        return sorted(set(postings[0]).intersection(postings[1]))
+
+    def _folders(self, term):
+        # Folders whose names really contain the term; checked before their
+        # songs are expanded, so a shared trigram ("art" in "Artist") costs
+        # one test per folder rather than one per song.
+        needle = " " + term if len(term) <= 2 else term
+        texts = self.folder_texts
+        return [f for f in self._postings(self.folder_grams, term)[0] if needle in texts[f]]
+
+    def _candidates(self, term):
+        yield from self._titles(term)
+        for folder_id in self._folders(term):
+            yield from self.folder_songs[folder_id]
+
+    def _matching(self, term):
+        entries = set(self._titles(term))
+        entries.update(chain.from_iterable(map(self.folder_songs.__getitem__, self._folders(term))))
+        return entries
+
+    def _estimate(self, term):
+        per_folder = len(self.paths) / max(1, len(self.folder_texts))
+        return len(self._postings(self.grams, term)[0]) + len(self._postings(self.folder_grams, term)[0]) * per_folder
+
+    def _plan(self, terms, estimates, wanted):
+        # Walk the rarest word's matches and check the rest one song at a
+        # time, unless so few of them are expected to pass that
+        # intersecting the words' matches as sets (in C) is cheaper.
+        driver = estimates[0]
+        share = 1.0
+        for estimate in estimates[1:]:
+            share *= min(1.0, estimate / max(1, len(self.paths)))
+        walk = min(driver, wanted / share if share else driver)
+        filters = [term for term, estimate in zip(terms, estimates) if estimate <= SET_FILTER_MAX]
+        if len(filters) < 2 or walk * CHECK_COST <= sum(estimates[:len(filters)]):
+            return self._candidates(terms[0])
+        sets = [self._matching(term) for term in filters]
+        return sorted(sets[0].intersection(*sets[1:]))
+
+    # Returns up to `limit` song paths matching every word of the query,
+    # best first: words found at the start of a title word, then inside the
+    # title, then in the folder names; shorter titles first on ties.
+    def search(self, query, limit=None):
+        terms = normalize(query).split()
+        if not terms:
+            return []
+        limit = limit or self.limit
+        terms.sort(key=self._estimate)
+        # Title matches come first, so a few times `limit` is plenty to
+        # rank from.
+        wanted = limit * 4
+        candidates = self._plan(terms, [self._estimate(term) for term in terms], wanted)
+        checks = [(" " + term, len(term) > 2, term) for term in terms]
+        texts = self.texts
+        folder_texts = self.folder_texts
+        folder_of = self.folder_of
+        seen = set()
+        found = []
+        for entry in candidates:
+            if entry in seen:
+                continue
+            seen.add(entry)
+            title = texts[entry]
+            folder = folder_texts[folder_of[entry]]
+            score = 0
+            for start, inner, term in checks:
+                if start in title:
+                    continue
+                if inner and term in title:
+                    score += 1
+                elif start in folder:
+                    score += 2
+                elif inner and term in folder:
+                    score += 3
+                else:
+                    break
+            else:
+                if self.alive is None or self.alive(self.paths[entry]):
+                    found.append((score, len(title), entry))
+                    if len(found) >= wanted:
+                        break
+        return [self.paths[entry] for _, _, entry in heapq.nsmallest(limit, found)]
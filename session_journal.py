@@ -0,0 +1,121 @@
+import os
+import json
+import hashlib
+import threading
+
+FLUSH_INTERVAL = 1.0  # seconds changes wait so they go out in one write
+COMPACT_RATIO = 4  # rewrite the journal once it has this many lines per live entry
+MIN_COMPACT_LINES = 1000
+
+
+def default_journal_path(base_path):
+    # Next to the library index, one session per music folder.
+    key = hashlib.sha1(os.path.abspath(base_path).encode("utf-8")).hexdigest()[:16]
+    cache_dir = os.path.join(os.path.expanduser("~"), ".cache", "music_player")
+    os.makedirs(cache_dir, exist_ok=True)
+    return os.path.join(cache_dir, f"session-{key}.jsonl")
+
+
+class SessionJournal:
+    # What the player needs to pick up where it left off: resume positions
+    # ("resume": {song_path: seconds}) and the session ("session": current
+    # song, queue, open folders). Kept as an append-only file of JSON lines
+    # [kind, key, value], where a null value removes the key.
+    #
+    # record() only updates a dict of pending changes, so the Tk thread
+    # never waits on the disk. A writer thread appends whatever is pending
+    # every FLUSH_INTERVAL in one write; repeated changes to the same key
+    # in between cost one line. Once the file has grown to COMPACT_RATIO
+    # lines per live entry, the writer replaces it with a snapshot.
+    def __init__(self, path):
+        self.path = path
+        self.state = None         # {kind: {key: value}}, once load() has read the file
+        self.pending = {}         # {(kind, key): value} not written yet
+        self.lines = 0            # lines in the file
+        self.compactions = 0
+        self._lock = threading.Lock()
+        self._stop = threading.Event()
+        self._thread = None
+
+    def load(self):
+        # Read outside the lock, so record() doesn't wait on it either.
+        if self.state is None:
+            state = {"resume": {}, "session": {}}
+            lines = 0
+            try:
+                with open(self.path, encoding="utf-8") as f:
+                    for line in f:
+                        try:
+                            kind, key, value = json.loads(line)
+                        except ValueError:
+                            continue  # cut short by a crash mid-write
+                        apply_change(state, kind, key, value)
+                        lines += 1
+            except OSError:
+                pass
+            with self._lock:
+                if self.state is None:
+                    self.state, self.lines = state, lines
+        return self.state
+
+    def record(self, kind, key, value):
+        with self._lock:
+            self.pending[(kind, key)] = value
+
+    def start(self):
+        self._thread = threading.Thread(target=self._run, daemon=True)
+        self._thread.start()
+        return self
+
+    def close(self):
+        # Writes what is still pending before returning.
+        self._stop.set()
+        if self._thread:
+            self._thread.join()
+        else:
+            self._flush()
+
+    def _run(self):
+        self.load()  # in the background, so startup doesn't wait on it
+        while not self._stop.wait(FLUSH_INTERVAL):
+            self._flush()
+        self._flush()
+
+    def _flush(self):
+        state = self.load()
+        with self._lock:
+            batch, self.pending = self.pending, {}
+            for (kind, key), value in batch.items():
+                apply_change(state, kind, key, value)
+            live = sum(len(entries) for entries in state.values())
+        if not batch:
+            return
+        try:
+            with open(self.path, "a", encoding="utf-8") as f:
+                f.write("".join(json.dumps([kind, key, value]) + "\n" for (kind, key), value in batch.items()))
+            self.lines += len(batch)
+            if self.lines > max(MIN_COMPACT_LINES, live * COMPACT_RATIO):
+                self._compact(state)
+        except OSError:
+            pass  # a full disk loses this batch, not the session
+
+    def _compact(self, state):
+        with self._lock:
+            snapshot = [(kind, list(entries.items())) for kind, entries in state.items()]
+        lines = [json.dumps([kind, key, value]) + "\n" for kind, entries in snapshot for key, value in entries]
+        temp_path = self.path + ".tmp"
+        with open(temp_path, "w", encoding="utf-8") as f:
+            f.writelines(lines)
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(temp_path, self.path)
+        self.lines = len(lines)
+        self.compactions += 1
+
+
+def apply_change(state, kind, key, value):
+    entries = state.setdefault(kind, {})
+    if value is None:
+        entries.pop(key, None)
+    else:
+        entries[key] = value
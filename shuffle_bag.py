@@ -0,0 +1,129 @@
+import random
+from array import array
+
+MAX_REJECTIONS = 64  # weighted draws take the next candidate after this many misses
+MAX_DURATION_WEIGHT = 900.0  # songs longer than 15 minutes don't come up any more often
+
+
+class ShuffleBag:
+    # Random play without repeats: every song is drawn once before any song
+    # comes up again. The track IDs sit in a flat array and each draw does
+    # one step of a Fisher–Yates shuffle, so a draw is O(1) and nothing is
+    # shuffled up front. With `folder` set, only that folder's songs are in
+    # the bag. Songs added to the library join the current round; removed
+    # ones are dropped when they come up.
+    #
+    # With `weight`, a candidate is kept with probability
+    # weight(track_id) / max_weight and otherwise left in the bag, which
+    # draws the remaining songs in proportion to their weight without any
+    # per-round setup. Every song is still played once per round, so a
+    # weight only moves songs earlier or later within the round: over
+    # whole rounds each folder gets plays in proportion to its size.
+    def __init__(self, tracks, folder=None, weight=None, max_weight=1.0, rng=None):
+        self.tracks = tracks
+        self.folder = folder
+        self.weight = weight
+        self.max_weight = max_weight
+        self.rng = rng or random.Random()
+        # Slot i holds track ID order[i] - 1, or 0 while it still holds the
+        # i-th song of the source; a zero-filled array is ~10x quicker to
+        # allocate than one filled with 0..n-1.
+        self.order = array("l")
+        self.size = 0       # slots in use
+        self.pos = 0        # slots [0, pos) have been played this round
+        self.source = None  # the folder's ID list the bag was filled from
+        self.known = 0      # how much of the source has been added
+        self.rounds = 0
+        self.upcoming = None  # drawn early by peek(), handed out by the next draw()
+
+    def _sync(self):
+        if self.folder is None:
+            source = self.tracks.paths
+        else:
+            source = self.tracks.folders.get(self.folder, ())
+            if source is not self.source:
+                # Folder was re-read (TrackTable.set_folder): start over.
+                self.source = source
+                self.order = array("l")
+                self.size = self.pos = self.known = 0
+        added = len(source) - self.known
+        if added <= 0:
+            return
+        missing = self.size + added - len(self.order)
+        if missing > 0:
+            self.order.frombytes(bytes(missing * self.order.itemsize))
+        if self.size != self.known:
+            # Slots were dropped since, so new songs can't use the implicit
+            # slot-to-source mapping.
+            for k in range(self.known, len(source)):
+                self.order[self.size] = self._base(k) + 1
+                self.size += 1
+        else:
+            self.size += added
+        self.known = len(source)
+
+    def _base(self, k):
+        return k if self.folder is None else self.source[k]
+
+    def _get(self, i):
+        track_id = self.order[i]
+        return track_id - 1 if track_id else self._base(i)
+
+    def draw(self):
+        track_id, self.upcoming = self.upcoming, None
+        if track_id is not None and self.tracks.paths[track_id] is not None:
+            return track_id
+        return self._draw()
+
+    def peek(self):
+        # The song the next draw() will return, so it can be loaded ahead.
+        if self.upcoming is None:
+            self.upcoming = self._draw()
+        return self.upcoming
+
+    def _draw(self):
+        self._sync()
+        order = self.order
+        paths = self.tracks.paths
+        rng = self.rng
+        rejections = 0
+        while self.size:
+            if self.pos >= self.size:
+                self.pos = 0
+                self.rounds += 1
+            j = rng.randrange(self.pos, self.size)
+            track_id = self._get(j)
+            if paths[track_id] is None:
+                # Removed from the library: drop it for good.
+                self.size -= 1
+                order[j] = self._get(self.size) + 1
+                continue
+            if (self.weight and rejections < MAX_REJECTIONS
+                    and rng.random() * self.max_weight > self.weight(track_id)):
+                rejections += 1
+                continue
+            order[j] = self._get(self.pos) + 1
+            order[self.pos] = track_id + 1
+            self.pos += 1
+            return track_id
+        return None
+
+    def remaining(self):
+        # Songs left this round; removed songs count until they come up.
+        self._sync()
+        return self.size - self.pos
+
+
+# Weightings: (weight function, largest weight it returns).
+def folder_weight(tracks):
+    # Every folder is equally likely to come up next, however many songs
+    # it holds, until small folders run out for the round.
+    smallest = min((len(ids) for ids in tracks.folders.values() if ids), default=1)
+    return lambda track_id: 1.0 / len(tracks.folders[tracks.folder_of[track_id]]), 1.0 / smallest
+
+
+def duration_weight(tracks, song_lengths, default=180.0):
+    # Every minute of music is equally likely, so long songs come up more.
+    def weight(track_id):
+        return min(song_lengths.get(tracks.paths[track_id]) or default, MAX_DURATION_WEIGHT)
+    return weight, MAX_DURATION_WEIGHT
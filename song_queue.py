@@ -0,0 +1,107 @@
+from collections import OrderedDict
+
+
+class PlayQueue:
+    # Songs waiting to play, each under its own entry ID so the same song
+    # can be queued twice and either copy removed. Adding, taking the next
+    # song and removing by ID are all O(1).
+    #
+    # Entries also have a position, for a view that only shows part of the
+    # queue: IDs are handed out in increasing order, so a Fenwick tree over
+    # IDs counting the ones still queued gives an entry's index, and the
+    # entry at an index, in O(log n) (which adds that to the above).
+    def __init__(self):
+        self.entries = OrderedDict()  # entry_id -> song path, in play order
+        self.next_id = 0
+        self.base = 0     # entry ID counted in slot 0 of the tree
+        self.counts = [0]  # Fenwick tree (1-based) over slots base, base + 1, ...
+
+    def __len__(self):
+        return len(self.entries)
+
+    def __bool__(self):
+        return bool(self.entries)
+
+    def __iter__(self):
+        return iter(self.entries.items())
+
+    def append(self, path):
+        entry_id = self.next_id
+        self.next_id += 1
+        if entry_id - self.base >= len(self.counts) - 1:
+            self._rebuild()
+        self.entries[entry_id] = path
+        self._add(entry_id - self.base, 1)
+        return entry_id
+
+    def popleft(self):
+        entry_id, path = self.entries.popitem(last=False)
+        self._add(entry_id - self.base, -1)
+        return entry_id, path
+
+    def peek(self):
+        for entry in self.entries.items():
+            return entry
+        return None
+
+    def remove(self, entry_id):
+        path = self.entries.pop(entry_id, None)
+        if path is not None:
+            self._add(entry_id - self.base, -1)
+        return path
+
+    def clear(self):
+        self.entries.clear()
+        self.base = self.next_id
+        self.counts = [0]
+
+    # --- Positions ---
+    def index_of(self, entry_id):
+        # Number of entries ahead of `entry_id`, or None if it isn't queued.
+        if entry_id not in self.entries:
+            return None
+        i = entry_id - self.base
+        index = 0
+        while i > 0:
+            index += self.counts[i]
+            i -= i & -i
+        return index
+
+    def entry_at(self, index):
+        # (entry_id, song path) of the entry `index` places from the front.
+        if not 0 <= index < len(self.entries):
+            return None
+        slot = 0
+        step = 1 << (len(self.counts) - 1).bit_length()
+        while step:
+            if slot + step < len(self.counts) and self.counts[slot + step] <= index:
+                slot += step
+                index -= self.counts[slot]
+            step >>= 1
+        entry_id = self.base + slot
+        return entry_id, self.entries[entry_id]
+
+    def window(self, start, count):
+        # Up to `count` entries from index `start` on.
+        end = min(start + count, len(self.entries))
+        return [self.entry_at(index) for index in range(max(0, start), end)]
+
+    def _add(self, slot, delta):
+        i = slot + 1
+        while i < len(self.counts):
+            self.counts[i] += delta
+            i += i & -i
+
+    def _rebuild(self):
+        # Out of slots: start the tree at the oldest queued entry and give it
+        # twice the room it needs, so appends stay O(1) on average.
+        self.base = next(iter(self.entries), self.next_id - 1)
+        size = max(16, 2 * (self.next_id - self.base))
+        counts = [0] * (size + 1)
+        for entry_id in self.entries:
+            counts[entry_id - self.base + 1] += 1
+        for i in range(1, size + 1):
+            parent = i + (i & -i)
+            if parent <= size:
+                counts[parent] += counts[i]
+        self.counts = counts
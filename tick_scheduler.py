@@ -0,0 +1,101 @@
+class TickScheduler:
+    # The Player's periodic work (seek bar, audio pump, result drains) as
+    # named jobs on one scheduler instead of loops that re-arm themselves
+    # forever. A job returns the ms until it wants to run again, or None to
+    # sleep until something calls wake() for it, so a paused player with
+    # nothing in flight has no timers at all.
+    #
+    # wake() runs the job at the next idle moment, and a job woken several
+    # times before then (a song change posts "started", "dequeued" and a
+    # seek in one callback) runs once. "Visual" jobs don't run while the
+    # window is hidden and are woken again by show().
+    def __init__(self, root=None):
+        self.root = root       # anything with after/after_idle/after_cancel, set once Tk is up
+        self.jobs = {}         # name -> (function, visual)
+        self.timers = {}       # name -> after ID of its next timed run
+        self.woken = []        # names to run at the next idle moment
+        self.idle_pending = False
+        self.hidden = False
+        self.wakeups = 0       # timed runs so far, for measuring
+
+    def add(self, name, function, visual=False):
+        self.jobs[name] = (function, visual)
+        self.wake(name)
+
+    def wake(self, name):
+        if name not in self.woken:
+            self.woken.append(name)
+        if not self.idle_pending:
+            self.idle_pending = True
+            self.root.after_idle(self._run_woken)
+
+    def hide(self):
+        self.hidden = True
+        for name, (_, visual) in self.jobs.items():
+            if visual:
+                self._cancel(name)
+
+    def show(self):
+        if self.hidden:
+            self.hidden = False
+            for name, (_, visual) in self.jobs.items():
+                if visual:
+                    self.wake(name)
+
+    def _run_woken(self):
+        self.idle_pending = False
+        woken, self.woken = self.woken, []
+        for name in woken:
+            self._run(name)
+
+    def _fire(self, name):
+        self.timers.pop(name, None)
+        self.wakeups += 1
+        self._run(name)
+
+    def _run(self, name):
+        self._cancel(name)
+        if name not in self.jobs:
+            return  # woken before it was added; add() runs it
+        function, visual = self.jobs[name]
+        if visual and self.hidden:
+            return
+        delay = function()
+        if delay is not None:
+            self.timers[name] = self.root.after(max(1, int(delay)), self._fire, name)
+
+    def _cancel(self, name):
+        timer = self.timers.pop(name, None)
+        if timer is not None:
+            self.root.after_cancel(timer)
+
+
+class Rendered:
+    # What each widget option was last set to, so a tick that computes the
+    # same text or bar position again doesn't touch the widget (each set
+    # is a Tcl call and, for a change, a redraw).
+    def __init__(self):
+        self.values = {}   # (widget, option) -> value
+        self.skipped = 0
+
+    def changed(self, widget, option, value):
+        # True (and remembered) if `value` differs from what the widget shows.
+        if self.values.get((widget, option)) == value:
+            self.skipped += 1
+            return False
+        self.values[(widget, option)] = value
+        return True
+
+    def config(self, widget, **options):
+        changed = {option: value for option, value in options.items() if self.changed(widget, option, value)}
+        if changed:
+            widget.config(**changed)
+
+    def set(self, widget, value):
+        if self.changed(widget, "value", value):
+            widget.set(value)
+
+    def forget(self, widget, option="value"):
+        # For a widget changed some other way (the user dragging the seek
+        # bar, a redraw), so the next value is set whatever it is.
+        self.values.pop((widget, option), None)
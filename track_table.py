@@ -0,0 +1,146 @@
+import os
+from bisect import bisect_left
+
+
+class TrackTable:
+    # Every song gets an integer ID that stays the same for the whole session.
+    # Lookups by path and moves to the neighbouring song in a folder are
+    # dict/list indexing, so they don't depend on the size of the library.
+    def __init__(self):
+        self.paths = []          # track_id -> song path (None once removed)
+        self.folder_of = []      # track_id -> folder path
+        self.index_of = []       # track_id -> position inside its folder
+        self.ids = {}            # song path -> track_id
+        self.folders = {}        # folder path -> [track_id, ...] in play order
+        # Depth-first order of the folders that have songs (a folder's own
+        # songs, then its subfolders by name, as the scan walks them), so
+        # stepping past the end of a folder lands in the next one in O(1).
+        # A song's place in the whole library is its folder's rank plus its
+        # index_of. Ranks after an insert or removal are renumbered on the
+        # next lookup, once per batch of library changes.
+        self.folder_order = []   # folder paths
+        self.folder_keys = []    # path components of each, for bisect
+        self.folder_rank = {}    # folder path -> index in folder_order
+        self._stale_from = None  # folder_rank is out of date from this index on
+
+    def __len__(self):
+        return len(self.ids)
+
+    def add(self, folder, path):
+        track_id = self.ids.get(path)
+        if track_id is not None:
+            return track_id
+        track_id = len(self.paths)
+        songs = self.folders.setdefault(folder, [])
+        if not songs:
+            self._place_folder(folder)
+        self.paths.append(path)
+        self.folder_of.append(folder)
+        self.index_of.append(len(songs))
+        self.ids[path] = track_id
+        songs.append(track_id)
+        return track_id
+
+    def add_folder(self, folder, paths):
+        return [self.add(folder, path) for path in paths]
+
+    # Replaces a folder's song list after a rescan. Songs still present keep
+    # their IDs; removed ones are dropped from the lookups.
+    def set_folder(self, folder, paths):
+        keep = set(paths)
+        had_songs = bool(self.folders.get(folder))
+        if had_songs and not paths:
+            self._unplace_folder(folder)
+        elif paths and not had_songs:
+            self._place_folder(folder)
+        for track_id in self.folders.get(folder, ()):
+            path = self.paths[track_id]
+            if path not in keep:
+                del self.ids[path]
+                self.paths[track_id] = None
+        songs = self.folders[folder] = []
+        for path in paths:
+            track_id = self.ids.get(path)
+            if track_id is None:
+                track_id = len(self.paths)
+                self.paths.append(path)
+                self.folder_of.append(folder)
+                self.index_of.append(0)
+                self.ids[path] = track_id
+            self.index_of[track_id] = len(songs)
+            songs.append(track_id)
+        return songs
+
+    def remove_folder(self, folder):
+        self.set_folder(folder, [])
+        del self.folders[folder]
+
+    def id_of(self, path):
+        return self.ids.get(path)
+
+    def path_of(self, track_id):
+        return None if track_id is None else self.paths[track_id]
+
+    def position(self, track_id):
+        return self.folder_of[track_id], self.index_of[track_id]
+
+    def neighbour(self, track_id, step):
+        if track_id is None or self.paths[track_id] is None:
+            return None
+        songs = self.folders[self.folder_of[track_id]]
+        idx = self.index_of[track_id] + step
+        return songs[idx] if 0 <= idx < len(songs) else None
+
+    def next_in_folder(self, track_id):
+        return self.neighbour(track_id, 1)
+
+    def prev_in_folder(self, track_id):
+        return self.neighbour(track_id, -1)
+
+    # --- Play order ---
+    def step(self, track_id, step, order="library"):
+        # The song `step` (1 or -1) away in play order: "library" goes on
+        # into the neighbouring folder, "folder" stops at the folder's ends
+        # and "repeat_folder" wraps around to its other end.
+        if track_id is None or self.paths[track_id] is None:
+            return None
+        folder = self.folder_of[track_id]
+        songs = self.folders[folder]
+        idx = self.index_of[track_id] + step
+        if 0 <= idx < len(songs):
+            return songs[idx]
+        if order == "repeat_folder":
+            return songs[idx % len(songs)]
+        if order != "library":
+            return None
+        rank = self.rank_of(folder) + step
+        if 0 <= rank < len(self.folder_order):
+            songs = self.folders[self.folder_order[rank]]
+            return songs[0] if step > 0 else songs[-1]
+        return None
+
+    def rank_of(self, folder):
+        if self._stale_from is not None:
+            for rank in range(self._stale_from, len(self.folder_order)):
+                self.folder_rank[self.folder_order[rank]] = rank
+            self._stale_from = None
+        return self.folder_rank[folder]
+
+    def _place_folder(self, folder):
+        key = folder.split(os.sep)
+        if not self.folder_keys or key > self.folder_keys[-1]:
+            rank = len(self.folder_order)  # the scan hands folders over in order
+        else:
+            rank = bisect_left(self.folder_keys, key)
+            self._stale_from = rank if self._stale_from is None else min(self._stale_from, rank)
+        self.folder_order.insert(rank, folder)
+        self.folder_keys.insert(rank, key)
+        self.folder_rank[folder] = rank
+
+    def _unplace_folder(self, folder):
+        rank = self.rank_of(folder)
+        del self.folder_order[rank]
+        del self.folder_keys[rank]
+        del self.folder_rank[folder]
+        if rank < len(self.folder_order):
+            self._stale_from = rank
@@ -0,0 +1,127 @@
+import os
+import queue
+import hashlib
+from collections import OrderedDict
+from concurrent.futures.process import BrokenProcessPool
+import numpy as np
+from decoder import decode, start_pool
+
+BUCKETS = 512  # columns stored per song; the canvas scales them to its width
+
+
+def default_cache_dir():
+    cache_dir = os.path.join(os.path.expanduser("~"), ".cache", "music_player", "waveforms")
+    os.makedirs(cache_dir, exist_ok=True)
+    return cache_dir
+
+
+def cache_file(cache_dir, path, mtime_ns):
+    # A changed file gets a new key; stale entries are simply never read again.
+    key = hashlib.sha1(f"{path}\0{mtime_ns}".encode("utf-8", "surrogateescape")).hexdigest()
+    return os.path.join(cache_dir, key[:2], key + ".npy")
+
+
+def downsample(samples, buckets=BUCKETS):
+    # (2, buckets) uint8: peak and RMS level of each slice of the song.
+    samples = np.abs(samples.astype(np.float32)) / 32768.0
+    if len(samples) < buckets:
+        samples = np.pad(samples, (0, buckets - len(samples)))
+    frames = samples[:len(samples) // buckets * buckets].reshape(buckets, -1)
+    peak = frames.max(axis=1)
+    rms = np.sqrt(np.mean(np.square(frames), axis=1))
+    return np.round(np.stack([peak, rms]) * 255).astype(np.uint8)
+
+
+def load_waveform(path, cache_dir, buckets=BUCKETS):
+    # Runs in a worker process: the cached overview if the file hasn't
+    # changed, otherwise decode the whole song and cache the result.
+    # Returns None for files that can't be read or decoded.
+    try:
+        target = cache_file(cache_dir, path, os.stat(path).st_mtime_ns)
+    except OSError:
+        return None
+    try:
+        return np.load(target)
+    except (OSError, ValueError):
+        pass
+    samples = decode(path)
+    if samples is None:
+        return None
+    levels = downsample(samples, buckets)
+    os.makedirs(os.path.dirname(target), exist_ok=True)
+    temp = f"{target}.{os.getpid()}.tmp"
+    with open(temp, "wb") as f:
+        np.save(f, levels)
+    os.replace(temp, target)
+    return levels
+
+
+class WaveformLoader:
+    # Computes song overviews in a decoder pool (decoder.start_pool) and
+    # posts (path, levels) to `results` for the Tk side to drain; `levels`
+    # is None if the song couldn't be decoded. A few recent overviews are
+    # kept in memory so going back and forth between songs doesn't touch
+    # the disk. Until start() is given a pool, nothing is computed.
+    def __init__(self, cache_dir=None, keep=8):
+        self.cache_dir = cache_dir or default_cache_dir()
+        self.keep = keep
+        self.results = queue.Queue()
+        self.loaded = OrderedDict()  # path -> levels, most recent last
+        self.pending = set()
+        self.pool = None
+
+    def start(self, pool):
+        self.pool = pool
+        return self
+
+    def get(self, path):
+        levels = self.loaded.get(path)
+        if levels is not None:
+            self.loaded.move_to_end(path)
+        return levels
+
+    def request(self, path):
+        # Never blocks: returns the overview if it's already in memory,
+        # otherwise None and the overview turns up in `results` later.
+        if not path:
+            return None
+        levels = self.get(path)
+        if levels is not None or path in self.pending or self.pool is None:
+            return levels
+        try:
+            future = self.pool.submit(load_waveform, path, self.cache_dir)
+        except BrokenProcessPool:
+            # A worker died (crashed, or the OOM killer took it) and the
+            # pool refuses new work for good: fork a fresh one and go
+            # without this song's overview.
+            self.pool.shutdown(wait=False)
+            self.pool = start_pool()
+            return None
+        self.pending.add(path)
+        future.add_done_callback(lambda f: self._done(path, f))
+        return None
+
+    def _done(self, path, future):
+        # Runs on the pool's management thread.
+        try:
+            levels = None if future.cancelled() else future.result()
+        except Exception:
+            levels = None
+        self.results.put((path, levels))
+
+    def collect(self):
+        # Tk side: moves finished overviews into memory and returns their paths.
+        done = []
+        while True:
+            try:
+                path, levels = self.results.get_nowait()
+            except queue.Empty:
+                break
+            self.pending.discard(path)
+            if levels is not None:
+                self.loaded[path] = levels
+                self.loaded.move_to_end(path)
+                while len(self.loaded) > self.keep:
+                    self.loaded.popitem(last=False)
+            done.append(path)
+        return done